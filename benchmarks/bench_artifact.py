@@ -0,0 +1,81 @@
+"""郵便番号検索用のバイナリファイル（fastapi/artifact.py）のベンチマーク
+
+起動時の読み込み時間と1件あたりの検索時間を、インメモリテーブル（MEMORY_LOOKUP）と比較する。
+    memory:   ZipcodeTable.load（起動のたびにDBから全件読み込む）
+    artifact: artifact.Artifact（mmapしてヘッダーを読むだけ）
+    python benchmarks/bench_artifact.py --rows 124000 --lookups 100000
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine
+
+from bench_db_pool import make_database
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "fastapi"))
+import artifact  # noqa: E402
+from functions.zipcode_table import ZipcodeTable  # noqa: E402
+
+COLUMNS = ["zipcode", "address"]
+ALL_COLUMNS = ["zipcode", "prefecture", "city", "town", "address"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=124_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "zipcode.db")
+        zipcodes = make_database(db_path, args.rows)
+        path = artifact.artifact_path("ken_all", tmp)
+
+        started = time.perf_counter()
+        with sqlite3.connect(db_path) as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(ALL_COLUMNS)} FROM ken_all ORDER BY zipcode, id"
+            )
+            artifact.write(path, ALL_COLUMNS, rows)
+        written = time.perf_counter() - started
+
+        engine = create_engine(f"sqlite:///{db_path}")
+        started = time.perf_counter()
+        memory = ZipcodeTable.load(engine, "ken_all", COLUMNS)
+        memory_open = time.perf_counter() - started
+        engine.dispose()
+
+        started = time.perf_counter()
+        mapped = artifact.Artifact(path, COLUMNS)
+        mapped_open = time.perf_counter() - started
+
+        rng = random.Random(0)
+        targets = [rng.choice(zipcodes) for _ in range(args.lookups)]
+        for zipcode in targets[:1000]:
+            assert memory.lookup(zipcode) == mapped.lookup(zipcode)
+
+        print(f"rows: {args.rows}, lookups: {args.lookups}")
+        print(
+            f"write artifact: {written * 1000:8.1f} ms, {mapped.nbytes() / 2**20:.1f} MiB"
+        )
+        print(f"{'table':8} {'open ms':>9} {'lookup us':>10}")
+        for name, table, opened in (
+            ("memory", memory, memory_open),
+            ("artifact", mapped, mapped_open),
+        ):
+            started = time.perf_counter()
+            for zipcode in targets:
+                table.lookup(zipcode)
+            per_lookup = (time.perf_counter() - started) / len(targets)
+            print(f"{name:8} {opened * 1000:9.2f} {per_lookup * 1e6:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
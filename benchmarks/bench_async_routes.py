@@ -0,0 +1,135 @@
+"""同期ルートとasyncルート（ASYNC_DB=true）のHTTPスループット比較
+
+一時ディレクトリに作成したDBでuvicornを起動し、asyncioだけで書いたHTTP/1.1クライアント
+（keep-alive、接続ごとに1リクエストずつ）で /v1/ken_all/?zipcode=... を叩き続ける。
+    python benchmarks/bench_async_routes.py --rows 124000 --requests 5000 --clients 64 256
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from bench_db_pool import make_database
+
+FASTAPI_DIR = Path(__file__).resolve().parents[1] / "fastapi"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_ready(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise TimeoutError("uvicorn did not start")
+
+
+async def client(port: int, paths: List[str], latencies: List[float]) -> None:
+    """1接続でpathsを順にGETする"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for path in paths:
+        started = time.perf_counter()
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n".encode("ascii"))
+        headers = await reader.readuntil(b"\r\n\r\n")
+        length = 0
+        for line in headers.split(b"\r\n"):
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":", 1)[1])
+        await reader.readexactly(length)
+        latencies.append(time.perf_counter() - started)
+    writer.close()
+
+
+async def load(port: int, zipcodes: List[str], clients: int, requests: int) -> dict:
+    rng = random.Random(clients)
+    paths = [f"/v1/ken_all/?zipcode={rng.choice(zipcodes)}" for _ in range(requests)]
+    latencies: List[float] = []
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(client(port, paths[i::clients], latencies) for i in range(clients))
+    )
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "rps": len(latencies) / elapsed,
+    }
+
+
+def serve(workdir: str, port: int, async_db: bool, **settings: str) -> subprocess.Popen:
+    """workdirのzipcode.dbでuvicornを起動（settingsは追加の環境変数）"""
+    env = dict(
+        os.environ,
+        ASYNC_DB=str(async_db).lower(),
+        RATE_LIMIT_ENABLED="false",
+        **settings,
+    )
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--app-dir",
+            str(FASTAPI_DIR),
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=workdir,
+        env=env,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=124_000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--clients", type=int, nargs="+", default=[64, 256])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        zipcodes = make_database(os.path.join(tmp, "zipcode.db"), args.rows)
+
+        print(f"rows: {args.rows}, requests: {args.requests}")
+        print(f"{'route':6} {'clients':>7} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+        for clients in args.clients:
+            for async_db in (False, True):
+                port = free_port()
+                server = serve(tmp, port, async_db)
+                try:
+                    asyncio.run(wait_ready(port))
+                    result = asyncio.run(load(port, zipcodes, clients, args.requests))
+                finally:
+                    server.terminate()
+                    server.wait()
+                name = "async" if async_db else "sync"
+                print(
+                    f"{name:6} {clients:7d} {result['p50']:8.2f} "
+                    f"{result['p99']:8.2f} {result['rps']:8.0f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
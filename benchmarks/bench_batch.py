@@ -0,0 +1,59 @@
+"""/batchのベンチマーク
+
+同じ郵便番号の組を、1件ずつGET /v1/ken_all/?zipcode=... で引いた場合と、
+POST /v1/ken_all/batch の1回で引いた場合の1件あたりの時間を比較する（TestClientでプロセス内）。
+    python benchmarks/bench_batch.py --rows 124000 --records 1000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench_db_pool import make_database
+
+FASTAPI_DIR = Path(__file__).resolve().parents[1] / "fastapi"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=124_000)
+    parser.add_argument("--records", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        zipcodes = make_database(os.path.join(tmp, "zipcode.db"), args.rows)
+
+        # DBはカレントディレクトリから開くので、移動してからアプリを読み込む
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        os.environ["RATE_LIMIT_ENABLED"] = "false"
+        sys.path.append(str(FASTAPI_DIR))
+        from fastapi.testclient import TestClient
+        from main import app
+
+        records = random.Random(0).sample(zipcodes, args.records)
+        with TestClient(app) as client:
+            started = time.perf_counter()
+            for zipcode in records:
+                client.get("/v1/ken_all/", params={"zipcode": zipcode})
+            single = time.perf_counter() - started
+
+            started = time.perf_counter()
+            response = client.post("/v1/ken_all/batch", json={"zipcodes": records})
+            batch = time.perf_counter() - started
+            assert response.status_code == 200
+
+        os.chdir(cwd)
+
+    print(f"rows: {args.rows}, records: {args.records}")
+    print(f"single GET:  {single / args.records * 1e6:9.1f} us/record")
+    print(f"batch POST:  {batch / args.records * 1e6:9.1f} us/record")
+    print(f"speedup:     {single / batch:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
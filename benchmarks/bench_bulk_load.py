@@ -0,0 +1,94 @@
+"""bulk_loadのベンチマーク
+
+DataFrame.to_sql（+ インデックス作成）の旧実装と、bulk_load（+ インデックス作成）の現実装を
+一時ファイルのDBで比較する。
+    python benchmarks/bench_bulk_load.py --rows 124000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "get_data" / "parser"))
+from parse_utils import bulk_load, create_indexes  # noqa: E402
+
+
+def legacy_load(engine, df: pd.DataFrame, table_name: str) -> None:
+    """旧実装（to_sql）"""
+    df.to_sql(table_name, con=engine, if_exists="replace", index=False)
+    create_indexes(engine, table_name)
+
+
+def current_load(engine, df: pd.DataFrame, table_name: str) -> None:
+    """現実装（bulk_load）"""
+    bulk_load(engine, df, table_name)
+    create_indexes(engine, table_name)
+
+
+def make_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """ken_allと同じ列のDF"""
+    rng = random.Random(seed)
+    places = [
+        ("東京都", "千代田区"),
+        ("北海道", "札幌市中央区"),
+        ("大阪府", "大阪市北区"),
+    ]
+    prefectures, cities, towns = [], [], []
+    for i in range(rows):
+        prefecture, city = rng.choice(places)
+        prefectures.append(prefecture)
+        cities.append(city)
+        towns.append(f"町{i}")
+
+    ken_all = pd.DataFrame(
+        {
+            "id": range(1, rows + 1),
+            "zipcode": [f"{rng.randrange(10_000_000):07d}" for _ in range(rows)],
+            "prefecture": prefectures,
+            "city": cities,
+            "town": towns,
+        }
+    )
+    ken_all["address"] = ken_all["prefecture"] + ken_all["city"] + ken_all["town"]
+
+    return ken_all
+
+
+def measure(func, df: pd.DataFrame, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, 'zipcode.db')}")
+            started = time.perf_counter()
+            func(engine, df, "ken_all")
+            best = min(best, time.perf_counter() - started)
+            engine.dispose()
+
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=124_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows)
+
+    legacy = measure(legacy_load, df, args.repeat)
+    current = measure(current_load, df, args.repeat)
+    print(f"rows: {args.rows}")
+    print(f"legacy (to_sql):       {legacy * 1000:9.1f} ms")
+    print(f"current (bulk_load):   {current * 1000:9.1f} ms")
+    print(f"speedup:               {legacy / current:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
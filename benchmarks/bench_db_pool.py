@@ -0,0 +1,129 @@
+"""API用engineの負荷テスト
+
+郵便番号検索と同じクエリ（件数 + 1ページ分）を、1リクエストごとにセッションを開いて実行し、
+同時クライアント数ごとのレイテンシ（p50/p99）とスループットを比較する。
+    legacy:  create_engine(check_same_thread=False)（NullPool、デフォルトのpragma）
+    current: database.create_db_engine()（読み取り専用、QueuePool、mmap/cache_size/temp_store）
+    python benchmarks/bench_db_pool.py --rows 124000 --requests 2000
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "fastapi"))
+import database  # noqa: E402
+import models  # noqa: E402
+
+CONCURRENCY = [1, 8, 32]
+
+
+def make_database(path: str, rows: int, seed: int = 0) -> List[str]:
+    """ken_allと同じスキーマのDBを作成し、検索に使う郵便番号を返す"""
+    rng = random.Random(seed)
+    engine = create_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(engine)
+    engine.dispose()
+
+    zipcodes = [f"{rng.randrange(10_000_000):07d}" for _ in range(rows // 2)]
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO ken_all (id, zipcode, prefecture, city, town, address) "
+            "VALUES (?, ?, '東京都', '千代田区', ?, ?)",
+            (
+                (i, rng.choice(zipcodes), f"町{i}", f"東京都千代田区町{i}")
+                for i in range(1, rows + 1)
+            ),
+        )
+        conn.execute("ANALYZE")
+
+    return zipcodes
+
+
+def request(session_factory: sessionmaker, zipcode: str) -> float:
+    """1リクエスト分（セッションを開いて件数と1ページ分を取得）の時間"""
+    started = time.perf_counter()
+    db = session_factory()
+    try:
+        query = db.query(models.KenAll).filter(models.KenAll.zipcode == zipcode)
+        query.with_entities(func.count(models.KenAll.id)).scalar()
+        query.order_by(models.KenAll.id).limit(50).all()
+    finally:
+        db.close()
+
+    return time.perf_counter() - started
+
+
+def run(engine: Engine, zipcodes: List[str], clients: int, requests: int) -> dict:
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+    rng = random.Random(clients)
+    targets = [rng.choice(zipcodes) for _ in range(requests)]
+    lock = threading.Lock()
+    latencies: List[float] = []
+
+    def client(chunk: List[str]) -> None:
+        results = [request(session_factory, zipcode) for zipcode in chunk]
+        with lock:
+            latencies.extend(results)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        for i in range(clients):
+            executor.submit(client, targets[i::clients])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "rps": len(latencies) / elapsed,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=124_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "zipcode.db")
+        zipcodes = make_database(path, args.rows)
+
+        engines = {
+            "legacy": create_engine(
+                f"sqlite:///{path}", connect_args={"check_same_thread": False}
+            ),
+            "current": database.create_db_engine(path),
+        }
+        database.warm_up(engines["current"])
+
+        print(f"rows: {args.rows}, requests: {args.requests}")
+        print(f"{'engine':8} {'clients':>7} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+        for clients in CONCURRENCY:
+            for name, engine in engines.items():
+                result = run(engine, zipcodes, clients, args.requests)
+                print(
+                    f"{name:8} {clients:7d} {result['p50']:8.2f} "
+                    f"{result['p99']:8.2f} {result['rps']:8.0f}"
+                )
+
+        for engine in engines.values():
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""/ken_all/export（functions/export.py）のベンチマーク
+
+ken_all全件をNDJSON / CSV（それぞれgzipあり・なし）で出力する時間と、
+出力中のPythonのピークメモリ（tracemalloc）を、全件を読み込んでから1つのJSONにする場合と比較する。
+    python benchmarks/bench_export.py --rows 124000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Tuple
+
+from bench_db_pool import make_database
+
+FASTAPI_DIR = Path(__file__).resolve().parents[1] / "fastapi"
+sys.path.append(str(FASTAPI_DIR))
+
+
+def measure(func: Callable[[], int]) -> Tuple[float, float, int]:
+    """(秒, ピークメモリMiB, 出力バイト数)
+    tracemallocは遅くなるので、時間とメモリは別々に計測する
+    """
+    started = time.perf_counter()
+    size = func()
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed, peak / 2**20, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=124_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_database(os.path.join(tmp, "zipcode.db"), args.rows)
+        # database.pyはカレントディレクトリのzipcode.dbを開く
+        os.chdir(tmp)
+        os.environ["DB_POOL_SIZE"] = "1"
+
+        import models
+        from functions import export
+        from sqlalchemy.orm import Session
+
+        import database
+
+        def stream(fmt: str, accept_encoding: str) -> int:
+            response = export.export_response(models.KenAll, None, fmt, accept_encoding)
+
+            async def consume() -> int:
+                size = 0
+                async for chunk in response.body_iterator:
+                    size += len(chunk)
+                return size
+
+            return asyncio.run(consume())
+
+        def materialize() -> int:
+            # ページングのAPIと同じくORMオブジェクトを全件作り、1つのJSONにする
+            with Session(database.engine) as db:
+                rows = db.query(models.KenAll).order_by(models.KenAll.id).all()
+                body = json.dumps(
+                    [
+                        {
+                            "zipcode": row.zipcode,
+                            "prefecture": row.prefecture,
+                            "city": row.city,
+                            "town": row.town,
+                            "address": row.address,
+                        }
+                        for row in rows
+                    ],
+                    ensure_ascii=False,
+                ).encode("utf-8")
+            return len(body)
+
+        cases = [
+            ("ndjson", lambda: stream("ndjson", "")),
+            ("ndjson + gzip", lambda: stream("ndjson", "gzip")),
+            ("csv", lambda: stream("csv", "")),
+            ("csv + gzip", lambda: stream("csv", "gzip")),
+            ("all() + json (materialized)", materialize),
+        ]
+        print(f"{args.rows} rows")
+        for name, func in cases:
+            elapsed, peak, size = measure(func)
+            print(
+                f"{name:<28} {elapsed:6.2f}s  peak {peak:7.1f} MiB  "
+                f"{size / 2**20:6.1f} MiB out  {args.rows / elapsed:8.0f} rows/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
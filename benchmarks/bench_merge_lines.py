@@ -0,0 +1,102 @@
+"""merge_lines（create_merged_list）のベンチマーク
+
+iterrowsで1行ずつ処理していた旧実装と、累積和 + groupbyの現実装を比較する。
+    python benchmarks/bench_merge_lines.py --rows 124000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "get_data" / "parser"))
+from parse_utils import create_merged_list  # noqa: E402
+
+
+def legacy_create_merged_list(ken_all: pd.DataFrame, column_name: str) -> List[str]:
+    """旧実装（iterrows）"""
+    lst = []
+    cnt = 0
+    town = ""
+    for _, row in ken_all.iterrows():
+        if row["is_even_paren"] is False:
+            cnt += 1
+
+        if cnt == 0:
+            lst.append(row[column_name])
+        elif cnt == 1:
+            town += row[column_name]
+            lst.append("NEXT")
+        elif cnt == 2:
+            town += row[column_name]
+            lst.append(town)
+            cnt = 0
+            town = ""
+
+    return lst
+
+
+def make_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """KEN_ALLと同じ割合（約1%）で2〜4行にまたがる町域名を含むDF"""
+    rng = random.Random(seed)
+    towns = []
+    while len(towns) < rows:
+        if rng.random() < 0.01:
+            lines = rng.randint(2, 4)
+            towns.append(f"町{len(towns)}(第1地割、")
+            towns.extend(f"字{i}、" for i in range(lines - 2))
+            towns.append("その他)")
+        else:
+            towns.append(f"町{len(towns)}")
+    towns = towns[:rows]
+
+    ken_all = pd.DataFrame(
+        {
+            "郵便番号": [f"{i:07d}" for i in range(rows)],
+            "都道府県名": "東京都",
+            "市区町村名": "千代田区",
+            "町域名": towns,
+        }
+    )
+    ken_all["is_even_paren"] = ken_all["町域名"].str.count(r"\(") == ken_all[
+        "町域名"
+    ].str.count(r"\)")
+
+    return ken_all
+
+
+def measure(func, ken_all: pd.DataFrame, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(ken_all, "町域名")
+        best = min(best, time.perf_counter() - started)
+
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=124_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    ken_all = make_frame(args.rows)
+    assert create_merged_list(ken_all, "町域名") == legacy_create_merged_list(
+        ken_all, "町域名"
+    )
+
+    legacy = measure(legacy_create_merged_list, ken_all, args.repeat)
+    current = measure(create_merged_list, ken_all, args.repeat)
+    print(f"rows: {args.rows}")
+    print(f"legacy (iterrows):     {legacy * 1000:9.1f} ms")
+    print(f"current (vectorized):  {current * 1000:9.1f} ms")
+    print(f"speedup:               {legacy / current:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+"""preproc_ken_allのベンチマーク
+
+列全体に約40回の置換を順番にかけていた旧実装と、
+ルール表（TOWN_RULES）を1行ずつ1回で適用する現実装を比較し、出力が一致するか確認する。
+    python benchmarks/bench_preproc_ken_all.py --rows 124000
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+import unicodedata
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "get_data" / "parser"))
+from parse_utils import add_prefix_and_suffix, preproc_ken_all  # noqa: E402
+
+# ルールに掛かる町域名（コメントの例と個別対応の町域名）
+SAMPLE_TOWNS = [
+    "以下に掲載がない場合",
+    "琴平町の次に1〜426番地がくる場合(川東)",
+    "大通西の次に番地がくる場合",
+    "南箕輪村一円",
+    "一円",
+    "越中畑64地割〜越中畑66地割",
+    "桂子沢75地割、桂子沢76地割",
+    "種市第50地割〜第70地割(大沢、城内、滝沢)",
+    "上野(全域)",
+    "本町(丁目)",
+    "大手町(各町)",
+    "西新井(大字、番地)",
+    "本郷(番地)",
+    "栗山無番地",
+    "北山番地のみ",
+    "南山(無番地)",
+    "大沢(○○屋敷)",
+    "丸の内JPタワー(地階・階層不明)",
+    "西新宿(高層棟)",
+    "赤坂赤坂アークヒルズ・アーク森ビル(1階)",
+    "緑町(雇用促進住宅)",
+    "古込(成田国際空港内)",
+    "下増田仙台空港関係施設",
+    "大通(1〜3丁目を除く)",
+    "本町「6〜8番地を除く」",
+    "北一条(大通を含む)",
+    "大野(100番地以上)",
+    "大野(99番地以下)",
+    "川原(1〜5番地以内)",
+    "中町(3番地以降)",
+    "宮町(1、2番地以外)",
+    "山田町下谷上(菊水山、高座川向、中一里山「9番地の4、12番地」、長尾山)",
+    "添川渡戸沢「筍沢温泉」",
+    "大江(1丁目、2丁目「651、662、668番地」以外、3丁目5、3丁目13−4)",
+    "飯盛(その他)",
+    "東洋(油駒、南東洋、132〜156、158〜354、366、367番地)",
+    "中央(1、2丁目)",
+    "甲、乙(吉ケ浦)",
+    "野牛稲崎平302番地・315番地",
+    "戸山3丁目18・21番",
+    "御料牧場・成田国際空港内",
+    "大豆4の2・4・6番地",
+    "新所・岡崎・梅田入会地",
+    "岡之原町832の2・4",
+    "結東逆巻・前倉・結東",
+    "北山渋御殿湯・渋の湯",
+    "中山町出渕豊岡・東町",
+    "浦ノ内東分鳴無・坂内",
+    "釜ケ島土手畑・藤場",
+    "牧白滝B・C",
+    "土居甲・乙",
+    "北13条西(1−3丁目)",
+]
+
+
+def legacy_preproc_ken_all(ken_all: pd.DataFrame) -> pd.DataFrame:
+    """旧実装（列全体に約40回の置換を順番にかける）
+    Args:
+        ken_all(DataFrame): KEN_ALL.CSVのDataFrame（前処理前）
+    Returns:
+        ken_all(DataFrame): KEN_ALL.CSVのDataFrame（前処理後）
+    """
+    # '以下に掲載がない場合'を削除
+    ken_all["町域名"].replace("以下に掲載がない場合", "", inplace=True)
+
+    # 'の次に番地がくる場合'を削除
+    ken_all["町域名"].replace(r".*の次に番地がくる場合", "", regex=True, inplace=True)
+
+    # 'の次に(n〜n)番地(以降)がくる場合'を含む'()'とかっこ内を削除
+    # 例) 〒7660001 琴平町の次に1〜426番地がくる場合(川東) -> ''
+    ken_all["町域名"].replace(
+        r".*の次に[\d〜−]+番地(以降)?がくる場合.*", "", regex=True, inplace=True
+    )
+
+    # '～一円'となっている場合のみ'一円'を削除
+    # 例1) 〒3994511 南箕輪村一円 -> 南箕輪村
+    # 例2) 〒5220317 一円 -> 一円
+    ken_all["町域名"] = ken_all["町域名"].apply(
+        lambda x: re.sub(r"一円", "", x) if "一円" in x and len(x) > 2 else x
+    )
+
+    # '(第)n地割〜(第)n地割'を削除
+    # 例1) 〒0295523 越中畑64地割〜越中畑66地割 -> 越中畑
+    # 例2) 〒0295523 桂子沢75地割、桂子沢76地割 -> 桂子沢
+    # 例3) 〒0287917 種市第50地割〜第70地割(大沢、城内、滝沢) -> 種市(大沢、城内、滝沢)
+    ken_all["町域名"].replace(r"第?\d+地割(〜|、).*地割", "", regex=True, inplace=True)
+
+    # n地割を削除
+    ken_all["町域名"].replace(r"第?\d+地割", "", regex=True, inplace=True)
+
+    # '(全域)'を削除
+    ken_all["町域名"].replace(r"\(全域\)", "", regex=True, inplace=True)
+
+    # '(丁目)'を削除
+    ken_all["町域名"].replace(r"\(丁目\)", "", regex=True, inplace=True)
+
+    # '(各町)'を削除
+    ken_all["町域名"].replace(r"\(各町\)", "", regex=True, inplace=True)
+
+    # '（大字、番地）'を削除
+    ken_all["町域名"].replace(r"\(大字、番地\)", "", regex=True, inplace=True)
+
+    # '(番地)'を削除
+    ken_all["町域名"].replace(r"\(番地\)", "", regex=True, inplace=True)
+
+    # '無番地'を削除
+    ken_all["町域名"].replace(r"無番地", "", regex=True, inplace=True)
+
+    # '無番のみ'を削除
+    ken_all["町域名"].replace(r"番地のみ", "", regex=True, inplace=True)
+
+    # '(無番地)'を削除
+    ken_all["町域名"].replace(r"\(無番地\)", "", regex=True, inplace=True)
+
+    # '(○○屋敷)'を削除
+    ken_all["町域名"].replace(r"\(○○屋敷\)", "", regex=True, inplace=True)
+
+    # '(地階・階層不明)'を削除
+    ken_all["町域名"].replace(r"\(地階・階層不明\)", "", regex=True, inplace=True)
+
+    # '(高層棟)'を削除
+    ken_all["町域名"].replace(r"\(高層棟\)", "", regex=True, inplace=True)
+
+    # '(n階)'から'()'を削除
+    # 例) 〒1076001 赤坂赤坂アークヒルズ・アーク森ビル(1階) -> 赤坂赤坂アークヒルズ・アーク森ビル1階
+    ken_all["町域名"] = ken_all["町域名"].apply(
+        lambda x: re.sub(r"\(|\)", " ", x).strip() if re.match(r".*\(\d+階\)", x) else x
+    )
+
+    # '（雇用促進住宅）'を削除
+    ken_all["町域名"].replace(r"\(雇用促進住宅\)", "", regex=True, inplace=True)
+
+    # '（成田国際空港）'を削除
+    ken_all["町域名"].replace(r"\(成田国際空港内\)", "", regex=True, inplace=True)
+
+    # '仙台空港関係施設'を削除
+    ken_all["町域名"].replace(r"仙台空港関係施設", "", regex=True, inplace=True)
+
+    # '(～を除く)'を削除
+    ken_all["町域名"].replace(r"\(.*を除く\)$", "", regex=True, inplace=True)
+
+    # '「～を除く」'を削除
+    ken_all["町域名"].replace(r"「.*を除く」", "", regex=True, inplace=True)
+
+    # 'を含む'を含む'(～)'を削除
+    ken_all["町域名"] = ken_all["町域名"].apply(
+        lambda x: re.sub(r"\(.*\)", "", x) if "を含む" in x else x
+    )
+
+    # '以上'を含む'(～)'を削除
+    ken_all["町域名"] = ken_all["町域名"].apply(
+        lambda x: re.sub(r"\(.*\)", "", x) if "以上" in x else x
+    )
+
+    # '以下'を含む'(～)'を削除
+    ken_all["町域名"] = ken_all["町域名"].apply(
+        lambda x: re.sub(r"\(.*\)", "", x) if "以下" in x else x
+    )
+
+    # '以内'を含む'(～)'を削除
+    ken_all["町域名"] = ken_all["町域名"].apply(
+        lambda x: re.sub(r"\(.*\)", "", x) if "以内" in x else x
+    )
+
+    # '以降'を含む'(～)'を削除
+    ken_all["町域名"] = ken_all["町域名"].apply(
+        lambda x: re.sub(r"\(.*\)", "", x) if "以降" in x else x
+    )
+
+    # '～以外)'で終わる'(～)'を削除
+    ken_all["町域名"] = ken_all["町域名"].apply(
+        lambda x: re.sub(r"\(.*\)", "", x) if re.match(r".*以外\)$", x) else x
+    )
+
+    # '中一里山「9番地の4、12番地」'を分解
+    # 例) 〒6520071 山田町下谷上（菊水山、高座川向、中一里山「9番地の4、12番地」、...
+    # -> 山田町下谷上（菊水山、高座川向、中一里山9番地の4、中一里山12番地、...
+    ken_all["町域名"].replace(
+        r"中一里山「9番地の4、12番地」",
+        "中一里山9番地の4番地、中一里山12番地",
+        regex=True,
+        inplace=True,
+    )
+
+    # '「～」'or'「～」以外'を削除
+    # 例) 〒9996652 添川渡戸沢「筍沢温泉」 -> 添川渡戸沢
+    # 例) 〒0482402 大江(1丁目、2丁目「651、662、668番地」以外、... -> 大江(1丁目、2丁目、...
+    ken_all["町域名"].replace(r"「.*」(以外)?", "", regex=True, inplace=True)
+
+    # 'その他'を含む'(～)'を削除
+    ken_all["町域名"] = ken_all["町域名"].apply(
+        lambda x: re.sub(r"\(.*\)", "", x) if "その他" in x else x
+    )
+
+    # '()'内の記載で必要なものを展開
+    # 例) 〒0580343 東洋(油駒、南東洋、132〜156、158〜354、366、367番地) -> 東洋、東洋油駒、東洋南東洋、東洋366番地、東洋367番地
+    ken_all["町域名"] = ken_all["町域名"].apply(add_prefix_and_suffix)
+
+    # '()'を削除(かっこ内が空)
+    ken_all["町域名"].replace(r"\(\)", "", inplace=True)
+
+    """
+    ・が入ってる町域名のうち、修正が必要なものは個別対応
+    """
+    # 〒0350003 野牛稲崎平302番地・315番地 -> 野牛稲崎平302番地、野牛稲崎平315番地
+    ken_all["町域名"].replace(
+        r"野牛稲崎平302番地・315番地",
+        "野牛稲崎平302番地、野牛稲崎平315番地",
+        regex=True,
+        inplace=True,
+    )
+
+    # 〒1690052 戸山3丁目18・21番 -> 戸山3丁目18、戸山3丁目21番
+    ken_all["町域名"].replace(
+        r"戸山3丁目18・21番", "戸山3丁目18番、戸山3丁目21番", regex=True, inplace=True
+    )
+
+    # 〒2820011 御料牧場・成田国際空港内 -> 御料牧場
+    ken_all["町域名"].replace(
+        r"御料牧場・成田国際空港内", "御料牧場", regex=True, inplace=True
+    )
+
+    # 〒9420083 大豆4の2・4・6番地 -> 大豆4の2番地、大豆4の4番地、大豆4の6番地
+    ken_all["町域名"].replace(
+        r"大豆4の2・4・6番地",
+        "大豆4の2番地、大豆4の4番地、大豆4の6番地",
+        regex=True,
+        inplace=True,
+    )
+
+    # 〒4310423 新所・岡崎・梅田入会地 -> 新所、岡崎、梅田入会地
+    ken_all["町域名"].replace(
+        r"新所・岡崎・梅田入会地", "新所、岡崎、梅田入会地", regex=True, inplace=True
+    )
+
+    # 〒8920876 岡之原町832の2・4 -> 岡之原町832の2、岡之原町832の4
+    ken_all["町域名"].replace(
+        r"岡之原町832の2・4", "岡之原町832の2、岡之原町832の4", regex=True, inplace=True
+    )
+
+    # 〒9498316 結東逆巻・前倉・結東 -> 結東逆巻、結東前倉、結東
+    ken_all["町域名"].replace(
+        r"結東逆巻・前倉・結東", "結東逆巻、結東前倉、結東", regex=True, inplace=True
+    )
+
+    # 〒3910212 北山渋御殿湯・渋の湯 -> 北山渋御殿湯、北山渋の湯
+    ken_all["町域名"].replace(
+        r"北山渋御殿湯・渋の湯", "北山渋御殿湯、北山渋の湯", regex=True, inplace=True
+    )
+
+    # 〒7913203 中山町出渕豊岡・東町 -> 中山町出渕豊岡、中山町出渕東町
+    ken_all["町域名"].replace(
+        r"中山町出渕豊岡・東町",
+        "中山町出渕豊岡、中山町出渕東町",
+        regex=True,
+        inplace=True,
+    )
+
+    # 〒7850163 浦ノ内東分鳴無・坂内 -> 浦ノ内東分鳴無、浦ノ内東分坂内
+    ken_all["町域名"].replace(
+        r"浦ノ内東分鳴無・坂内",
+        "浦ノ内東分鳴無、浦ノ内東分坂内",
+        regex=True,
+        inplace=True,
+    )
+
+    # 〒9401172 釜ケ島土手畑・藤場 -> 釜ケ島土手畑、釜ケ島藤場
+    ken_all["町域名"].replace(
+        r"釜ケ島土手畑・藤場", "釜ケ島土手畑、釜ケ島藤場", regex=True, inplace=True
+    )
+
+    # 〒8700924 牧白滝B・C -> 牧白滝B、牧白滝C
+    ken_all["町域名"].replace(
+        r"牧白滝B・C", "牧白滝B、牧白滝C", regex=True, inplace=True
+    )
+
+    # 〒7811606 土居甲・乙 -> 土居甲、土居乙
+    ken_all["町域名"].replace(r"土居甲・乙", "土居甲、土居乙", regex=True, inplace=True)
+
+    """
+    仕上げ
+    """
+    # ハイフンを半角に変換
+    ken_all["町域名"].replace(r"−", "-", regex=True, inplace=True)
+
+    # '、'区切りの町域名を行分割
+    # 例) 〒7614104 甲、乙(吉ケ浦)
+    ken_all = ken_all.assign(町域名=ken_all["町域名"].str.split("、")).explode("町域名")
+
+    # 完全重複行を削除
+    ken_all.drop_duplicates(inplace=True)
+
+    # 列名リネーム
+    ken_all = ken_all.rename(
+        columns={
+            "郵便番号": "zipcode",
+            "都道府県名": "prefecture",
+            "市区町村名": "city",
+            "町域名": "town",
+        }
+    )
+
+    # 住所を結合した列を追加
+    ken_all["address"] = ken_all["prefecture"] + ken_all["city"] + ken_all["town"]
+
+    return ken_all
+
+
+def make_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """SAMPLE_TOWNSを約5%含む、merge_lines後と同じ形のDF"""
+    rng = random.Random(seed)
+    samples = [unicodedata.normalize("NFKC", town) for town in SAMPLE_TOWNS]
+    towns = [
+        rng.choice(samples) if rng.random() < 0.05 else f"町{i}"
+        for i in range(rows - len(samples))
+    ]
+    towns.extend(samples)
+
+    ken_all = pd.DataFrame(
+        {
+            "郵便番号": [f"{i:07d}" for i in range(rows)],
+            "都道府県名": "東京都",
+            "市区町村名": "千代田区",
+            "町域名": towns,
+        }
+    )
+    ken_all.insert(0, "id", [str(i) for i in range(1, rows + 1)])
+
+    return ken_all
+
+
+def measure(func, ken_all: pd.DataFrame, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        df = ken_all.copy()
+        started = time.perf_counter()
+        result = func(df)
+        best = min(best, time.perf_counter() - started)
+
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=124_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    ken_all = make_frame(args.rows)
+    legacy, expected = measure(legacy_preproc_ken_all, ken_all, args.repeat)
+    current, actual = measure(preproc_ken_all, ken_all, args.repeat)
+    assert actual.equals(expected), "output differs from the legacy pipeline"
+
+    print(f"rows: {args.rows}")
+    print(f"legacy (column passes): {legacy * 1000:9.1f} ms")
+    print(f"current (rule table):   {current * 1000:9.1f} ms")
+    print(f"speedup:                {legacy / current:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
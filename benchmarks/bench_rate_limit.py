@@ -0,0 +1,164 @@
+"""レート制限（functions/rate_limit.py）のオーバーヘッドのベンチマーク
+
+1. トークンバケツ1回の確認（SQLiteファイルの読み込みと書き込み、ワーカー内のメモリ）のレイテンシ（p50/p99）
+   slowapiが使っていたlimitsのインメモリストレージ（固定ウィンドウ）がある場合は比較する
+2. 1リクエストあたりのオーバーヘッド（GET /をレート制限あり・なしで比較）
+3. 複数プロセスで同じバケツを使った場合のスループットと、受け付けた回数（容量ちょうどになること）
+    python benchmarks/bench_rate_limit.py --checks 20000 --processes 4
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "fastapi"))
+
+# 同時に制限を確認するクライアント（IPアドレス）の数
+CLIENTS = 1000
+
+
+def measure(func: Callable[[int], object], checks: int) -> dict:
+    latencies = []
+    for i in range(checks):
+        started = time.perf_counter()
+        func(i)
+        latencies.append(time.perf_counter() - started)
+
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies) * 1e6,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1e6,
+    }
+
+
+def bench_storage(path: str, checks: int) -> None:
+    from functions.rate_limit import LocalBuckets, TokenBucketStorage, parse_limit
+
+    storage = TokenBucketStorage(path)
+    rate = parse_limit("5/minute")
+    rng = random.Random(0)
+    keys = [f"ken_all:10.0.{i // 256}.{i % 256}" for i in range(CLIENTS)]
+    sequence = [rng.choice(keys) for _ in range(checks)]
+    result = measure(lambda i: storage.take(sequence[i], rate), checks)
+    print(
+        f"token bucket (sqlite): p50 {result['p50']:.1f} us, "
+        f"p99 {result['p99']:.1f} us"
+    )
+
+    # リクエストごとの確認（ワーカー内のメモリ、ファイルへの反映はバックグラウンド）
+    local = LocalBuckets(lambda: storage, 1.0)
+    result = measure(lambda i: local.take(sequence[i], rate), checks)
+    print(
+        f"token bucket (in-process, synced every 1s): p50 {result['p50']:.1f} us, "
+        f"p99 {result['p99']:.1f} us"
+    )
+
+    try:
+        from limits import parse
+        from limits.storage import MemoryStorage
+        from limits.strategies import FixedWindowRateLimiter
+    except ImportError:
+        return
+
+    limiter = FixedWindowRateLimiter(MemoryStorage())
+    item = parse("5/minute")
+    result = measure(lambda i: limiter.hit(item, sequence[i]), checks)
+    print(
+        f"fixed window (limits, in-process memory): p50 {result['p50']:.1f} us, "
+        f"p99 {result['p99']:.1f} us"
+    )
+
+
+def bench_requests(requests: int) -> None:
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from functions.rate_limit import limiter
+    from routes import index
+
+    app = FastAPI()
+    app.include_router(index.router)
+    with TestClient(app) as client:
+        results = {}
+        for enabled in (False, True, False, True):
+            limiter.enabled = enabled
+            latencies = []
+            for _ in range(requests):
+                started = time.perf_counter()
+                client.get("/")
+                latencies.append(time.perf_counter() - started)
+            results[enabled] = statistics.median(latencies) * 1e6
+    print(
+        f"GET / p50: {results[False]:.0f} us without limit, "
+        f"{results[True]:.0f} us with limit "
+        f"(+{results[True] - results[False]:.0f} us)"
+    )
+
+
+def worker(path: str, checks: int, capacity: int, queue) -> None:
+    from functions.rate_limit import Rate, TokenBucketStorage
+
+    storage = TokenBucketStorage(path)
+    # 補充はほぼ無し（容量ちょうどだけ受け付けるはず）
+    rate = Rate(float(capacity), 1e-9)
+    allowed = 0
+    started = time.perf_counter()
+    for _ in range(checks):
+        allowed += storage.take("shared", rate)[0]
+    queue.put((allowed, time.perf_counter() - started))
+
+
+def bench_processes(path: str, processes: int, checks: int, capacity: int) -> None:
+    queue = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=worker, args=(path, checks, capacity, queue))
+        for _ in range(processes)
+    ]
+    started = time.perf_counter()
+    for process in workers:
+        process.start()
+    results: List[tuple] = [queue.get() for _ in workers]
+    for process in workers:
+        process.join()
+    elapsed = time.perf_counter() - started
+
+    allowed = sum(allowed for allowed, _ in results)
+    print(
+        f"{processes} processes x {checks} checks on one bucket: "
+        f"{processes * checks / elapsed:.0f} checks/s, "
+        f"allowed {allowed} (capacity {capacity})"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--checks", type=int, default=20_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--capacity", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # routes/index.pyのlimiterもこのファイルを使い、ベンチマーク中は制限にかからないようにする
+        os.environ["RATE_LIMIT_STORAGE"] = os.path.join(tmp, "ratelimit.db")
+        os.environ["RATE_LIMITS"] = json.dumps({"index": "1000000000/second"})
+
+        bench_storage(os.path.join(tmp, "storage.db"), args.checks)
+        bench_requests(args.requests)
+        bench_processes(
+            os.path.join(tmp, "shared.db"),
+            args.processes,
+            args.checks // args.processes,
+            args.capacity,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""FAST_SERIALIZATION（列のタプル + orjson）のベンチマーク
+
+1000行あたりの時間を、シリアライズだけ（ページ作成 + JSON化）と、取得 + シリアライズで比較する。
+    既定: ORMオブジェクト -> Page[schemas.KenAll]で検証 -> jsonable_encoder -> json
+    高速: レスポンスの列だけのタプル -> dict -> 検証しないページ -> orjson
+ページはAPIの上限（size=100）で、1000行分（10ページ）ずつ計測する。
+    python benchmarks/bench_serialization.py --rows 124000 --repeat 20
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+from bench_db_pool import make_database
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "fastapi"))
+
+PAGE_SIZE = 100
+ROWS_PER_RUN = 1000
+
+
+def measure(run: Callable[[], Tuple[float, float]], repeat: int) -> Tuple[float, float]:
+    """1000行あたりの(シリアライズの時間, 取得 + シリアライズの時間)のmedian（ms）"""
+    serialize: List[float] = []
+    total: List[float] = []
+    for _ in range(repeat):
+        fetch_seconds, serialize_seconds = run()
+        serialize.append(serialize_seconds * 1000)
+        total.append((fetch_seconds + serialize_seconds) * 1000)
+
+    return statistics.median(serialize), statistics.median(total)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=124_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_database(os.path.join(tmp, "zipcode.db"), args.rows)
+        # database.pyはカレントディレクトリのzipcode.dbを開く
+        os.chdir(tmp)
+        os.environ["DB_POOL_SIZE"] = "1"
+
+        import models
+        import schemas
+        from fastapi_pagination import Page, Params
+        from fastapi_pagination.api import set_page
+        from functions.cache import encode_page
+        from functions.ken_all import RESPONSE_COLUMNS
+        from functions.pagination import create_raw_page
+        from sqlalchemy.orm import Session
+
+        import database
+
+        page_type = Page[schemas.KenAll]
+        names = [column.key for column in RESPONSE_COLUMNS]
+        db = Session(database.engine)
+        query = db.query(models.KenAll).order_by(models.KenAll.id)
+        pages = [
+            Params(page=page, size=PAGE_SIZE)
+            for page in range(1, ROWS_PER_RUN // PAGE_SIZE + 1)
+        ]
+
+        def run_default() -> Tuple[float, float]:
+            fetch = serialize = 0.0
+            for params in pages:
+                started = time.perf_counter()
+                raw = params.to_raw_params()
+                items = query.offset(raw.offset).limit(raw.limit).all()
+                fetched = time.perf_counter()
+                encode_page(page_type.create(items, args.rows, params))
+                fetch += fetched - started
+                serialize += time.perf_counter() - fetched
+            # セッションが持つORMオブジェクトを捨てる（毎回作り直す）
+            db.expunge_all()
+            return fetch, serialize
+
+        def run_fast() -> Tuple[float, float]:
+            fetch = serialize = 0.0
+            fast_query = query.with_entities(models.KenAll.id, *RESPONSE_COLUMNS)
+            with set_page(page_type):
+                for params in pages:
+                    started = time.perf_counter()
+                    raw = params.to_raw_params()
+                    rows = fast_query.offset(raw.offset).limit(raw.limit).all()
+                    fetched = time.perf_counter()
+                    items = [dict(zip(names, row[1:])) for row in rows]
+                    encode_page(create_raw_page(items, args.rows, params), fast=True)
+                    fetch += fetched - started
+                    serialize += time.perf_counter() - fetched
+            return fetch, serialize
+
+        # 同じJSONになることを確認
+        with set_page(page_type):
+            params = pages[0]
+            items = query.limit(PAGE_SIZE).all()
+            rows = query.with_entities(*RESPONSE_COLUMNS).limit(PAGE_SIZE).all()
+            raw_items = [dict(zip(names, row)) for row in rows]
+            assert encode_page(page_type.create(items, args.rows, params)) == (
+                encode_page(create_raw_page(raw_items, args.rows, params), fast=True)
+            )
+
+        print(f"per {ROWS_PER_RUN} rows (size={PAGE_SIZE}, median of {args.repeat})")
+        results = {}
+        for name, run in (("default", run_default), ("fast", run_fast)):
+            run()  # ウォームアップ
+            results[name] = measure(run, args.repeat)
+            serialize, total = results[name]
+            print(
+                f"{name:<8} serialize {serialize:7.2f} ms  "
+                f"fetch + serialize {total:7.2f} ms"
+            )
+        print(
+            f"speedup: serialize x{results['default'][0] / results['fast'][0]:.1f}, "
+            f"fetch + serialize x{results['default'][1] / results['fast'][1]:.1f}"
+        )
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""/ken_all/suggest（functions/suggest.py）のベンチマーク
+
+前方一致の入力補完1回あたりのレイテンシ（p50/p99）を、
+住所検索と同じLIKE '%...%'（1ページ分）と比較する。入力は1文字ずつ打ったときの途中の文字列。
+    python benchmarks/bench_suggest.py --rows 124000 --queries 2000
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from sqlalchemy import create_engine
+
+from bench_db_pool import make_database
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "fastapi"))
+from functions.suggest import SuggestIndex  # noqa: E402
+
+LIMIT = 10
+
+
+def measure(func: Callable[[str], list], queries: List[str]) -> dict:
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        func(query)
+        latencies.append(time.perf_counter() - started)
+
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=124_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "zipcode.db")
+        zipcodes = make_database(path, args.rows)
+        engine = create_engine(f"sqlite:///{path}")
+        index = SuggestIndex.load(engine)
+        engine.dispose()
+
+        rng = random.Random(0)
+        with sqlite3.connect(path) as conn:
+            addresses = [
+                address
+                for (address,) in conn.execute("SELECT address FROM ken_all LIMIT 1000")
+            ]
+            # 1文字ずつ入力したときの途中の文字列
+            zipcode_queries, address_queries = [], []
+            for _ in range(args.queries):
+                zipcode = rng.choice(zipcodes)
+                zipcode_queries.append(zipcode[: rng.randint(1, 7)])
+                address = rng.choice(addresses)
+                address_queries.append(address[: rng.randint(1, len(address))])
+
+            def like(query: str) -> list:
+                return conn.execute(
+                    "SELECT zipcode, address FROM ken_all WHERE address LIKE ? "
+                    "ORDER BY id LIMIT ?",
+                    (f"%{query}%", LIMIT),
+                ).fetchall()
+
+            results = {
+                "suggest zipcode": measure(
+                    lambda query: index.by_zipcode(query, LIMIT), zipcode_queries
+                ),
+                "suggest address": measure(
+                    lambda query: index.by_address(query, LIMIT), address_queries
+                ),
+                "LIKE address": measure(like, address_queries),
+            }
+
+        print(f"rows: {args.rows}, queries: {args.queries}")
+        print(
+            f"index: {len(index)} entries, built in {index.load_seconds * 1000:.0f} ms"
+        )
+        print(f"{'query':16} {'p50 ms':>8} {'p99 ms':>8}")
+        for name, result in results.items():
+            print(f"{name:16} {result['p50']:8.3f} {result['p99']:8.3f}")
+
+
+if __name__ == "__main__":
+    main()
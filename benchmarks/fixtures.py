@@ -0,0 +1,235 @@
+"""ベンチマーク用の合成KEN_ALL.CSV / JIGYOSYO.CSVの作成
+
+実データと同じ列構成・文字コード（全角の町域名、shift_jis / cp932、CRLF）で、
+パーサーが扱う面倒なケースを一定の割合で含める。
+    複数行にまたがる町域名（かっこの途中で改行）、地割、「」の除外、(全域)などの注記、
+    以下に掲載がない場合、一円、'、'区切りの町域名
+scaleは実データ（KEN_ALL約124,000行、JIGYOSYO約22,000行）に対する倍率。
+    python benchmarks/fixtures.py --scale 1 --out /tmp/fixtures/1x [--zip]
+"""
+
+import argparse
+import csv
+import os
+import random
+import zipfile
+from typing import Dict, List
+
+# 実データのおおよその行数（scale=1）
+KEN_ALL_ROWS = 124_000
+JIGYOSYO_ROWS = 22_000
+
+PREFECTURES = [
+    ("北海道", "ﾎｯｶｲﾄﾞｳ"),
+    ("青森県", "ｱｵﾓﾘｹﾝ"),
+    ("岩手県", "ｲﾜﾃｹﾝ"),
+    ("宮城県", "ﾐﾔｷﾞｹﾝ"),
+    ("東京都", "ﾄｳｷｮｳﾄ"),
+    ("神奈川県", "ｶﾅｶﾞﾜｹﾝ"),
+    ("新潟県", "ﾆｲｶﾞﾀｹﾝ"),
+    ("愛知県", "ｱｲﾁｹﾝ"),
+    ("大阪府", "ｵｵｻｶﾌ"),
+    ("兵庫県", "ﾋｮｳｺﾞｹﾝ"),
+    ("広島県", "ﾋﾛｼﾏｹﾝ"),
+    ("福岡県", "ﾌｸｵｶｹﾝ"),
+    ("沖縄県", "ｵｷﾅﾜｹﾝ"),
+]
+STEMS = [
+    "中央",
+    "青葉",
+    "若葉",
+    "桜",
+    "緑",
+    "港",
+    "山田",
+    "川口",
+    "本",
+    "大沢",
+    "松原",
+    "高田",
+]
+CITY_SUFFIXES = ["市", "区", "町", "村"]
+
+# 1行で完結する注記つきの町域名（{}は町名）
+SPECIAL_TOWNS = [
+    "以下に掲載がない場合",
+    "{}一円",
+    "{}（全域）",
+    "{}（丁目）",
+    "{}（番地）",
+    "{}無番地",
+    "{}第１２地割",
+    "{}６４地割〜{}６６地割",
+    "{}「筍沢温泉」",
+    "{}（１丁目、２丁目「６５１、６６２、６６８番地」以外、３丁目５）",
+    "{}（１〜３丁目を除く）",
+    "{}（１００番地以上）",
+    "{}アークヒルズ（地階・階層不明）",
+    "{}アークヒルズ（１階）",
+    "{}（油駒、南東洋、１３２〜１５６、３６６、３６７番地）",
+    "甲、乙（{}）",
+    "{}の次に番地がくる場合",
+]
+
+# 複数行にまたがる町域名（かっこ内を2〜4行に分ける）
+MULTILINE_PARTS = ["第１地割", "第２地割", "字上野", "字下野", "大字", "その他"]
+
+# 全角に変換する文字
+FULL_WIDTH = {c: c + 0xFEE0 for c in range(0x21, 0x7F)}
+FULL_WIDTH[ord("-")] = ord("−")
+
+
+def fw(value: str) -> str:
+    """半角英数字・記号 -> 全角（実データの町域名と同じ形）"""
+    return value.translate(FULL_WIDTH)
+
+
+def make_cities(rng: random.Random, per_prefecture: int = 40) -> List[Dict[str, str]]:
+    cities = []
+    for code, (prefecture, kana) in enumerate(PREFECTURES, 1):
+        for i in range(per_prefecture):
+            suffix = rng.choice(CITY_SUFFIXES)
+            cities.append(
+                {
+                    "jis": f"{code:02d}{i:03d}",
+                    "prefecture": prefecture,
+                    "prefecture_kana": kana,
+                    "city": f"{rng.choice(STEMS)}{i}{suffix}",
+                    "city_kana": f"ｼ{i}",
+                }
+            )
+
+    return cities
+
+
+def ken_all_rows(rows: int, seed: int = 0) -> List[List[str]]:
+    """KEN_ALL.CSVの行（郵便番号順、特殊な町域名を約5%、複数行の町域名を約1%含む）"""
+    rng = random.Random(seed)
+    cities = make_cities(rng)
+    lines: List[List[str]] = []
+    i = 0
+
+    while len(lines) < rows:
+        i += 1
+        # 郵便番号は7桁のまま昇順に振る（scaleが大きい場合は同じ番号の町域が増える）
+        zipcode = 1_000_000 + len(lines) * 8_999_999 // rows
+        city = cities[min(len(cities) - 1, len(lines) * len(cities) // rows)]
+        stem = f"{rng.choice(STEMS)}{i}"
+
+        r = rng.random()
+        if r < 0.01:
+            parts = rng.sample(MULTILINE_PARTS, rng.randint(2, 4))
+            towns = [f"{stem}（{parts[0]}、"]
+            towns += [f"{part}、" for part in parts[1:-1]]
+            towns.append(f"{parts[-1]}）")
+            towns = [fw(town) for town in towns]
+        elif r < 0.06:
+            towns = [fw(rng.choice(SPECIAL_TOWNS).replace("{}", stem))]
+        else:
+            towns = [fw(stem)]
+
+        for town in towns:
+            lines.append(
+                [
+                    city["jis"],
+                    f"{zipcode // 100:05d}",
+                    f"{zipcode:07d}",
+                    city["prefecture_kana"],
+                    city["city_kana"],
+                    "ﾏﾁ",
+                    city["prefecture"],
+                    city["city"],
+                    town,
+                    "0",
+                    "0",
+                    "0",
+                    "0",
+                    "0",
+                    "0",
+                ]
+            )
+
+    return lines[:rows]
+
+
+def jigyosyo_rows(rows: int, seed: int = 0) -> List[List[str]]:
+    """JIGYOSYO.CSVの行"""
+    rng = random.Random(seed + 1)
+    cities = make_cities(random.Random(seed))
+    lines = []
+    for i in range(rows):
+        city = rng.choice(cities)
+        lines.append(
+            [
+                city["jis"],
+                f"ｶﾌﾞｼｷｶﾞｲｼｬ{i}",
+                fw(f"株式会社{rng.choice(STEMS)}{i}"),
+                city["prefecture"],
+                city["city"],
+                fw(f"{rng.choice(STEMS)}{i % 500}"),
+                fw(f"{rng.randint(1, 30)}-{rng.randint(1, 20)}"),
+                f"{rng.randrange(1_000_000, 10_000_000):07d}",
+                "100  ",
+                "銀座",
+                "0",
+                "0",
+                "0",
+            ]
+        )
+
+    return lines
+
+
+def write_csv(path: str, lines: List[List[str]], encoding: str) -> None:
+    with open(path, "w", encoding=encoding, newline="") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL, lineterminator="\r\n")
+        writer.writerows(lines)
+
+
+def write_fixtures(
+    out_dir: str, scale: float = 1, seed: int = 0, zip_files: bool = False
+) -> Dict[str, str]:
+    """KEN_ALL.CSVとJIGYOSYO.CSV（zip_filesならken_all.zipとjigyosyo.zip）を作成
+    Args:
+        out_dir(str): 出力先
+        scale(float): 実データに対する行数の倍率
+        seed(int): 乱数のシード
+        zip_files(bool): クローラーと同じZIPで出力する
+    Returns:
+        paths(dict): テーブル名 -> ファイルパス
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    files = {
+        "ken_all": ("KEN_ALL.CSV", ken_all_rows, KEN_ALL_ROWS, "shift_jis"),
+        "jigyosyo": ("JIGYOSYO.CSV", jigyosyo_rows, JIGYOSYO_ROWS, "cp932"),
+    }
+
+    paths = {}
+    for name, (file_name, make_rows, rows, encoding) in files.items():
+        path = os.path.join(out_dir, file_name)
+        write_csv(path, make_rows(int(rows * scale), seed), encoding)
+        if zip_files:
+            zip_path = os.path.join(out_dir, f"{name}.zip")
+            with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+                zf.write(path, file_name)
+            os.remove(path)
+            path = zip_path
+        paths[name] = path
+
+    return paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=float, default=1, help="1, 10, 100など")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--zip", action="store_true", help="ZIPで出力する")
+    args = parser.parse_args()
+
+    for name, path in write_fixtures(args.out, args.scale, args.seed, args.zip).items():
+        print(f"{name}: {path} ({os.path.getsize(path) / 2**20:.1f} MiB)")
+
+
+if __name__ == "__main__":
+    main()
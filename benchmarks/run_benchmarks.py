@@ -0,0 +1,323 @@
+"""パースパイプラインとAPIのベンチマーク（結果をJSONで保存し、コミット間で比較する）
+
+合成データ（fixtures.py）から一時ディレクトリにDBを作成し、次の時間を計測する。
+    parse: parse_utilsの段階ごと（read, to_narrow, merge_lines, preproc_ken_all, load）
+    api:   ルートごと（zipcode, address, company, 浅い/深いページ、キーセットの深いページ）、
+           同時クライアント数ごとのp50/p99とスループット
+           （uvicornを起動し、キャッシュとレート制限は無効にする）
+    python benchmarks/run_benchmarks.py --scale 1 --clients 1 16
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/old.json new.json
+結果は --output（デフォルトは benchmarks/results/<コミット>.json）に保存する。
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from sqlalchemy import create_engine
+
+from bench_async_routes import free_port, serve, wait_ready
+from fixtures import write_fixtures
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+sys.path.append(str(ROOT / "get_data" / "parser"))
+from parse_utils import (  # noqa: E402
+    bulk_load,
+    create_fulltext_index,
+    create_indexes,
+    make_jigyosyo,
+    make_ken_all,
+    merge_lines,
+    normalize_columns,
+    optimize_database,
+    preproc_ken_all,
+    save_dataset_version,
+    set_index,
+)
+
+# 深いページとして計測するページ番号の上限（size=50）
+PAGE_SIZE = 50
+MAX_DEEP_PAGE = 200
+# 同じURLの同時リクエストはまとめて処理されるので、ページは連続する10ページから選ぶ
+PAGE_WINDOW = 10
+
+# 比較時に悪化とみなす比率
+REGRESSION_RATIO = 1.1
+
+
+def timed(timings: Dict[str, float], name: str, func: Callable, *args):
+    """funcを実行し、timings[name]に最短の時間を記録する"""
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started
+    timings[name] = min(timings.get(name, float("inf")), elapsed)
+
+    return result
+
+
+def load_table(engine, df, table_name: str) -> None:
+    """パーサーと同じ書き込み（bulk_load、インデックス、FTS5）"""
+    bulk_load(engine, df, table_name)
+    create_indexes(engine, table_name)
+    create_fulltext_index(engine, table_name)
+
+
+def bench_parse(paths: Dict[str, str], db_path: str, repeat: int) -> Dict[str, float]:
+    """parse_utilsの段階ごとの時間（repeat回の最短）。最後の回のDBを残す"""
+    timings: Dict[str, float] = {}
+    for _ in range(repeat):
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        engine = create_engine(f"sqlite:///{db_path}")
+
+        ken_all = timed(timings, "ken_all.read", make_ken_all, paths["ken_all"])
+        set_index(ken_all)
+        ken_all = timed(timings, "ken_all.to_narrow", normalize_columns, ken_all)
+        ken_all = timed(timings, "ken_all.merge_lines", merge_lines, ken_all)
+        ken_all = timed(timings, "ken_all.preproc_ken_all", preproc_ken_all, ken_all)
+        ken_all["id"] = range(1, len(ken_all.index) + 1)
+        timed(timings, "ken_all.load", load_table, engine, ken_all, "ken_all")
+
+        jigyosyo = timed(timings, "jigyosyo.read", make_jigyosyo, paths["jigyosyo"])
+        set_index(jigyosyo)
+        jigyosyo = timed(timings, "jigyosyo.to_narrow", normalize_columns, jigyosyo)
+        timed(timings, "jigyosyo.load", load_table, engine, jigyosyo, "jigyosyo")
+
+        for name in ("ken_all", "jigyosyo"):
+            save_dataset_version(engine, name, "bench")
+        timed(timings, "optimize", optimize_database, engine)
+        engine.dispose()
+
+    return timings
+
+
+def make_paths(db_path: str, requests: int, seed: int = 0) -> Dict[str, List[str]]:
+    """ルートごとのリクエストパス（DBにある値から作る）"""
+    rng = random.Random(seed)
+    quote = urllib.parse.quote
+    with sqlite3.connect(db_path) as conn:
+        zipcodes = [z for (z,) in conn.execute("SELECT zipcode FROM ken_all")]
+        towns = [t for (t,) in conn.execute("SELECT town FROM ken_all") if t]
+        companies = [c for (c,) in conn.execute("SELECT company FROM jigyosyo")]
+
+        # ページの深さ: 行数が最も多い都道府県で絞り込み、1ページ目と深いページを比べる
+        prefecture, total = conn.execute(
+            "SELECT prefecture, COUNT(*) FROM ken_all GROUP BY prefecture "
+            "ORDER BY COUNT(*) DESC LIMIT 1"
+        ).fetchone()
+        last_page = max(1, min(MAX_DEEP_PAGE, total // PAGE_SIZE))
+        deep_pages = range(max(1, last_page - PAGE_WINDOW + 1), last_page + 1)
+        # 深いページの直前のid（キーセットで同じページを取得する）
+        ids = [
+            row_id
+            for (row_id,) in conn.execute(
+                "SELECT id FROM ken_all WHERE prefecture = ? ORDER BY id",
+                (prefecture,),
+            )
+        ]
+        cursors = [ids[(page - 1) * PAGE_SIZE - 1] for page in deep_pages if page > 1]
+
+    def fragment(value: str) -> str:
+        start = rng.randrange(max(1, len(value) - 3))
+        return value[start : start + rng.randint(3, 6)]
+
+    by_prefecture = f"/v1/ken_all/?address={quote(prefecture)}&size={PAGE_SIZE}"
+    return {
+        "zipcode": [
+            f"/v1/ken_all/?zipcode={rng.choice(zipcodes)}" for _ in range(requests)
+        ],
+        "address": [
+            f"/v1/ken_all/?address={quote(fragment(rng.choice(towns)))}"
+            for _ in range(requests)
+        ],
+        "company": [
+            f"/v1/jigyosyo/?compnay_name={quote(fragment(rng.choice(companies)))}"
+            for _ in range(requests)
+        ],
+        "page_shallow": [
+            f"{by_prefecture}&page={rng.randint(1, PAGE_WINDOW)}"
+            for _ in range(requests)
+        ],
+        "page_deep": [
+            f"{by_prefecture}&page={rng.choice(deep_pages)}" for _ in range(requests)
+        ],
+        "cursor_deep": [
+            f"{by_prefecture}&cursor={rng.choice(cursors or [0])}"
+            for _ in range(requests)
+        ],
+    }
+
+
+async def client(
+    port: int, paths: List[str], latencies: List[float], statuses: Counter
+) -> None:
+    """1接続でpathsを順にGETする（ステータスコードも数える）"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for path in paths:
+        started = time.perf_counter()
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n".encode("ascii"))
+        headers = await reader.readuntil(b"\r\n\r\n")
+        statuses[int(headers.split(b" ", 2)[1])] += 1
+        length = 0
+        for line in headers.split(b"\r\n"):
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":", 1)[1])
+        await reader.readexactly(length)
+        latencies.append(time.perf_counter() - started)
+    writer.close()
+
+
+async def run_load(port: int, paths: List[str], clients: int) -> dict:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(client(port, paths[i::clients], latencies, statuses) for i in range(clients))
+    )
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000,
+        "rps": len(latencies) / elapsed,
+        "errors": sum(n for status, n in statuses.items() if status >= 500),
+        "not_found": statuses.get(404, 0),
+    }
+
+
+def bench_api(
+    workdir: str, routes: Dict[str, List[str]], clients: List[int], async_db: bool
+) -> Dict[str, Dict[str, dict]]:
+    """ルート x 同時クライアント数ごとのレイテンシ"""
+    results: Dict[str, Dict[str, dict]] = {name: {} for name in routes}
+    port = free_port()
+    server = serve(workdir, port, async_db, CACHE_MAX_ENTRIES="0")
+    try:
+        asyncio.run(wait_ready(port))
+        for name, paths in routes.items():
+            for n in clients:
+                results[name][str(n)] = asyncio.run(run_load(port, paths, n))
+    finally:
+        server.terminate()
+        server.wait()
+
+    return results
+
+
+def git_commit() -> Dict[str, object]:
+    def git(*args: str) -> str:
+        return subprocess.run(
+            ["git", *args], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+
+    return {
+        "commit": git("rev-parse", "--short", "HEAD") or "unknown",
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+    }
+
+
+def flatten(result: dict) -> Dict[str, float]:
+    """比較用に{名前: 値}にする（値が大きいほど悪いものだけ）"""
+    values = {f"parse {name} s": value for name, value in result["parse"].items()}
+    for route, by_clients in result["api"].items():
+        for clients, metrics in by_clients.items():
+            for metric in ("p50_ms", "p99_ms"):
+                values[f"api {route} c={clients} {metric}"] = metrics[metric]
+
+    return values
+
+
+def compare(old_path: str, new_path: str) -> None:
+    """2つの結果を並べ、REGRESSION_RATIO以上悪化したものに印を付ける"""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    print(f"old: {old['commit']} (scale {old['scale']}), new: {new['commit']}")
+    old_values, new_values = flatten(old), flatten(new)
+    for name in sorted(old_values.keys() & new_values.keys()):
+        ratio = new_values[name] / old_values[name] if old_values[name] else 1.0
+        mark = "  <- regression" if ratio >= REGRESSION_RATIO else ""
+        print(
+            f"{name:40} {old_values[name]:10.3f} {new_values[name]:10.3f} "
+            f"{ratio:6.2f}x{mark}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=float, default=1, help="1, 10, 100など")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--async-db", action="store_true")
+    parser.add_argument("--skip-api", action="store_true")
+    parser.add_argument("--output", help="結果のJSON")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    result = {
+        **git_commit(),
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "scale": args.scale,
+        "async_db": args.async_db,
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_fixtures(os.path.join(tmp, "fixtures"), args.scale)
+        db_path = os.path.join(tmp, "zipcode.db")
+
+        result["parse"] = bench_parse(paths, db_path, args.repeat)
+        with sqlite3.connect(db_path) as conn:
+            result["rows"] = {
+                name: conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+                for name in ("ken_all", "jigyosyo")
+            }
+        for name, seconds in result["parse"].items():
+            print(f"parse {name:28} {seconds * 1000:10.1f} ms")
+
+        result["api"] = {}
+        if not args.skip_api:
+            routes = make_paths(db_path, args.requests)
+            result["api"] = bench_api(tmp, routes, args.clients, args.async_db)
+            for route, by_clients in result["api"].items():
+                for clients, metrics in by_clients.items():
+                    print(
+                        f"api {route:14} c={clients:>3} "
+                        f"p50 {metrics['p50_ms']:8.2f} ms  p99 {metrics['p99_ms']:8.2f} ms"
+                        f"  {metrics['rps']:7.0f} req/s  errors {metrics['errors']}"
+                    )
+
+    output = args.output or RESULTS_DIR / f"{result['commit']}.json"
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"saved: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""郵便番号検索用の読み取り専用バイナリファイル（パーサーが書き込み、APIがmmapで読む）
+
+ファイルの構成（リトルエンディアン、配列は4バイト境界に揃える）
+    ヘッダー   MAGIC, キー数, 行数, 列数, 文字列数, バージョンの長さ, 列名の長さ
+    バージョン  UTF-8（dataset_versionと同じ文字列）
+    列名       UTF-8（"\\0"区切り）
+    keys       u32 * キー数         郵便番号（7桁）を数値にしたもの（昇順）
+    offsets    u32 * (キー数 + 1)   キーごとの行の開始位置
+    rows       u32 * 行数 * 列数    行ごとの文字列番号（NULLはNULL_ID）
+    strings    u32 * (文字列数 + 1) 文字列ごとのpool内の開始位置
+    pool       UTF-8                同じ文字列は1回だけ格納する
+"""
+
+import bisect
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+MAGIC = b"ZIPART01"
+HEADER = struct.Struct("<8s6I")
+NULL_ID = 0xFFFFFFFF
+# ASCIIの数字7桁（str.isdigitは全角などの数字も通すので使わない）
+ZIPCODE_PATTERN = re.compile(r"[0-9]{7}")
+
+
+def artifact_path(table_name: str, directory: str = ".") -> str:
+    """テーブルのバイナリファイルのパス"""
+    return os.path.join(directory, f"{table_name}.bin")
+
+
+def _pad(f, size: int) -> None:
+    """4バイト境界までゼロで埋める"""
+    f.write(b"\0" * (-size % 4))
+
+
+def _u32(values: Iterable[int]) -> bytes:
+    data = array("I", values)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data.tobytes()
+
+
+def write(
+    path: str,
+    columns: Sequence[str],
+    rows: Iterable[Tuple[Optional[str], ...]],
+    version: str = "",
+) -> None:
+    """(zipcode, id)順の行からバイナリファイルを作成（一時ファイルに書いてから置き換える）
+    Args:
+        path(str): 書き込み先
+        columns(list[str]): 列名（zipcodeを含む）
+        rows(Iterable[tuple]): 郵便番号順に並んだ行
+        version(str): データのバージョン
+    Returns:
+        None
+    """
+    zipcode_pos = list(columns).index("zipcode")
+    keys: List[int] = []
+    offsets: List[int] = []
+    cells: List[int] = []
+    string_ids: Dict[str, int] = {}
+    n_rows = 0
+    for row in rows:
+        zipcode = row[zipcode_pos]
+        if not zipcode or not ZIPCODE_PATTERN.fullmatch(zipcode):
+            raise ValueError(f"invalid zipcode: {zipcode!r}")
+        key = int(zipcode)
+        if not keys or keys[-1] != key:
+            if keys and keys[-1] > key:
+                raise ValueError("rows must be sorted by zipcode")
+            keys.append(key)
+            offsets.append(n_rows)
+        for value in row:
+            cells.append(
+                NULL_ID
+                if value is None
+                else string_ids.setdefault(value, len(string_ids))
+            )
+        n_rows += 1
+    offsets.append(n_rows)
+
+    pool = [value.encode("utf-8") for value in string_ids]
+    string_offsets = [0]
+    for value in pool:
+        string_offsets.append(string_offsets[-1] + len(value))
+    version_bytes = version.encode("utf-8")
+    columns_bytes = "\0".join(columns).encode("utf-8")
+
+    tmp_path = f"{path}.building"
+    with open(tmp_path, "wb") as f:
+        f.write(
+            HEADER.pack(
+                MAGIC,
+                len(keys),
+                n_rows,
+                len(columns),
+                len(pool),
+                len(version_bytes),
+                len(columns_bytes),
+            )
+        )
+        f.write(version_bytes + columns_bytes)
+        _pad(f, HEADER.size + len(version_bytes) + len(columns_bytes))
+        for values in (keys, offsets, cells, string_offsets):
+            f.write(_u32(values))
+        f.write(b"".join(pool))
+    os.replace(tmp_path, path)
+
+
+class Artifact:
+    """バイナリファイルをmmapして郵便番号を二分探索で引く（ZipcodeTableと同じlookup）
+    ファイルはページキャッシュを介して同じマシンのワーカー間で共有される。
+    """
+
+    def __init__(self, path: str, columns: Optional[Sequence[str]] = None):
+        if sys.byteorder != "little":
+            raise ValueError("artifact files are little-endian only")
+
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            n_keys,
+            n_rows,
+            n_columns,
+            n_strings,
+            version_length,
+            columns_length,
+        ) = HEADER.unpack_from(self.mm)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an artifact file")
+
+        view = memoryview(self.mm)
+        position = HEADER.size
+        self.version = str(view[position : position + version_length], "utf-8")
+        position += version_length
+        all_columns = str(view[position : position + columns_length], "utf-8")
+        self.all_columns = tuple(all_columns.split("\0"))
+        position += columns_length
+        position += -position % 4
+
+        def u32_array(length: int) -> memoryview:
+            nonlocal position
+            values = view[position : position + length * 4].cast("I")
+            position += length * 4
+            return values
+
+        self.keys = u32_array(n_keys)
+        self.offsets = u32_array(n_keys + 1)
+        self.cells = u32_array(n_rows * n_columns)
+        self.string_offsets = u32_array(n_strings + 1)
+        self.pool = view[position:]
+        self.n_rows = n_rows
+
+        # レスポンスに含める列（と、その行内の位置）
+        self.columns = tuple(columns or self.all_columns)
+        self.positions = [self.all_columns.index(name) for name in self.columns]
+        self.n_columns = n_columns
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def nbytes(self) -> int:
+        """mmapしたファイルのサイズ（ページキャッシュでワーカー間共有）"""
+        return len(self.mm)
+
+    def _string(self, string_id: int) -> Optional[str]:
+        if string_id == NULL_ID:
+            return None
+        start = self.string_offsets[string_id]
+        stop = self.string_offsets[string_id + 1]
+        return str(self.pool[start:stop], "utf-8")
+
+    def lookup(self, zipcode: str) -> List[Dict[str, Optional[str]]]:
+        """郵便番号の完全一致で行を返す（id順）
+        Args:
+            zipcode(str): 郵便番号
+        Returns:
+            rows(list[dict]): 該当行
+        """
+        if not ZIPCODE_PATTERN.fullmatch(zipcode):
+            return []
+
+        key = int(zipcode)
+        i = bisect.bisect_left(self.keys, key)
+        if i == len(self.keys) or self.keys[i] != key:
+            return []
+
+        results = []
+        for row in range(self.offsets[i], self.offsets[i + 1]):
+            base = row * self.n_columns
+            results.append(
+                {
+                    name: self._string(self.cells[base + position])
+                    for name, position in zip(self.columns, self.positions)
+                }
+            )
+
+        return results
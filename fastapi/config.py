@@ -1,5 +1,53 @@
+from typing import Dict
+
 from pydantic import BaseSettings
 
 
 class Setting(BaseSettings):
     version: str = "v1"
+    # 起動時にken_all/jigyosyoをメモリに読み込み、郵便番号検索をSQLiteを使わずに返す
+    memory_lookup: bool = False
+    # パーサーが出力したバイナリファイル（<テーブル名>.bin）をmmapして郵便番号検索に使う
+    # ワーカー間でページキャッシュを共有し、起動時の読み込みもほぼ不要（memory_lookupより優先）
+    artifact_lookup: bool = False
+
+    # DBは読み取り専用で開く。パーサーはos.replaceでファイルごと置き換えるのでimmutableにできる
+    db_immutable: bool = True
+    # 接続プールの大きさ（起動時にこの数だけ接続しておく）
+    db_pool_size: int = 8
+    # 接続ごとのpragma（mmap_sizeはバイト、cache_sizeは負ならKiB）
+    db_mmap_size: int = 256 * 1024 * 1024
+    db_cache_size: int = -64 * 1024
+
+    # ken_all/jigyosyoをasyncのルート（aiosqlite）で処理する
+    async_db: bool = False
+    # レート制限（ベンチマークなどで無効にする場合はfalse）
+    rate_limit_enabled: bool = True
+    # ワーカー間で共有するトークンバケツのファイル
+    rate_limit_storage: str = "ratelimit.db"
+    # ワーカー内で数えた回数を共有のファイルに反映する間隔（秒）
+    # 0ならリクエストごとにファイルで確認する（ワーカー間で正確だが、asyncのルートでもスレッドを使う）
+    rate_limit_sync_interval: float = 1.0
+    # ルート名 -> 制限（{"ken_all": "30/minute"}など。無いルートはルートごとの既定値）
+    rate_limits: Dict[str, str] = {}
+    # APIキー -> 制限（api_key_headerで送られたキーごとに、全ルートでこの制限を使う）
+    rate_limit_api_keys: Dict[str, str] = {}
+    api_key_header: str = "X-API-Key"
+    # /batchで受け付ける郵便番号の最大数と、1件あたりの最大件数
+    batch_max_size: int = 1000
+    batch_max_results: int = 100
+    # /batchで受け付ける住所の最大数（住所は1件ごとに検索するので郵便番号より少なくする）
+    batch_max_addresses: int = 100
+    # /ken_all/suggest用のインデックスを起動時に作成する（falseなら503を返す）と、返す件数の上限
+    suggest_index: bool = False
+    suggest_max_results: int = 50
+    # /ken_all/resolve用の住所 -> 郵便番号の辞書を起動時に作成する（falseなら503を返す）
+    resolver_index: bool = False
+    # 検索結果をORM・pydanticを通さずにレスポンスの列だけのタプルで取得し、orjsonでJSONにする
+    # （レスポンスとOpenAPIのスキーマは同じ。検証を省くので、スキーマと列がずれないよう注意）
+    fast_serialization: bool = False
+    # 検索結果（シリアライズ済みのレスポンス）のキャッシュ件数と有効期限（秒）。0なら無効
+    cache_max_entries: int = 10000
+    cache_ttl: int = 3600
+    # ルート・段階ごとの処理時間などを計測し、/metricsでPrometheusの形式で返す
+    metrics_enabled: bool = True
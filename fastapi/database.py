@@ -1,19 +1,291 @@
-from sqlalchemy import create_engine
+import contextlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from config import Setting
+from functions import metrics
+
+settings = Setting()
+
+DATABASE_PATH = "./zipcode.db"
+DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+
+# DBファイルが置き換えられたか確認する間隔（秒）
+RELOAD_CHECK_INTERVAL = 1.0
+
+
+def _database_uri(database_path: str) -> str:
+    """読み取り専用で開くためのURIファイル名"""
+    uri = f"file:{database_path}?mode=ro"
+    if settings.db_immutable:
+        # ファイルが変更されない前提でロックと変更チェックを省略する
+        uri += "&immutable=1"
+
+    return uri
+
+
+def create_db_engine(database_path: str = DATABASE_PATH) -> Engine:
+    """API用の読み取り専用engine
+    接続はmode=ro（設定によりimmutable=1）で開き、接続ごとにpragmaを設定する。
+    Args:
+        database_path(str): DBのファイルパス
+    Returns:
+        engine(Engine): 読み取り専用のengine
+    """
+    uri = _database_uri(database_path)
+
+    def connect() -> sqlite3.Connection:
+        return sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+    # 同期ルートはスレッドプールで動き、接続の返却（get_dbの後処理）にもスレッドが要るので、
+    # 上限を設けると接続待ちのスレッドでプールが埋まって止まる。pool_sizeを超えた分は都度開閉する
+    engine = create_engine(
+        "sqlite://",
+        creator=connect,
+        poolclass=QueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=-1,
+    )
+    event.listen(engine, "connect", set_pragmas)
+
+    return engine
+
+
+def create_async_db_engine(database_path: str = DATABASE_PATH) -> AsyncEngine:
+    """API用の読み取り専用engine（aiosqlite、ASYNC_DB=trueの場合）
+    Args:
+        database_path(str): DBのファイルパス
+    Returns:
+        engine(AsyncEngine): 読み取り専用のengine
+    """
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{_database_uri(database_path)}&uri=true",
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_pool_size,
+    )
+    event.listen(engine.sync_engine, "connect", set_pragmas)
+
+    return engine
+
+
+def create_empty_database() -> bool:
+    """DBファイルがまだ無い場合（パーサー実行前）だけ、空のテーブルを作ったファイルを置く
+    別の一時ファイルに作ってからos.linkで置く（既にあれば失敗する）ので、
+    稼働中のDBや、その間にパーサー・他のワーカーが置いたDBには書き込まない。
+    Returns:
+        created(bool): 置いた場合はTrue
+    """
+    if os.path.exists(DATABASE_PATH):
+        return False
+
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=f"{os.path.basename(DATABASE_PATH)}.",
+        suffix=".empty",
+        dir=os.path.dirname(os.path.abspath(DATABASE_PATH)),
+    )
+    os.close(fd)
+    try:
+        os.chmod(tmp_path, 0o644)
+        writable_engine = create_engine(f"sqlite:///{tmp_path}")
+        Base.metadata.create_all(writable_engine)
+        writable_engine.dispose()
+        try:
+            os.link(tmp_path, DATABASE_PATH)
+        except FileExistsError:
+            return False
+    finally:
+        os.remove(tmp_path)
+
+    return True
+
+
+def set_pragmas(dbapi_connection: sqlite3.Connection, _) -> None:
+    """接続ごとのpragma（読み取り専用、mmap、ページキャッシュ、一時テーブルはメモリ）"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only = ON")
+    cursor.execute(f"PRAGMA mmap_size = {settings.db_mmap_size}")
+    cursor.execute(f"PRAGMA cache_size = {settings.db_cache_size}")
+    cursor.execute("PRAGMA temp_store = MEMORY")
+    cursor.close()
+
+
+def warm_up(engine: Engine) -> None:
+    """プールの接続を先に開いておく（最初のリクエストで接続とpragmaの時間がかからないように）
+    Args:
+        engine(Engine): API用のengine
+    Returns:
+        None
+    """
+    connections = [engine.raw_connection() for _ in range(settings.db_pool_size)]
+    for connection in connections:
+        connection.close()
+
+
+async def warm_up_async(engine: AsyncEngine) -> None:
+    """warm_upのasync版"""
+    connections = [await engine.connect() for _ in range(settings.db_pool_size)]
+    for connection in connections:
+        await connection.close()
+
+
+def _file_id() -> Optional[Tuple[int, int]]:
+    """DBファイルの識別子（パーサーがos.replaceで置き換えるとinodeが変わる）"""
+    try:
+        stat = os.stat(DATABASE_PATH)
+    except FileNotFoundError:
+        return None
+
+    return stat.st_dev, stat.st_ino
 
-DATABASE_URL = "sqlite:///./zipcode.db"
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+engine = create_db_engine()
 
 sessionLocal = sessionmaker(bind=engine, autoflush=False)
 
+# async版（ASYNC_DB=trueの場合だけ作成する）
+async_engine: Optional[AsyncEngine] = None
+async_sessionLocal = sessionmaker(
+    class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+if settings.async_db:
+    async_engine = create_async_db_engine()
+    async_sessionLocal.configure(bind=async_engine)
+
+# 置き換え済みで、まだdisposeしていないasync版のengine（disposeはawaitが必要）
+retired_async_engines: List[AsyncEngine] = []
+# 開いているasync版のセッションの数（置き換え済みのengineは0の時だけdisposeする）
+_open_async_sessions = 0
+
 Base = declarative_base()
 
+# engineを開き直した後に呼ぶ関数（FTS5の確認、インメモリテーブルの再読み込みなど）
+# 新しいengineから読み込むだけで、読み込んだものを反映する関数を返す（engineと同時に入れ替える）
+reload_listeners: List[Callable[[Engine], Callable[[], None]]] = []
+
+_reload_lock = threading.Lock()
+_loaded_file_id = _file_id()
+_checked_at = time.monotonic()
+_reloading = False
+
+
+def refresh_engine() -> bool:
+    """DBファイルが置き換えられていれば、バックグラウンドでengineを開き直す
+    新しいengineとインメモリテーブルなどは別スレッドで作り、できるまでは古いものでそのまま応答する
+    （リクエストは待たない）。入れ替えは_reload_lock内でまとめて行う。
+    Returns:
+        started(bool): 開き直しを始めた場合はTrue
+    """
+    global _checked_at, _reloading
+
+    if time.monotonic() - _checked_at < RELOAD_CHECK_INTERVAL:
+        return False
+
+    with _reload_lock:
+        if _reloading or time.monotonic() - _checked_at < RELOAD_CHECK_INTERVAL:
+            return False
+        _checked_at = time.monotonic()
+
+        file_id = _file_id()
+        if file_id is None or file_id == _loaded_file_id:
+            return False
+        _reloading = True
+
+    threading.Thread(
+        target=_reload, args=(file_id,), name="reload-database", daemon=True
+    ).start()
+
+    return True
+
+
+def _reload(file_id: Tuple[int, int]) -> None:
+    """新しいengineとreload_listenersの読み込みを作ってから入れ替える
+    処理中のセッションは古いファイル（削除済みのinode）のまま最後まで読めるので、
+    古いengineはdisposeするだけで、返却された接続から順に閉じられる。
+    Args:
+        file_id(tuple): 開き直すDBファイルの識別子
+    Returns:
+        None
+    """
+    global engine, async_engine, _loaded_file_id, _reloading
+
+    try:
+        new_engine = create_db_engine()
+        warm_up(new_engine)
+        applies = [listener(new_engine) for listener in reload_listeners]
+        new_async_engine = None
+        if async_engine is not None:
+            new_async_engine = create_async_db_engine()
+    except BaseException:
+        # 次の確認でやり直す（読み込み中に再度置き換えられた場合など）
+        with _reload_lock:
+            _reloading = False
+        raise
+
+    with _reload_lock:
+        old_engine, engine = engine, new_engine
+        sessionLocal.configure(bind=engine)
+        for apply in applies:
+            apply()
+        if new_async_engine is not None:
+            retired_async_engines.append(async_engine)
+            async_engine = new_async_engine
+            async_sessionLocal.configure(bind=async_engine)
+        _loaded_file_id = file_id
+        _reloading = False
+
+    old_engine.dispose()
+
 
 def get_db():
+    metrics.mark_threadpool_start()
+    refresh_engine()
     db = sessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def check_reload() -> None:
+    """async版のルートの依存関係（DBファイルの置き換えの確認だけで、セッションは開かない）
+    セッションはリクエストではなく、検索を実行するタスク内でopen_async_sessionで開く。
+    """
+    refresh_engine()
+
+
+@contextlib.asynccontextmanager
+async def open_async_session() -> AsyncIterator[AsyncSession]:
+    """async版のセッションを開く
+    置き換え済みのengineは、使用中のセッションが残っている間はdisposeしない。
+    """
+    global _open_async_sessions
+
+    refresh_engine()
+    if not _open_async_sessions:
+        while retired_async_engines:
+            await retired_async_engines.pop().dispose()
+
+    _open_async_sessions += 1
+    try:
+        async with async_sessionLocal() as db:
+            yield db
+    finally:
+        _open_async_sessions -= 1
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """get_dbのasync版"""
+    async with open_async_session() as db:
+        yield db
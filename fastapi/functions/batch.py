@@ -0,0 +1,64 @@
+from typing import Any, Dict, List
+
+from functions import fulltext, zipcode_table
+from sqlalchemy.orm import Session
+
+# 1回のINに渡す郵便番号の数（SQLiteの変数の上限より十分小さく）
+IN_CHUNK_SIZE = 500
+
+
+def lookup_zipcodes(
+    db: Session, model: Any, zipcodes: List[str], max_results: int
+) -> Dict[str, List[Any]]:
+    """郵便番号の完全一致をまとめて検索（IN (...) の1クエリ、またはインメモリテーブル）
+    Args:
+        db(Session): セッション
+        model(Base): 検索するモデル
+        zipcodes(list[str]): 郵便番号
+        max_results(int): 1件の入力あたりの最大件数
+    Returns:
+        results(dict[str, list]): 郵便番号 -> 該当行（id順、該当なしは空）
+    """
+    results: Dict[str, List[Any]] = {zipcode: [] for zipcode in zipcodes}
+
+    table = zipcode_table.tables.get(model.__tablename__)
+    if table is not None:
+        for zipcode in results:
+            results[zipcode] = table.lookup(zipcode)[:max_results]
+        return results
+
+    keys = list(results)
+    for start in range(0, len(keys), IN_CHUNK_SIZE):
+        rows = (
+            db.query(model)
+            .filter(model.zipcode.in_(keys[start : start + IN_CHUNK_SIZE]))
+            .order_by(model.zipcode, model.id)
+        )
+        for row in rows:
+            found = results[row.zipcode]
+            if len(found) < max_results:
+                found.append(row)
+
+    return results
+
+
+def lookup_addresses(
+    db: Session, model: Any, addresses: List[str], max_results: int
+) -> Dict[str, List[Any]]:
+    """住所の部分一致をまとめて検索（入力ごとにFTS5で引き、max_results件で打ち切る）
+    Args:
+        db(Session): セッション
+        model(Base): 検索するモデル
+        addresses(list[str]): 住所の一部
+        max_results(int): 1件の入力あたりの最大件数
+    Returns:
+        results(dict[str, list]): 住所 -> 該当行（id順、該当なしは空）
+    """
+    return {
+        address: db.query(model)
+        .filter(fulltext.contains(model.address, address))
+        .order_by(model.id)
+        .limit(max_results)
+        .all()
+        for address in dict.fromkeys(addresses)
+    }
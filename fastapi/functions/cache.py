@@ -0,0 +1,251 @@
+import hashlib
+import urllib.parse
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config import Setting
+from database import open_async_session
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi_pagination import resolve_params, response
+from fastapi_pagination.bases import AbstractPage
+from functions import metrics
+from functions.singleflight import SingleFlight
+import orjson
+from sqlalchemy.ext.asyncio import AsyncSession
+
+settings = Setting()
+
+# キャッシュしたレスポンスに付け直すヘッダー
+CACHED_HEADERS = ("X-Next-Cursor",)
+
+
+class ResponseCache:
+    """シリアライズ済みのレスポンスのLRU（件数上限 + 有効期限）"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: Any) -> Optional[Any]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Any, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self.entries),
+            "collapsed": flights.collapsed,
+            "version": dataset_version,
+        }
+
+
+response_cache = ResponseCache(settings.cache_max_entries, settings.cache_ttl)
+
+# キャッシュに無い検索の同時実行をまとめる
+flights = SingleFlight()
+
+# DBのdataset_versionテーブルの内容（パーサーがDBを置き換えるたびに読み直す）
+dataset_version = ""
+
+
+def render_metrics() -> List[str]:
+    """/metrics用のキャッシュの統計（Prometheusのテキスト形式）"""
+    stats = response_cache.stats()
+    lines = []
+    for name, kind, value, documentation in (
+        ("hits_total", "counter", stats["hits"], "Response cache hits."),
+        ("misses_total", "counter", stats["misses"], "Response cache misses."),
+        ("entries", "gauge", stats["entries"], "Cached responses."),
+        (
+            "collapsed_total",
+            "counter",
+            stats["collapsed"],
+            "Requests that waited for an identical in-flight search.",
+        ),
+    ):
+        lines.append(f"# HELP zipcode_cache_{name} {documentation}")
+        lines.append(f"# TYPE zipcode_cache_{name} {kind}")
+        lines.append(f"zipcode_cache_{name} {value}")
+
+    return lines
+
+
+metrics.collectors.append(render_metrics)
+
+
+def set_version(version: str) -> None:
+    """データのバージョンを更新し、変わっていればキャッシュを捨てる"""
+    global dataset_version
+
+    if version != dataset_version:
+        dataset_version = version
+        response_cache.clear()
+
+
+def make_key(table_name: str, **query: Optional[Any]) -> Tuple:
+    """正規化したクエリパラメータ + page/sizeのキャッシュキー
+    Args:
+        table_name(str): テーブル名
+        query(dict): クエリパラメータ（デコードして前後の空白を除く。空文字とNoneは同じ扱い）
+    Returns:
+        key(tuple): キャッシュキー
+    """
+    params = resolve_params()
+    normalized = tuple(
+        sorted(
+            (
+                name,
+                (
+                    urllib.parse.unquote(value).strip()
+                    if isinstance(value, str)
+                    else value
+                ),
+            )
+            for name, value in query.items()
+            if value not in (None, "")
+        )
+    )
+
+    return (table_name, normalized, params.page, params.size)
+
+
+def make_etag(key: Tuple) -> str:
+    """データのバージョンとクエリから作るETag（同じバージョン・クエリなら同じ結果）"""
+    digest = hashlib.sha1(f"{dataset_version}:{key!r}".encode("utf-8")).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Matchのどれかが一致するか（弱い比較。"*"は常に一致）
+    Args:
+        if_none_match(str): If-None-Matchヘッダー（カンマ区切りのETag）
+        etag(str): 現在のETag
+    Returns:
+        matched(bool): 一致すればTrue
+    """
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == "*" or tag == etag:
+            return True
+
+    return False
+
+
+def lookup(request: Request, key: Tuple) -> Optional[Response]:
+    """If-None-Matchが一致すれば304、キャッシュにあればそのレスポンス（無ければNone）
+    Args:
+        request(Request): リクエスト
+        key(tuple): make_keyの戻り値
+    Returns:
+        response(Response): 返すレスポンス（キャッシュに無い場合はNone）
+    """
+    etag = make_etag(key)
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    cached = response_cache.get(key)
+    if cached is None:
+        return None
+
+    return _to_response(key, cached)
+
+
+def fetch(key: Tuple, build: Callable[[], AbstractPage]) -> Response:
+    """キャッシュに無い結果を作成してキャッシュする
+    同じキーの同時リクエストは1回にまとめ、後から来たリクエストは最初の結果（例外も）を待つ。
+    Args:
+        key(tuple): make_keyの戻り値
+        build(Callable): 検索結果のページを返す関数
+    Returns:
+        response(Response): 返すレスポンス
+    """
+    return _to_response(key, flights.do(key, lambda: _store(key, build())))
+
+
+async def fetch_async(
+    key: Tuple, build: Callable[[AsyncSession], Awaitable[AbstractPage]]
+) -> Response:
+    """fetchのasync版
+    まとめた呼び出しは最初のリクエストがキャンセルされても続くので、
+    セッションはリクエストのものを使わずに、実行するタスク内で開く。
+    Args:
+        key(tuple): make_keyの戻り値
+        build(Callable): セッションを受け取り、検索結果のページを返す関数
+    Returns:
+        response(Response): 返すレスポンス
+    """
+
+    async def run() -> Tuple[bytes, Dict[str, str]]:
+        async with open_async_session() as db:
+            page = await build(db)
+        return _store(key, page)
+
+    return _to_response(key, await flights.do_async(key, run))
+
+
+def encode_page(page: AbstractPage, fast: bool = False) -> bytes:
+    """ページ -> FastAPIがresponse_modelから作るJSONと同じバイト列
+    Args:
+        page(AbstractPage): 検索結果のページ
+        fast(bool): create_raw_pageのページ（itemsがdict）をorjsonでそのままJSONにする
+    Returns:
+        body(bytes): レスポンスのボディ
+    """
+    if fast:
+        return orjson.dumps({name: getattr(page, name) for name in page.__fields__})
+
+    return JSONResponse(jsonable_encoder(page)).body
+
+
+def _store(key: Tuple, page: AbstractPage) -> Tuple[bytes, Dict[str, str]]:
+    """ページをシリアライズしてキャッシュする"""
+    with metrics.stage("serialize"):
+        body = encode_page(page, settings.fast_serialization)
+    headers = {
+        name: response().headers[name]
+        for name in CACHED_HEADERS
+        if name in response().headers
+    }
+    response_cache.set(key, (body, headers))
+
+    return body, headers
+
+
+def _to_response(key: Tuple, entry: Tuple[bytes, Dict[str, str]]) -> Response:
+    body, headers = entry
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={**headers, "ETag": make_etag(key)},
+    )
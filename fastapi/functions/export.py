@@ -0,0 +1,103 @@
+import csv
+import io
+import json
+import zlib
+from typing import Any, Iterator, List, Optional, Sequence
+
+import database
+from fastapi.responses import StreamingResponse
+from functions import metrics
+from sqlalchemy import select
+
+# 1回にDBから読み、1チャンクとして送る行数
+EXPORT_BATCH_SIZE = 1000
+
+# gzipの圧縮レベル（1〜9。大きいほど小さく遅い）
+GZIP_LEVEL = 6
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def export_response(
+    model: Any, where: Optional[Any], fmt: str, accept_encoding: str
+) -> StreamingResponse:
+    """テーブル全体（whereがあれば絞り込んだ行）をNDJSONまたはCSVで返すレスポンス
+    行は送りながらDBから読むので、件数によらずメモリ使用量は一定。
+    Args:
+        model(Base): 出力するモデル（id以外の全列をid順に出力する）
+        where(ColumnElement): 絞り込み条件（Noneなら全件）
+        fmt(str): "ndjson"または"csv"
+        accept_encoding(str): リクエストのAccept-Encoding（gzipを含めば圧縮して返す）
+    Returns:
+        response(StreamingResponse): レスポンス
+    """
+    columns = [column for column in model.__table__.columns if column.name != "id"]
+    stmt = select(*columns).order_by(model.__table__.c.id)
+    if where is not None:
+        stmt = stmt.where(where)
+
+    names = [column.name for column in columns]
+    if fmt == "csv":
+        chunks = _to_csv(names, _fetch(stmt))
+    else:
+        chunks = _to_ndjson(names, _fetch(stmt))
+
+    headers = {
+        "Content-Disposition": f'attachment; filename="{model.__tablename__}.{fmt}"',
+        "Vary": "Accept-Encoding",
+    }
+    if "gzip" in accept_encoding.lower():
+        chunks = _gzip(chunks)
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(chunks, media_type=MEDIA_TYPES[fmt], headers=headers)
+
+
+def _fetch(stmt: Any) -> Iterator[Sequence[tuple]]:
+    # 接続はレスポンスを送り終わるまで（クライアントが切断した場合はその時点まで）使う。
+    # sqlite3のカーソルは1行ずつ読むので、fetchmanyの分しかメモリに載らない
+    database.refresh_engine()
+    with database.engine.connect() as conn:
+        result = conn.execute(stmt)
+        while True:
+            rows = result.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            metrics.observe_rows(len(rows))
+            yield rows
+
+
+def _to_ndjson(names: List[str], batches: Iterator[Sequence[tuple]]) -> Iterator[bytes]:
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    for rows in batches:
+        yield "".join(encode(dict(zip(names, row))) + "\n" for row in rows).encode(
+            "utf-8"
+        )
+
+
+def _to_csv(names: List[str], batches: Iterator[Sequence[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(names)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+    # 該当なしの場合もヘッダーだけは返す
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    # wbits=31でgzip形式（ヘッダーとCRC付き）
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
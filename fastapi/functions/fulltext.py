@@ -0,0 +1,56 @@
+from typing import Any, Set
+
+import models
+from functions import metrics
+from sqlalchemy import column, inspect, select, table
+from sqlalchemy.engine import Engine
+
+# trigramは3文字未満の検索語に使えない
+MIN_QUERY_LENGTH = 3
+
+# FTS5テーブルが作成済みのテーブル名
+available_tables: Set[str] = set()
+
+
+def detect(engine: Engine) -> Set[str]:
+    """パーサーがFTS5テーブルを作成済みか確認（結果はavailable_tablesに入れて使う）
+    Args:
+        engine(Engine): 参照先DBのengine
+    Returns:
+        tables(set[str]): FTS5テーブルが作成済みのテーブル名
+    """
+    table_names = set(inspect(engine).get_table_names())
+    return {name for name in models.FULLTEXT_COLUMNS if f"{name}_fts" in table_names}
+
+
+def contains(target: Any, value: str, narrowed: bool = False) -> Any:
+    """部分一致の絞り込み条件を作成
+    FTS5（trigram）が使える場合は転置インデックスで絞り込み、
+    使えない場合（3文字未満、FTS5テーブル未作成）はLIKE '%value%'にする。
+    Args:
+        target(InstrumentedAttribute): 検索対象の列（models.KenAll.addressなど）
+        value(str): 検索語
+        narrowed(bool): 郵便番号などで既に数件に絞れている場合はTrue（LIKEで十分）
+    Returns:
+        clause(ColumnElement): 絞り込み条件
+    """
+    model_table = target.class_.__table__
+    table_name = model_table.name
+    if (
+        narrowed
+        or len(value) < MIN_QUERY_LENGTH
+        or table_name not in available_tables
+        or target.key not in models.FULLTEXT_COLUMNS[table_name]
+    ):
+        metrics.count_index(table_name, "fts", "like")
+        return target.contains(value)
+
+    metrics.count_index(table_name, "fts", "used")
+
+    # 列を指定したフレーズ検索（trigramの連続一致 = 部分一致）
+    fts_name = f"{table_name}_fts"
+    fts = table(fts_name, column("rowid"), column(fts_name))
+    phrase = '"{}"'.format(value.replace('"', '""'))
+    match = fts.c[fts_name].op("MATCH")(f"{target.key} : {phrase}")
+
+    return model_table.c.id.in_(select(fts.c.rowid).where(match))
@@ -1,39 +1,155 @@
 import urllib.parse
+from typing import List, Optional
 
 import models
-from database import get_db
+import schemas
+from config import Setting
+from database import get_async_db, get_db
 from fastapi import Depends, HTTPException, status
 from fastapi_pagination import paginate
-from sqlalchemy import and_
+from fastapi_pagination.bases import AbstractPage
+from functions import batch, export, fulltext, metrics, zipcode_table
+from functions.pagination import paginate_query, paginate_rows, paginate_select
+from sqlalchemy import and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+settings = Setting()
+
+# FAST_SERIALIZATIONの場合に取得する列（レスポンスの列）
+# 検証を通さないので、スキーマの型（str）に合わせてNULLは""にする
+RESPONSE_COLUMNS = [
+    func.coalesce(getattr(models.Jigyosyo, name), "").label(name)
+    for name in schemas.Jigyosyo.__fields__
+]
+
 
 def get_all(
     zipcode: str,
     address: str,
     company_name: str,
+    cursor: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    jigyosyo = _lookup_memory(zipcode, address, company_name, cursor)
+    if jigyosyo is None:
+        with metrics.stage("query"):
+            jigyosyo = paginate_query(
+                db.query(models.Jigyosyo).filter(
+                    _filters(zipcode, address, company_name)
+                ),
+                models.Jigyosyo.id,
+                cursor,
+                _response_columns(),
+            )
+
+    return _check_found(jigyosyo)
+
+
+async def get_all_async(
+    zipcode: str,
+    address: str,
+    company_name: str,
+    cursor: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    jigyosyo = _lookup_memory(zipcode, address, company_name, cursor)
+    if jigyosyo is None:
+        with metrics.stage("query"):
+            jigyosyo = await paginate_select(
+                db,
+                select(models.Jigyosyo).where(_filters(zipcode, address, company_name)),
+                models.Jigyosyo.id,
+                cursor,
+                _response_columns(),
+            )
+
+    return _check_found(jigyosyo)
+
+
+def get_batch(
+    zipcodes: List[str],
+    addresses: List[str],
     db: Session = Depends(get_db),
 ):
+    """郵便番号・住所をまとめて検索（入力 -> 該当行、該当なしは空のリスト）"""
+    max_results = settings.batch_max_results
+    results = {
+        "zipcodes": batch.lookup_zipcodes(db, models.Jigyosyo, zipcodes, max_results),
+        "addresses": batch.lookup_addresses(
+            db, models.Jigyosyo, addresses, max_results
+        ),
+    }
+    metrics.observe_rows(
+        sum(len(rows) for found in results.values() for rows in found.values())
+    )
+
+    return results
+
+
+def export_all(
+    zipcode: str, address: str, company_name: str, fmt: str, accept_encoding: str
+):
+    """jigyosyo全体（絞り込みは任意）をNDJSONまたはCSVで返す"""
+    where = None
+    if zipcode or address or company_name:
+        where = _filters(zipcode, address, company_name)
+    return export.export_response(models.Jigyosyo, where, fmt, accept_encoding)
+
+
+def _lookup_memory(
+    zipcode: str, address: str, company_name: str, cursor: Optional[int]
+) -> Optional[AbstractPage]:
+    # 郵便番号だけの検索はインメモリテーブルから返す（SQLiteを使わない）
+    table = zipcode_table.tables.get(models.Jigyosyo.__tablename__)
+    if (
+        table is not None
+        and zipcode
+        and not address
+        and not company_name
+        and cursor is None
+    ):
+        rows = table.lookup(zipcode)
+        metrics.count_index(models.Jigyosyo.__tablename__, "memory", metrics.hit(rows))
+        if settings.fast_serialization:
+            return paginate_rows(rows)
+        return paginate(rows)
+
+    return None
+
+
+def _response_columns() -> Optional[List]:
+    return RESPONSE_COLUMNS if settings.fast_serialization else None
+
+
+def _check_found(jigyosyo: AbstractPage) -> AbstractPage:
+    metrics.observe_rows(len(jigyosyo.items))
+    if not jigyosyo.total:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Your query is not available.",
+        )
+
+    return jigyosyo
+
+
+def _filters(zipcode: str, address: str, company_name: str):
     filters = []
     if zipcode:
         filters.append(models.Jigyosyo.zipcode == zipcode)
     if address:
         decoded_address = urllib.parse.unquote(address)
-        filters.append(models.Jigyosyo.address.contains(decoded_address))
+        filters.append(
+            fulltext.contains(
+                models.Jigyosyo.address, decoded_address, narrowed=bool(zipcode)
+            )
+        )
     if company_name:
         decoded_company_name = urllib.parse.unquote(company_name)
-        filters.append(models.Jigyosyo.company.contains(decoded_company_name))
-
-    jigyosyo = (
-        db.query(models.Jigyosyo)
-        .filter(and_(*filters))
-        .order_by(models.Jigyosyo.id)
-        .all()
-    )
-    if not jigyosyo:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Your query is not available.",
+        filters.append(
+            fulltext.contains(
+                models.Jigyosyo.company, decoded_company_name, narrowed=bool(zipcode)
+            )
         )
 
-    return paginate(jigyosyo)
+    return and_(*filters)
@@ -1,28 +1,178 @@
 import urllib.parse
+from typing import List, Optional
 
 import models
-from database import get_db
+import schemas
+from config import Setting
+from database import get_async_db, get_db
 from fastapi import Depends, HTTPException, status
 from fastapi_pagination import paginate
-from sqlalchemy import and_
+from fastapi_pagination.bases import AbstractPage
+from functions import batch, export, fulltext, metrics, resolver, suggest, zipcode_table
+from functions.pagination import paginate_query, paginate_rows, paginate_select
+from sqlalchemy import and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+settings = Setting()
+
+# FAST_SERIALIZATIONの場合に取得する列（レスポンスの列）
+# 検証を通さないので、スキーマの型（str）に合わせてNULLは""にする
+RESPONSE_COLUMNS = [
+    func.coalesce(getattr(models.KenAll, name), "").label(name)
+    for name in schemas.KenAll.__fields__
+]
+
+
+def get_all(
+    zipcode: str,
+    address: str,
+    cursor: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    ken_all = _lookup_memory(zipcode, address, cursor)
+    if ken_all is None:
+        with metrics.stage("query"):
+            ken_all = paginate_query(
+                db.query(models.KenAll).filter(_filters(zipcode, address)),
+                models.KenAll.id,
+                cursor,
+                _response_columns(),
+            )
+
+    return _check_found(ken_all)
+
+
+async def get_all_async(
+    zipcode: str,
+    address: str,
+    cursor: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    ken_all = _lookup_memory(zipcode, address, cursor)
+    if ken_all is None:
+        with metrics.stage("query"):
+            ken_all = await paginate_select(
+                db,
+                select(models.KenAll).where(_filters(zipcode, address)),
+                models.KenAll.id,
+                cursor,
+                _response_columns(),
+            )
+
+    return _check_found(ken_all)
+
+
+def get_batch(
+    zipcodes: List[str],
+    addresses: List[str],
+    db: Session = Depends(get_db),
+):
+    """郵便番号・住所をまとめて検索（入力 -> 該当行、該当なしは空のリスト）"""
+    max_results = settings.batch_max_results
+    results = {
+        "zipcodes": batch.lookup_zipcodes(db, models.KenAll, zipcodes, max_results),
+        "addresses": batch.lookup_addresses(db, models.KenAll, addresses, max_results),
+    }
+    metrics.observe_rows(
+        sum(len(rows) for found in results.values() for rows in found.values())
+    )
+
+    return results
+
+
+def export_all(zipcode: str, address: str, fmt: str, accept_encoding: str):
+    """ken_all全体（絞り込みは任意）をNDJSONまたはCSVで返す"""
+    where = _filters(zipcode, address) if zipcode or address else None
+    return export.export_response(models.KenAll, where, fmt, accept_encoding)
+
+
+def get_suggestions(zipcode: str, address: str, limit: int) -> List[dict]:
+    """郵便番号・住所の前方一致で入力候補を返す（該当なしは空のリスト）"""
+    if suggest.index is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Suggest index is not loaded.",
+        )
+    if bool(zipcode) == bool(address):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Either zipcode or address is required.",
+        )
 
-def get_all(zipcode: str, address: str, db: Session = Depends(get_db)):
-    filters = []
     if zipcode:
-        filters.append(models.KenAll.zipcode == zipcode)
-    if address:
-        decoded_address = urllib.parse.unquote(address)
-        filters.append(models.KenAll.address.contains(decoded_address))
+        suggestions = suggest.index.by_zipcode(zipcode, limit)
+    else:
+        suggestions = suggest.index.by_address(address, limit)
+    metrics.count_index(
+        models.KenAll.__tablename__, "suggest", metrics.hit(suggestions)
+    )
+    metrics.observe_rows(len(suggestions))
+
+    return suggestions
 
-    ken_all = (
-        db.query(models.KenAll).filter(and_(*filters)).order_by(models.KenAll.id).all()
+
+def resolve(address: str) -> resolver.Resolution:
+    """番地や建物名まで含む住所から、最も長く前方一致する住所の郵便番号を返す"""
+    if resolver.index is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Resolver index is not loaded.",
+        )
+
+    resolution = resolver.index.resolve(urllib.parse.unquote(address))
+    metrics.count_index(
+        models.KenAll.__tablename__, "resolver", metrics.hit(resolution)
     )
-    if not ken_all:
+    if resolution is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Your query is not available.",
         )
 
-    return paginate(ken_all)
+    return resolution
+
+
+def _lookup_memory(
+    zipcode: str, address: str, cursor: Optional[int]
+) -> Optional[AbstractPage]:
+    # 郵便番号だけの検索はインメモリテーブルから返す（SQLiteを使わない）
+    table = zipcode_table.tables.get(models.KenAll.__tablename__)
+    if table is not None and zipcode and not address and cursor is None:
+        rows = table.lookup(zipcode)
+        metrics.count_index(models.KenAll.__tablename__, "memory", metrics.hit(rows))
+        if settings.fast_serialization:
+            return paginate_rows(rows)
+        return paginate(rows)
+
+    return None
+
+
+def _response_columns() -> Optional[List]:
+    return RESPONSE_COLUMNS if settings.fast_serialization else None
+
+
+def _check_found(ken_all: AbstractPage) -> AbstractPage:
+    metrics.observe_rows(len(ken_all.items))
+    if not ken_all.total:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Your query is not available.",
+        )
+
+    return ken_all
+
+
+def _filters(zipcode: str, address: str):
+    filters = []
+    if zipcode:
+        filters.append(models.KenAll.zipcode == zipcode)
+    if address:
+        decoded_address = urllib.parse.unquote(address)
+        filters.append(
+            fulltext.contains(
+                models.KenAll.address, decoded_address, narrowed=bool(zipcode)
+            )
+        )
+
+    return and_(*filters)
@@ -0,0 +1,289 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# 秒単位のヒストグラムの境界
+DURATION_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+# 1レスポンスの行数のヒストグラムの境界
+ROW_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    escaped = (
+        str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for value in values
+    )
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+
+class Histogram:
+    """Prometheusのhistogram（ラベルの値ごとに境界ごとの件数と合計を持つ）"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str],
+        buckets: Sequence[float] = DURATION_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series: Dict[Tuple[str, ...], List[float]] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                # 境界ごとの件数（累積しない）、+Infの件数、合計
+                series = [0] * (len(self.buckets) + 1) + [0.0]
+                self.series[label_values] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self.lock:
+            snapshot = {key: list(series) for key, series in self.series.items()}
+        for label_values, series in sorted(snapshot.items()):
+            labels = _format_labels(self.labels, label_values)
+            prefix = f"{labels}," if labels else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-1]}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+
+        return lines
+
+
+class Counter:
+    """Prometheusのcounter"""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self.lock:
+            snapshot = dict(self.values)
+        for label_values, value in sorted(snapshot.items()):
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}{{{labels}}} {value}")
+
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "zipcode_request_duration_seconds",
+    "Total time per request.",
+    ("method", "route", "status"),
+)
+STAGE_SECONDS = Histogram(
+    "zipcode_stage_duration_seconds",
+    "Time spent per stage of a request "
+    "(threadpool_wait, db_execute, query = execute + fetch + ORM, serialize).",
+    ("route", "stage"),
+)
+RESPONSE_ROWS = Histogram(
+    "zipcode_response_rows", "Rows returned per request.", ("route",), ROW_BUCKETS
+)
+INDEX_LOOKUPS = Counter(
+    "zipcode_index_lookups_total",
+    "Lookups per index (memory tables, FTS5 or LIKE, suggest, resolver).",
+    ("table", "index", "result"),
+)
+
+# /metricsで出力するもの（キャッシュの統計など、他のモジュールが追加する）
+collectors: List[Callable[[], List[str]]] = [
+    REQUEST_SECONDS.render,
+    STAGE_SECONDS.render,
+    RESPONSE_ROWS.render,
+    INDEX_LOOKUPS.render,
+]
+
+
+def render() -> str:
+    """Prometheusのテキスト形式"""
+    lines = []
+    for collector in collectors:
+        lines.extend(collector())
+
+    return "\n".join(lines) + "\n"
+
+
+class RequestMetrics:
+    """1リクエスト分の計測値（ルートが分かるレスポンス後にまとめて記録する）"""
+
+    __slots__ = ("started", "db_seconds", "stages", "rows")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_seconds = 0.0
+        self.stages: List[Tuple[str, float]] = []
+        self.rows: Optional[int] = None
+
+
+# 処理中のリクエストの計測値（スレッドプールにもコピーされる）
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar(
+    "request_metrics", default=None
+)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    request = _current.get()
+    if request is not None:
+        request.stages.append((stage, seconds))
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """with内の時間を処理中のリクエストの段階として記録"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started)
+
+
+def observe_rows(rows: int) -> None:
+    request = _current.get()
+    if request is not None:
+        request.rows = rows if request.rows is None else request.rows + rows
+
+
+def mark_threadpool_start() -> None:
+    """スレッドプールで処理が始まった時点（リクエストの開始からの待ち時間を記録）"""
+    request = _current.get()
+    if request is not None:
+        request.stages.append(
+            ("threadpool_wait", time.perf_counter() - request.started)
+        )
+
+
+def count_index(table: str, index: str, result: str) -> None:
+    INDEX_LOOKUPS.inc(table, index, result)
+
+
+def hit(result: Any) -> str:
+    """インデックスの検索結果 -> count_indexのresult（"hit"/"miss"）"""
+    return "hit" if result else "miss"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, many):
+    conn.info["metrics_started"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, many):
+    request = _current.get()
+    if request is not None:
+        request.db_seconds += time.perf_counter() - conn.info["metrics_started"]
+
+
+def install_engine_hooks() -> None:
+    """全engineのSQLの実行時間をリクエストのdb_executeとして記録する"""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    """ルートごとの合計時間と、リクエスト中に記録した段階ごとの時間を集計するASGIミドルウェア"""
+
+    def __init__(self, app):
+        self.app = app
+        # エンドポイント関数 -> ルートのパス（"/v1/ken_all/"など）
+        self.routes: Dict[Callable, str] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = RequestMetrics()
+        token = _current.set(request)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current.reset(token)
+            self.record(scope, request, status)
+
+    def record(self, scope, request: RequestMetrics, status: int) -> None:
+        total = time.perf_counter() - request.started
+        route = self.route_name(scope)
+        REQUEST_SECONDS.observe(total, scope["method"], route, str(status))
+        if request.db_seconds:
+            STAGE_SECONDS.observe(request.db_seconds, route, "db_execute")
+        for name, seconds in request.stages:
+            STAGE_SECONDS.observe(seconds, route, name)
+        if request.rows is not None:
+            RESPONSE_ROWS.observe(request.rows, route)
+
+    def route_name(self, scope) -> str:
+        """ルーターが一致させたエンドポイントのパス（一致しない場合は"unmatched"）"""
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+
+        if endpoint not in self.routes:
+            app = scope["app"]
+            for route in app.routes:
+                if getattr(route, "endpoint", None) is endpoint:
+                    self.routes[endpoint] = route.path
+                    break
+            else:
+                self.routes[endpoint] = getattr(endpoint, "__name__", "unknown")
+
+        return self.routes[endpoint]
@@ -0,0 +1,175 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from fastapi import HTTPException, status
+from fastapi_pagination import create_page, resolve_params, response
+from fastapi_pagination.api import page_type
+from fastapi_pagination.bases import AbstractPage, AbstractParams
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query
+from sqlalchemy.sql import Select
+
+
+def count_rows(query: Query, id_column: Any) -> int:
+    """ORMオブジェクトを作らずに件数だけ数える
+    Args:
+        query(Query): 絞り込み済みのクエリ
+        id_column(Column): 数える列（主キー）
+    Returns:
+        total(int): 該当件数
+    """
+    return query.order_by(None).with_entities(func.count(id_column)).scalar()
+
+
+def create_raw_page(
+    items: List[Dict[str, Any]], total: int, params: AbstractParams
+) -> AbstractPage:
+    """create_pageと同じページを、itemsを検証せずに作る（itemsはdictのまま持つ）
+    Args:
+        items(list[dict]): レスポンスの列だけを持つ行
+        total(int): 該当件数
+        params(AbstractParams): page/size
+    Returns:
+        page(AbstractPage): 1ページ分の結果
+    """
+    return page_type.get().construct(
+        items=items, total=total, page=params.page, size=params.size
+    )
+
+
+def paginate_rows(rows: List[Dict[str, Any]]) -> AbstractPage:
+    """fastapi_pagination.paginateのcreate_raw_page版（インメモリテーブルの結果用）
+    SQLのRESPONSE_COLUMNSと同じく、NULL（None）は""にする
+    """
+    params = resolve_params()
+    raw_params = params.to_raw_params()
+    items = [
+        {name: "" if value is None else value for name, value in row.items()}
+        for row in rows[raw_params.offset : raw_params.offset + raw_params.limit]
+    ]
+
+    return create_raw_page(items, len(rows), params)
+
+
+def paginate_query(
+    query: Query,
+    id_column: Any,
+    cursor: Optional[int] = None,
+    columns: Optional[Sequence[Any]] = None,
+) -> AbstractPage:
+    """LIMIT/OFFSETまたはキーセット（id > cursor）でページングする
+    cursorを指定した場合はOFFSETを使わずに、idの続きから1ページ分だけ取得する。
+    次ページがある場合は、最後のidをX-Next-Cursorヘッダーで返す。
+    columnsを指定した場合は、ORMオブジェクトを作らずにその列だけをタプルで取得し、
+    検証しないページ（create_raw_page）を返す。
+    Args:
+        query(Query): 絞り込み済みのクエリ
+        id_column(Column): ページングに使う列（主キー）
+        cursor(int): 前ページの最後のid
+        columns(list[Column]): レスポンスの列（Noneならモデルのまま）
+    Returns:
+        page(AbstractPage): 1ページ分の結果
+    """
+    params = resolve_params()
+    raw_params = params.to_raw_params()
+    _check_cursor(cursor, params)
+
+    total = count_rows(query, id_column)
+    if not total:
+        return create_page([], total, params)
+
+    if cursor is None:
+        page_query = query.order_by(id_column).offset(raw_params.offset)
+    else:
+        page_query = query.filter(id_column > cursor).order_by(id_column)
+    # 次ページがあるか分かるように1件多く取得する
+    if columns is not None:
+        rows = page_query.with_entities(id_column, *columns)
+        return _raw_page(rows.limit(raw_params.limit + 1).all(), columns, total, params)
+
+    items = page_query.limit(raw_params.limit + 1).all()
+    items = _set_next_cursor(items, raw_params.limit, lambda item: item.id)
+
+    return create_page(items, total, params)
+
+
+async def paginate_select(
+    db: AsyncSession,
+    stmt: Select,
+    id_column: Any,
+    cursor: Optional[int] = None,
+    columns: Optional[Sequence[Any]] = None,
+) -> AbstractPage:
+    """paginate_queryのasync版（AsyncSessionとselect()を使う）
+    Args:
+        db(AsyncSession): セッション
+        stmt(Select): 絞り込み済みのselect
+        id_column(Column): ページングに使う列（主キー）
+        cursor(int): 前ページの最後のid
+        columns(list[Column]): レスポンスの列（Noneならモデルのまま）
+    Returns:
+        page(AbstractPage): 1ページ分の結果
+    """
+    params = resolve_params()
+    raw_params = params.to_raw_params()
+    _check_cursor(cursor, params)
+
+    total = await db.scalar(
+        stmt.order_by(None).with_only_columns(func.count(id_column))
+    )
+    if not total:
+        return create_page([], total, params)
+
+    if cursor is None:
+        page_stmt = stmt.order_by(id_column).offset(raw_params.offset)
+    else:
+        page_stmt = stmt.where(id_column > cursor).order_by(id_column)
+    # 次ページがあるか分かるように1件多く取得する
+    if columns is not None:
+        rows_stmt = page_stmt.with_only_columns(id_column, *columns)
+        rows = (await db.execute(rows_stmt.limit(raw_params.limit + 1))).all()
+        return _raw_page(rows, columns, total, params)
+
+    items = (await db.scalars(page_stmt.limit(raw_params.limit + 1))).all()
+    items = _set_next_cursor(items, raw_params.limit, lambda item: item.id)
+
+    return create_page(items, total, params)
+
+
+def _raw_page(
+    rows: Sequence[Any], columns: Sequence[Any], total: int, params: AbstractParams
+) -> AbstractPage:
+    # rowsは(id, *columns)のタプル
+    rows = _set_next_cursor(rows, params.to_raw_params().limit, lambda row: row[0])
+
+    names = [column.key for column in columns]
+    return create_raw_page([dict(zip(names, row[1:])) for row in rows], total, params)
+
+
+def _check_cursor(cursor: Optional[int], params: AbstractParams) -> None:
+    """cursorを指定した場合はpageを使わないので、1以外のpageは受け付けない
+    （レスポンスのpageと中身が食い違わないように）
+    """
+    if cursor is not None and params.page != 1:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="page cannot be used with cursor.",
+        )
+
+
+def _set_next_cursor(
+    rows: Sequence[Any], limit: int, get_id: Callable[[Any], int]
+) -> Sequence[Any]:
+    """limit + 1件目があれば次ページがあるので、limit件目のidをX-Next-Cursorで返す
+    Args:
+        rows(list): limit + 1件まで取得した行
+        limit(int): 1ページの件数
+        get_id(Callable): 行 -> id
+    Returns:
+        rows(list): limit件までの行
+    """
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response().headers["X-Next-Cursor"] = str(get_id(rows[-1]))
+
+    return rows
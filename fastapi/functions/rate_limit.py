@@ -0,0 +1,377 @@
+import asyncio
+import functools
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, NamedTuple, Optional, Set, Tuple
+
+from config import Setting
+from fastapi import HTTPException, Request, status
+from starlette.concurrency import run_in_threadpool
+
+settings = Setting()
+
+logger = logging.getLogger(__name__)
+
+# "5/minute", "100/hour", "10/second", "3/10 minutes"の形式
+LIMIT_PATTERN = re.compile(r"^\s*(\d+)\s*/\s*(\d+)?\s*(second|minute|hour|day)s?\s*$")
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# これだけ確認したら、満タンに戻ったバケツをファイルから消す（プロセスごと）
+PRUNE_INTERVAL = 10_000
+
+
+class Rate(NamedTuple):
+    capacity: float  # バケツの大きさ（連続して受け付ける回数）
+    per_second: float  # 1秒あたりに戻る回数
+
+
+def parse_limit(limit: str) -> Rate:
+    """制限の文字列（"5/minute"など） -> トークンバケツの大きさと補充の速さ
+    Args:
+        limit(str): 回数/期間
+    Returns:
+        rate(Rate): バケツの大きさと1秒あたりの補充数
+    """
+    match = LIMIT_PATTERN.match(limit)
+    if match is None:
+        raise ValueError(f"invalid rate limit: {limit!r}")
+
+    count, multiplier, period = match.groups()
+    seconds = PERIODS[period] * int(multiplier or 1)
+    return Rate(float(count), int(count) / seconds)
+
+
+def refill(row: Optional[Tuple[float, float]], rate: Rate, now: float) -> float:
+    """前回の残りに経過時間分を補充したトークン数（バケツが無ければ満タン）
+    Args:
+        row(tuple): 前回の残りと、それを計算した時刻（無ければNone）
+        rate(Rate): バケツの大きさと補充の速さ
+        now(float): 現在時刻（time.time()）
+    Returns:
+        tokens(float): 補充後のトークン数
+    """
+    if row is None:
+        return rate.capacity
+    return min(rate.capacity, row[0] + (now - row[1]) * rate.per_second)
+
+
+class TokenBucketStorage:
+    """同じホストのワーカー間で共有するトークンバケツ（SQLiteファイル）
+    1回の確認は主キーでの読み込みと書き込み（O(1)）で、BEGIN IMMEDIATEで
+    書き込みロックを取ってから補充・消費・判定を行うのでプロセス間でも競合しない。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.local = threading.local()
+        self.checks = 0
+        with self.connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS token_bucket ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, "
+                "updated REAL NOT NULL) WITHOUT ROWID"
+            )
+
+    def connect(self) -> sqlite3.Connection:
+        # スレッドプールのスレッドごとに接続を持つ（トランザクションは明示的に開始する）
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=5)
+            conn.execute("PRAGMA journal_mode = WAL")
+            # カウンタなので、電源断で直近の値が消えても問題ない
+            conn.execute("PRAGMA synchronous = OFF")
+            self.local.conn = conn
+        return conn
+
+    def take(self, key: str, rate: Rate) -> Tuple[bool, float]:
+        """バケツからトークンを1つ取る
+        Args:
+            key(str): バケツのキー
+            rate(Rate): バケツの大きさと補充の速さ
+        Returns:
+            allowed(bool): 取れたか
+            retry_after(float): 取れなかった場合、次に取れるまでの秒数
+        """
+        conn = self.connect()
+        # 読み込み前に書き込みロックを取る（他のプロセスとの間で同じトークンを取らない）
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute(
+                "SELECT tokens, updated FROM token_bucket WHERE key = ?", (key,)
+            ).fetchone()
+            # 経過時間分を補充してから1つ取る（足りなければ取らない）
+            tokens = refill(row, rate, now)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute(
+                "INSERT OR REPLACE INTO token_bucket (key, tokens, updated) "
+                "VALUES (?, ?, ?)",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        self.count_check(now)
+
+        if allowed:
+            return True, 0.0
+        return False, (1 - tokens) / rate.per_second
+
+    def consume(self, key: str, rate: Rate, count: int) -> Tuple[float, float]:
+        """ワーカーが受け付けた回数をまとめてバケツから引く（足りなくても引く）
+        Args:
+            key(str): バケツのキー
+            rate(Rate): バケツの大きさと補充の速さ
+            count(int): 引く回数
+        Returns:
+            tokens(float): 引いた後の残り（他のワーカーの分も含む。負の場合は超過分）
+            updated(float): 残りを計算した時刻（time.time()）
+        """
+        conn = self.connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute(
+                "SELECT tokens, updated FROM token_bucket WHERE key = ?", (key,)
+            ).fetchone()
+            tokens = refill(row, rate, now) - count
+            conn.execute(
+                "INSERT OR REPLACE INTO token_bucket (key, tokens, updated) "
+                "VALUES (?, ?, ?)",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        self.count_check(now)
+
+        return tokens, now
+
+    def count_check(self, now: float) -> None:
+        self.checks += 1
+        if self.checks % PRUNE_INTERVAL == 0:
+            self.prune(now)
+
+    def prune(self, now: float) -> None:
+        """1日以上使われていないバケツを消す（どの制限でも満タンに戻っている）"""
+        self.connect().execute(
+            "DELETE FROM token_bucket WHERE updated < ?", (now - PERIODS["day"],)
+        )
+
+    def clear(self) -> None:
+        self.connect().execute("DELETE FROM token_bucket")
+
+
+class LocalBucket:
+    """ワーカー内のバケツ（consumedは共有のバケツにまだ反映していない回数）"""
+
+    def __init__(self, rate: Rate, now: float):
+        self.rate = rate
+        self.tokens = rate.capacity
+        self.updated = now
+        self.consumed = 0
+
+
+class LocalBuckets:
+    """リクエストごとの確認をワーカー内のメモリだけで行うトークンバケツ
+    受け付けた回数はsync_interval秒ごとにバックグラウンドのスレッドで共有のバケツ
+    （TokenBucketStorage）から引き、他のワーカーの分も含めた残りを読み戻す。
+    反映までの間はワーカーごとに数えるので、複数ワーカーでは一時的に制限を超えて
+    受け付けることがある（超えた分は共有のバケツから引くので、その後は待たされる）。
+    """
+
+    def __init__(self, storage: Callable[[], TokenBucketStorage], sync_interval: float):
+        self.storage = storage
+        self.sync_interval = sync_interval
+        self.lock = threading.Lock()
+        self.buckets: Dict[str, LocalBucket] = {}
+        # 前回の反映以降に確認したキー
+        self.touched: Set[str] = set()
+        self.thread: Optional[threading.Thread] = None
+
+    def take(self, key: str, rate: Rate) -> Tuple[bool, float]:
+        """TokenBucketStorage.takeと同じ（ファイルには書かない）"""
+        now = time.time()
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name="rate-limit-sync", daemon=True
+                )
+                self.thread.start()
+
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = LocalBucket(rate, now)
+            bucket.tokens = refill((bucket.tokens, bucket.updated), rate, now)
+            bucket.updated = now
+            self.touched.add(key)
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                bucket.consumed += 1
+                return True, 0.0
+            return False, (1 - bucket.tokens) / rate.per_second
+
+    def run(self) -> None:
+        while True:
+            time.sleep(self.sync_interval)
+            try:
+                self.sync()
+            except Exception:
+                # 共有ファイルに書けない間も、ワーカー内のバケツで制限は続ける
+                logger.exception("failed to sync rate limit buckets")
+
+    def sync(self) -> None:
+        """前回以降に確認したバケツを共有のバケツに反映し、残りを読み戻す"""
+        with self.lock:
+            touched, self.touched = self.touched, set()
+            pending = [
+                (key, self.buckets[key].rate, self.buckets[key].consumed)
+                for key in touched
+            ]
+
+        storage = self.storage()
+        synced = 0
+        try:
+            for key, rate, consumed in pending:
+                tokens, updated = storage.consume(key, rate, consumed)
+                with self.lock:
+                    bucket = self.buckets[key]
+                    # 反映中に受け付けた分はまだ共有のバケツから引いていないので残す
+                    bucket.consumed -= consumed
+                    bucket.tokens = tokens - bucket.consumed
+                    bucket.updated = updated
+                synced += 1
+        finally:
+            # 反映できなかったバケツは次回に回す
+            with self.lock:
+                self.touched.update(key for key, _, _ in pending[synced:])
+
+        # しばらく使われていないバケツは捨てる（次に使う時は満タンから数える）
+        now = time.time()
+        with self.lock:
+            for key, bucket in list(self.buckets.items()):
+                idle = now - bucket.updated
+                if (
+                    key not in self.touched
+                    and not bucket.consumed
+                    and idle * bucket.rate.per_second >= bucket.rate.capacity
+                ):
+                    del self.buckets[key]
+
+
+class RateLimiter:
+    """全ルーターで共有するレート制限
+    ルートごとの制限はconfig.Setting.rate_limitsで、APIキーごとの制限は
+    config.Setting.rate_limit_api_keysで上書きできる（APIキーはIPアドレスとは別に数える）。
+    """
+
+    def __init__(
+        self,
+        storage_path: str,
+        enabled: bool = True,
+        route_limits: Optional[Dict[str, str]] = None,
+        api_key_limits: Optional[Dict[str, str]] = None,
+        api_key_header: str = "X-API-Key",
+        sync_interval: float = 1.0,
+    ):
+        self.enabled = enabled
+        self.storage_path = storage_path
+        self._storage: Optional[TokenBucketStorage] = None
+        # 0ならリクエストごとに共有のバケツ（ファイル）で確認する
+        self.local = (
+            LocalBuckets(lambda: self.storage, sync_interval)
+            if sync_interval > 0
+            else None
+        )
+        self.route_limits = {
+            name: parse_limit(limit) for name, limit in (route_limits or {}).items()
+        }
+        self.api_key_limits = {
+            key: parse_limit(limit) for key, limit in (api_key_limits or {}).items()
+        }
+        self.api_key_header = api_key_header
+
+    @property
+    def storage(self) -> TokenBucketStorage:
+        # ファイルは最初の確認で作る（レート制限を無効にした場合は作らない）
+        if self._storage is None:
+            self._storage = TokenBucketStorage(self.storage_path)
+        return self._storage
+
+    def limit(self, name: str, default: str) -> Callable:
+        """ルートにレート制限をかけるデコレータ（ルートの引数にrequest: Requestが必要）
+        Args:
+            name(str): ルート名（config.Setting.rate_limitsのキー）
+            default(str): 制限（"5/minute"など）
+        Returns:
+            decorator(Callable): デコレータ
+        """
+        rate = self.route_limits.get(name, parse_limit(default))
+
+        def decorator(func: Callable) -> Callable:
+            if asyncio.iscoroutinefunction(func):
+
+                @functools.wraps(func)
+                async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                    if self.local is not None:
+                        # ワーカー内のメモリだけで確認する（スレッドプールを使わない）
+                        self.check(kwargs["request"], name, rate)
+                    else:
+                        # SQLiteのロック待ちでイベントループを止めないようにスレッドで確認する
+                        await run_in_threadpool(
+                            self.check, kwargs["request"], name, rate
+                        )
+                    return await func(*args, **kwargs)
+
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                self.check(kwargs["request"], name, rate)
+                return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def check(self, request: Request, name: str, rate: Rate) -> None:
+        """制限を超えていれば429を返す"""
+        if not self.enabled:
+            return
+
+        api_key = request.headers.get(self.api_key_header)
+        if api_key in self.api_key_limits:
+            rate = self.api_key_limits[api_key]
+            # ファイルにAPIキーそのものは書かない
+            client = "key:" + hashlib.sha1(api_key.encode("utf-8")).hexdigest()[:16]
+        else:
+            client = request.client.host if request.client else "unknown"
+
+        buckets = self.local if self.local is not None else self.storage
+        allowed, retry_after = buckets.take(f"{name}:{client}", rate)
+        if not allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded.",
+                headers={"Retry-After": str(max(1, round(retry_after)))},
+            )
+
+
+limiter = RateLimiter(
+    settings.rate_limit_storage,
+    enabled=settings.rate_limit_enabled,
+    route_limits=settings.rate_limits,
+    api_key_limits=settings.rate_limit_api_keys,
+    api_key_header=settings.api_key_header,
+    sync_interval=settings.rate_limit_sync_interval,
+)
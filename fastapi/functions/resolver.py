@@ -0,0 +1,103 @@
+import re
+import sys
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import normalization
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+# 入力の先頭の郵便番号（"〒100-0001 東京都..."）は照合に使わない
+ZIPCODE_PREFIX = re.compile(r"^\s*〒?\d{3}-?\d{4}")
+# 空白は除く（"東京都 千代田区"）。ただし数字の間の空白は番地の区切りなので残す
+SPACES = re.compile(r"(?<!\d)\s+|\s+(?!\d)")
+
+
+class Resolution(NamedTuple):
+    address: str  # 一致した住所（都道府県 + 市区町村 + 町域）
+    zipcodes: List[str]  # 一致した住所の郵便番号（id順）
+    rest: str  # 一致した部分より後ろ（番地、建物名など）
+
+
+class AddressResolver:
+    """番地や建物名まで含む住所から、最も長く前方一致する既知の住所の郵便番号を引く
+    既知の住所（都道府県を除いたものも含む）を長さごとに辞書に入れておき、
+    入力の先頭を長い順に切り出して辞書を引く（最初に見つかったものが最長一致）。
+    1件あたりの処理は既知の住所の長さの種類数（数十）回の辞書検索で済む。
+    """
+
+    def __init__(self):
+        self.addresses: Dict[str, List[str]] = {}
+        self.lengths: List[int] = []
+        self.load_seconds = 0.0
+
+    def __len__(self) -> int:
+        return len(self.addresses)
+
+    @classmethod
+    def load(cls, engine: Engine, table_name: str = "ken_all"):
+        """DBから既知の住所を読み込む
+        Args:
+            engine(Engine): 参照先DBのengine
+            table_name(str): テーブル名
+        Returns:
+            resolver(AddressResolver): 読み込み済みのresolver
+        """
+        started = time.perf_counter()
+        resolver = cls()
+        intern = sys.intern
+
+        with engine.connect() as conn:
+            result = conn.execute(
+                text(
+                    f"SELECT zipcode, prefecture, address FROM {table_name} "
+                    "WHERE address IS NOT NULL ORDER BY id"
+                )
+            )
+            for zipcode, prefecture, address in result:
+                keys = [address]
+                # 都道府県を省略した入力（"千代田区千代田1-1"）でも引けるようにする
+                if prefecture and address.startswith(prefecture):
+                    keys.append(address[len(prefecture) :])
+                for key in keys:
+                    zipcodes = resolver.addresses.setdefault(key, [])
+                    if zipcode not in zipcodes:
+                        zipcodes.append(intern(zipcode))
+
+        resolver.lengths = sorted(
+            {len(key) for key in resolver.addresses if key}, reverse=True
+        )
+        resolver.load_seconds = time.perf_counter() - started
+        return resolver
+
+    def resolve(self, address: str) -> Optional[Resolution]:
+        """最も長く前方一致する既知の住所を返す
+        Args:
+            address(str): 住所（番地、建物名などを含んでよい）
+        Returns:
+            resolution(Resolution): 一致した住所と郵便番号（一致しない場合はNone）
+        """
+        value = normalize(address)
+        n = len(value)
+        for length in self.lengths:
+            if length > n:
+                continue
+            zipcodes = self.addresses.get(value[:length])
+            if zipcodes is None:
+                continue
+            # 数字の途中で切れる一致（"町1"と"町12-3"）は使わない
+            if length < n and value[length - 1 : length + 1].isdigit():
+                continue
+            return Resolution(value[:length], zipcodes, value[length:])
+
+        return None
+
+
+def normalize(address: str) -> str:
+    """パーサーと同じ正規化（normalization.normalize）に加え、先頭の郵便番号と空白を除く"""
+    value = ZIPCODE_PREFIX.sub("", normalization.normalize(address))
+    return SPACES.sub("", value)
+
+
+# ken_allの住所 -> 郵便番号（config.Setting.resolver_indexが有効な場合だけ作成する）
+index: Optional[AddressResolver] = None
@@ -0,0 +1,81 @@
+import asyncio
+import functools
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class _Call:
+    """実行中の呼び出し（同じキーの後続の呼び出しはこの結果を待つ）"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """同じキーの呼び出しが同時に来た場合、最初の1回だけ実行して結果を共有する
+    同期版（スレッド）はdo、async版はdo_asyncを使う。collapsedは実行せずに結果を待った回数。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls: Dict[Hashable, _Call] = {}
+        self.tasks: Dict[Hashable, asyncio.Task] = {}
+        self.collapsed = 0
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """funcを実行（同じキーで実行中のものがあれば、その結果を待って返す）
+        Args:
+            key(Hashable): 呼び出しのキー
+            func(Callable): 実行する関数
+        Returns:
+            result(Any): funcの戻り値（例外もそのまま送出する）
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+            else:
+                self.collapsed += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+        return call.result
+
+    async def do_async(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """doのasync版（同じイベントループ内の呼び出しをまとめる）
+        funcは別のタスクで実行し、最初の呼び出しも含めてshieldして待つので、
+        どの呼び出しがキャンセルされても、実行中のfuncと他の呼び出しは止まらない。
+        """
+        task = self.tasks.get(key)
+        if task is None:
+            task = self.tasks[key] = asyncio.ensure_future(func())
+            task.add_done_callback(functools.partial(self._finish, key))
+        else:
+            self.collapsed += 1
+
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        """funcのタスクが終わったら、次の呼び出しからは新しく実行する"""
+        if self.tasks.get(key) is task:
+            del self.tasks[key]
+        # 誰も待っていない場合（全員キャンセル）に「例外が取得されなかった」警告を出さない
+        if not task.cancelled():
+            task.exception()
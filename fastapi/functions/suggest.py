@@ -0,0 +1,130 @@
+import bisect
+import sys
+import time
+import urllib.parse
+from typing import Dict, List, Optional, Tuple
+
+import normalization
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+# 郵便番号の入力で無視する文字（"〒100-0001"など）
+ZIPCODE_SEPARATORS = str.maketrans("", "", "〒- ")
+
+
+class SuggestIndex:
+    """前方一致の入力補完用の読み取り専用インデックス（ken_all）
+    郵便番号順の行と、住所（都道府県を除いたものも含む）をソートした配列を持ち、
+    前方一致の範囲を二分探索で求めて先頭からlimit件を返す。
+    順序は郵便番号なら(zipcode, id)順、住所なら住所の辞書順で、データが同じなら常に同じ。
+    """
+
+    def __init__(self):
+        self.entries: List[Tuple[str, str]] = []
+        self.zipcodes: List[str] = []
+        self.address_keys: List[str] = []
+        self.address_entries: List[int] = []
+        self.load_seconds = 0.0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @classmethod
+    def load(cls, engine: Engine, table_name: str = "ken_all"):
+        """DBからインデックスを作成
+        Args:
+            engine(Engine): 参照先DBのengine
+            table_name(str): テーブル名
+        Returns:
+            index(SuggestIndex): 作成済みのインデックス
+        """
+        started = time.perf_counter()
+        index = cls()
+        intern = sys.intern
+        seen = set()
+        keys: List[Tuple[str, int]] = []
+
+        with engine.connect() as conn:
+            result = conn.execute(
+                text(
+                    f"SELECT zipcode, prefecture, address FROM {table_name} "
+                    "WHERE address IS NOT NULL ORDER BY zipcode, id"
+                )
+            )
+            for zipcode, prefecture, address in result:
+                if (zipcode, address) in seen:
+                    continue
+                seen.add((zipcode, address))
+                i = len(index.entries)
+                index.entries.append((intern(zipcode), address))
+                index.zipcodes.append(index.entries[i][0])
+                keys.append((address, i))
+                # 都道府県を省略した入力（"千代田区..."）でも引けるようにする
+                if prefecture and address.startswith(prefecture):
+                    keys.append((address[len(prefecture) :], i))
+
+        keys.sort()
+        index.address_keys = [key for key, _ in keys]
+        index.address_entries = [i for _, i in keys]
+        index.load_seconds = time.perf_counter() - started
+        return index
+
+    def by_zipcode(self, prefix: str, limit: int) -> List[Dict[str, str]]:
+        """郵便番号の前方一致
+        Args:
+            prefix(str): 郵便番号の先頭（"100-"、"〒1000"など）
+            limit(int): 最大件数
+        Returns:
+            rows(list[dict]): 該当行（zipcode, address）
+        """
+        prefix = normalize(prefix).translate(ZIPCODE_SEPARATORS)
+        if not prefix.isdigit():
+            return []
+
+        results = []
+        start = bisect.bisect_left(self.zipcodes, prefix)
+        for i in range(start, min(start + limit, len(self.entries))):
+            if not self.zipcodes[i].startswith(prefix):
+                break
+            results.append(self._row(i))
+
+        return results
+
+    def by_address(self, prefix: str, limit: int) -> List[Dict[str, str]]:
+        """住所の前方一致
+        Args:
+            prefix(str): 住所の先頭（都道府県は省略可）
+            limit(int): 最大件数
+        Returns:
+            rows(list[dict]): 該当行（zipcode, address）
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        results = []
+        seen = set()
+        position = bisect.bisect_left(self.address_keys, prefix)
+        while position < len(self.address_keys) and len(results) < limit:
+            if not self.address_keys[position].startswith(prefix):
+                break
+            i = self.address_entries[position]
+            if i not in seen:
+                seen.add(i)
+                results.append(self._row(i))
+            position += 1
+
+        return results
+
+    def _row(self, i: int) -> Dict[str, str]:
+        zipcode, address = self.entries[i]
+        return {"zipcode": zipcode, "address": address}
+
+
+def normalize(value: str) -> str:
+    """入力を保存時と同じ形にする（URLデコード、パーサーと同じ正規化）"""
+    return normalization.normalize(urllib.parse.unquote(value)).strip()
+
+
+# ken_allの入力補完用インデックス（config.Setting.suggest_indexが有効な場合だけ作成する）
+index: Optional[SuggestIndex] = None
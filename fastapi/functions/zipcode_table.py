@@ -0,0 +1,90 @@
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+
+class ZipcodeTable:
+    """郵便番号をキーにした読み取り専用のインメモリテーブル
+    ORMオブジェクトは作らず、列ごとのlistに文字列を持つ（同じ文字列はintern）。
+    行は(zipcode, id)順に並べ、郵便番号 -> (開始行, 終了行) の辞書で引く。
+    """
+
+    def __init__(self, columns: Sequence[str]):
+        self.columns = tuple(columns)
+        self.data: Tuple[List[Optional[str]], ...] = tuple([] for _ in self.columns)
+        self.ranges: Dict[str, Tuple[int, int]] = {}
+        self.load_seconds = 0.0
+
+    def __len__(self) -> int:
+        return len(self.data[0]) if self.data else 0
+
+    @classmethod
+    def load(cls, engine: Engine, table_name: str, columns: Sequence[str]):
+        """DBからテーブルを読み込む
+        Args:
+            engine(Engine): 参照先DBのengine
+            table_name(str): テーブル名
+            columns(list[str]): 保持する列（レスポンスに含まれる列）
+        Returns:
+            table(ZipcodeTable): 読み込み済みのテーブル
+        """
+        started = time.perf_counter()
+        table = cls(columns)
+        zipcode_pos = table.columns.index("zipcode")
+        intern = sys.intern
+
+        with engine.connect() as conn:
+            result = conn.execute(
+                text(
+                    f"SELECT {', '.join(table.columns)} FROM {table_name} "
+                    "ORDER BY zipcode, id"
+                )
+            )
+            for i, row in enumerate(result):
+                for values, value in zip(table.data, row):
+                    values.append(intern(value) if value is not None else None)
+                zipcode = row[zipcode_pos]
+                start, _ = table.ranges.get(zipcode, (i, i))
+                table.ranges[intern(zipcode)] = (start, i + 1)
+
+        table.load_seconds = time.perf_counter() - started
+        return table
+
+    def lookup(self, zipcode: str) -> List[Dict[str, Optional[str]]]:
+        """郵便番号の完全一致で行を返す（id順）
+        Args:
+            zipcode(str): 郵便番号
+        Returns:
+            rows(list[dict]): 該当行
+        """
+        start, stop = self.ranges.get(zipcode, (0, 0))
+        return [
+            dict(zip(self.columns, values))
+            for values in zip(*(column[start:stop] for column in self.data))
+        ]
+
+    def nbytes(self) -> int:
+        """おおよそのメモリ使用量（共有している文字列は1回だけ数える）"""
+        seen = set()
+        size = sys.getsizeof(self.ranges)
+        for key, value in self.ranges.items():
+            size += sys.getsizeof(value)
+            if id(key) not in seen:
+                seen.add(id(key))
+                size += sys.getsizeof(key)
+        for values in self.data:
+            size += sys.getsizeof(values)
+            for value in values:
+                if value is not None and id(value) not in seen:
+                    seen.add(id(value))
+                    size += sys.getsizeof(value)
+
+        return size
+
+
+# テーブル名 -> ZipcodeTable、またはartifact.Artifact（lookupが同じ）
+# config.Setting.memory_lookup / artifact_lookupが有効な場合だけ読み込む
+tables: Dict[str, ZipcodeTable] = {}
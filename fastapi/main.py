@@ -1,27 +1,245 @@
+import functools
+import logging
+import os
+import time
+from typing import Callable, Dict, Optional
+
 from fastapi import FastAPI
 from fastapi_pagination import add_pagination
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.errors import RateLimitExceeded
-from slowapi.util import get_remote_address
+from sqlalchemy import inspect, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.engine import Engine
 
-from database import engine
-from models import Base
+import artifact
+import schemas
+from config import Setting
+import database
+from functions import cache, fulltext, metrics, resolver, suggest, zipcode_table
+from models import FULLTEXT_COLUMNS, Base, DatasetVersion, Jigyosyo, KenAll
+from routes import cache as cache_route
 from routes import index, jigyosyo, ken_all
+from routes import metrics as metrics_route
 
-app = FastAPI()
+settings = Setting()
+logger = logging.getLogger("uvicorn.error")
 
-# slowapi
-limiter = Limiter(key_func=get_remote_address)
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+app = FastAPI()
 
 # ルーティング
 app.include_router(index.router)
 app.include_router(ken_all.router)
 app.include_router(jigyosyo.router)
+app.include_router(cache_route.router)
 
-# テーブル作成
-Base.metadata.create_all(engine)
+# 計測（ルート・段階ごとの処理時間、返した行数、インデックス・キャッシュのヒット率）
+if settings.metrics_enabled:
+    metrics.install_engine_hooks()
+    app.add_middleware(metrics.MetricsMiddleware)
+    app.include_router(metrics_route.router)
 
 # fastapi-pagination（この位置が大事）
 add_pagination(app)
+
+
+@app.on_event("startup")
+def startup() -> None:
+    # DBファイルがまだ無いとき（パーサー実行前）だけ空のテーブルを作る
+    # 稼働中のDBには書き込まない（テーブル・インデックスはパーサーが作成する）
+    database.create_empty_database()
+
+    engine = database.engine
+    check_indexes(engine)
+    database.warm_up(engine)
+    loaders = [
+        detect_fulltext,
+        load_zipcode_tables,
+        load_suggest_index,
+        load_resolver_index,
+        load_dataset_version,
+    ]
+    for loader in loaders:
+        loader(engine)()
+
+    # パーサーがDBファイルを置き換えたら、新しいengineで確認し直す（バックグラウンドで読み込む）
+    database.reload_listeners.extend(loaders)
+
+
+@app.on_event("startup")
+async def startup_async() -> None:
+    # async版のengineも接続を開いておく（ASYNC_DB=trueの場合）
+    if database.async_engine is not None:
+        await database.warm_up_async(database.async_engine)
+
+
+def check_indexes(engine: Engine) -> None:
+    """パーサーがテーブルを作り直した後でもインデックスがあるか確認
+    無い場合は警告だけ出す（インデックスはパーサーが作成する。稼働中のDBは書き換えない）
+    """
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing = {
+            table_index["name"] for table_index in inspector.get_indexes(table.name)
+        }
+        for table_index in table.indexes:
+            if table_index.name not in existing:
+                logger.warning(
+                    "index %s is missing, re-run the parser to create it",
+                    table_index.name,
+                )
+
+
+def unchanged() -> None:
+    """読み込むものが無い場合の反映する関数"""
+
+
+def detect_fulltext(engine: Engine) -> Callable[[], None]:
+    """部分一致検索にFTS5テーブルを使えるか確認（無ければLIKEで検索する）
+    Args:
+        engine(Engine): API用のengine
+    Returns:
+        apply(Callable): 確認結果を反映する関数
+    """
+    tables = fulltext.detect(engine)
+    for table_name in sorted(set(FULLTEXT_COLUMNS) - tables):
+        logger.warning("%s_fts is missing, falling back to LIKE", table_name)
+
+    def apply() -> None:
+        fulltext.available_tables = tables
+
+    return apply
+
+
+def load_zipcode_tables(engine: Engine) -> Callable[[], None]:
+    """郵便番号検索用のインメモリテーブルを読み込み、メモリ使用量と読み込み時間を出力
+    Args:
+        engine(Engine): API用のengine
+    Returns:
+        apply(Callable): 読み込んだテーブルに入れ替える関数
+    """
+    if settings.artifact_lookup:
+        return load_artifacts()
+    if not settings.memory_lookup:
+        return unchanged
+
+    tables = {}
+    for model, schema in ((KenAll, schemas.KenAll), (Jigyosyo, schemas.Jigyosyo)):
+        table = zipcode_table.ZipcodeTable.load(
+            engine, model.__tablename__, list(schema.__fields__)
+        )
+        tables[model.__tablename__] = table
+        logger.info(
+            "loaded %s into memory: %d rows, %.1f MiB, %.0f ms",
+            model.__tablename__,
+            len(table),
+            table.nbytes() / 2**20,
+            table.load_seconds * 1000,
+        )
+
+    return functools.partial(zipcode_table.tables.update, tables)
+
+
+def load_artifacts() -> Callable[[], None]:
+    """パーサーが出力したバイナリファイルをmmapする（無いテーブルはDBで検索する）
+    Returns:
+        apply(Callable): mmapしたファイルに入れ替える関数
+    """
+    tables: Dict[str, Optional[artifact.Artifact]] = {}
+    for model, schema in ((KenAll, schemas.KenAll), (Jigyosyo, schemas.Jigyosyo)):
+        table_name = model.__tablename__
+        path = artifact.artifact_path(
+            table_name, os.path.dirname(database.DATABASE_PATH)
+        )
+        started = time.perf_counter()
+        try:
+            table = artifact.Artifact(path, list(schema.__fields__))
+        except (FileNotFoundError, ValueError) as e:
+            tables[table_name] = None
+            logger.warning("%s is not available (%s), using the database", path, e)
+            continue
+
+        tables[table_name] = table
+        logger.info(
+            "mapped %s: %d rows, %.1f MiB, %.1f ms, version %s",
+            path,
+            len(table),
+            table.nbytes() / 2**20,
+            (time.perf_counter() - started) * 1000,
+            table.version or "(none)",
+        )
+
+    def apply() -> None:
+        for table_name, table in tables.items():
+            if table is None:
+                zipcode_table.tables.pop(table_name, None)
+            else:
+                zipcode_table.tables[table_name] = table
+
+    return apply
+
+
+def load_suggest_index(engine: Engine) -> Callable[[], None]:
+    """ken_allの入力補完用インデックスを作成
+    Args:
+        engine(Engine): API用のengine
+    Returns:
+        apply(Callable): 作成したインデックスに入れ替える関数
+    """
+    if not settings.suggest_index:
+        return unchanged
+
+    index = suggest.SuggestIndex.load(engine, KenAll.__tablename__)
+    logger.info(
+        "built suggest index: %d entries, %.0f ms",
+        len(index),
+        index.load_seconds * 1000,
+    )
+
+    return functools.partial(setattr, suggest, "index", index)
+
+
+def load_resolver_index(engine: Engine) -> Callable[[], None]:
+    """ken_allの住所 -> 郵便番号の辞書を作成
+    Args:
+        engine(Engine): API用のengine
+    Returns:
+        apply(Callable): 作成した辞書に入れ替える関数
+    """
+    if not settings.resolver_index:
+        return unchanged
+
+    index = resolver.AddressResolver.load(engine, KenAll.__tablename__)
+    logger.info(
+        "built resolver index: %d addresses, %.0f ms",
+        len(index),
+        index.load_seconds * 1000,
+    )
+
+    return functools.partial(setattr, resolver, "index", index)
+
+
+def load_dataset_version(engine: Engine) -> Callable[[], None]:
+    """パーサーが書き込んだデータのバージョンを読み込む（変わっていればキャッシュを捨てる）
+    Args:
+        engine(Engine): API用のengine
+    Returns:
+        apply(Callable): バージョンを反映する関数
+    """
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(
+                select(
+                    DatasetVersion.name,
+                    DatasetVersion.version,
+                    DatasetVersion.loaded_at,
+                ).order_by(DatasetVersion.name)
+            ).all()
+    except OperationalError:
+        # dataset_versionテーブルが無いDB（古いパーサーで作成したもの）
+        rows = []
+
+    version = ",".join(
+        f"{name}={version}@{loaded_at}" for name, version, loaded_at in rows
+    )
+    logger.info("dataset version: %s", version or "(none)")
+
+    return functools.partial(cache.set_version, version)
@@ -1,27 +1,55 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Index, Integer, String
 
 from database import Base
 
 
 class KenAll(Base):
     __tablename__ = "ken_all"
+    __table_args__ = (Index("ix_ken_all_prefecture_city", "prefecture", "city"),)
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    zipcode = Column(String)
+    zipcode = Column(String, index=True)
     prefecture = Column(String)
     city = Column(String)
     town = Column(String)
     address = Column(String)
 
 
+class KenAllSource(Base):
+    """ken_allの行の元になったKEN_ALL.CSVの行（パーサーが月次の差分で削除する行を特定する）"""
+
+    __tablename__ = "ken_all_source"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)  # ken_all.id
+    source = Column(String, index=True)  # 前処理前の行のハッシュ
+
+
 class Jigyosyo(Base):
     __tablename__ = "jigyosyo"
+    __table_args__ = (Index("ix_jigyosyo_prefecture_city", "prefecture", "city"),)
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     company = Column(String)
-    zipcode = Column(String)
+    zipcode = Column(String, index=True)
     prefecture = Column(String)
     city = Column(String)
     town = Column(String)
     chome = Column(String)
     address = Column(String)
+
+
+class DatasetVersion(Base):
+    """パーサーが書き込むデータのバージョン（APIはキャッシュとETagに使う）"""
+
+    __tablename__ = "dataset_version"
+
+    name = Column(String, primary_key=True)
+    version = Column(String)  # 公開日
+    loaded_at = Column(String)  # パーサーが書き込んだ日時
+
+
+# 部分一致検索用のFTS5（trigram）テーブル <テーブル名>_fts の列
+FULLTEXT_COLUMNS = {
+    KenAll.__tablename__: ["address", "town"],
+    Jigyosyo.__tablename__: ["company", "address", "town"],
+}
@@ -0,0 +1,45 @@
+"""住所の文字の正規化（パーサーとAPIで共通）
+
+パーサーがDBに書き込む住所と、APIが受け取った入力を同じ規則でそろえる。
+"""
+
+import unicodedata
+from typing import Dict
+
+# NFKCでは半角にならない文字 -> 置き換え後
+# （パーサーは町域名の前処理の最後に置き換える。前処理の規則は"−"のまま照合するため）
+REPLACEMENTS: Dict[str, str] = {
+    "−": "-",
+}
+
+
+def to_narrow(value: str) -> str:
+    """全角 -> 半角（NFKC）
+    Args:
+        value(str): 変換したいテキスト
+    Returns:
+        value(str): 変換後のテキスト
+    """
+    return unicodedata.normalize("NFKC", value)
+
+
+def replace_symbols(value: str) -> str:
+    """NFKCでは半角にならない文字（REPLACEMENTS）を置き換える
+    Args:
+        value(str): 置き換えたいテキスト
+    Returns:
+        value(str): 置き換え後のテキスト
+    """
+    for old, new in REPLACEMENTS.items():
+        value = value.replace(old, new)
+    return value
+
+
+def normalize(value: str) -> str:
+    """パーサーがDBに書き込む住所と同じ形にする（全角 -> 半角と記号の置き換え）
+    Args:
+        value(str): 住所
+    Returns:
+        value(str): 正規化後の住所
+    """
+    return replace_symbols(to_narrow(value))
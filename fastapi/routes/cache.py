@@ -0,0 +1,14 @@
+from config import Setting
+from fastapi import APIRouter, Request, status
+from functions import cache
+from functions.rate_limit import limiter
+
+settings = Setting()
+
+router = APIRouter(prefix=f"/{settings.version}/cache", tags=["cache"])
+
+
+@router.get("/", status_code=status.HTTP_200_OK)
+@limiter.limit("cache", "5/minute")
+def get_cache_stats(request: Request):  # レート制限用
+    return cache.response_cache.stats()
@@ -1,15 +1,13 @@
 from config import Setting
 from fastapi import APIRouter, Request, status
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+from functions.rate_limit import limiter
 
 settings = Setting()
 
 router = APIRouter(tags=["index"])
-limiter = Limiter(key_func=get_remote_address)
 
 
 @router.get("/", status_code=status.HTTP_200_OK)
-@limiter.limit("5/minute")
-def index(request: Request):  # slowapi用
+@limiter.limit("index", "5/minute")
+def index(request: Request):  # レート制限用
     return {"info": "pleaase access /docs"}
@@ -2,31 +2,115 @@ from typing import Optional
 
 import schemas
 from config import Setting
-from database import get_db
-from fastapi import APIRouter, Depends, Request, status
+from database import check_reload, get_db
+from fastapi import APIRouter, Depends, Query, Request, status
+from fastapi.responses import StreamingResponse
 from fastapi_pagination import Page
-from functions import jigyosyo
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+from functions import cache, jigyosyo
+from functions.rate_limit import limiter
 from sqlalchemy.orm import Session
 
 settings = Setting()
 
 router = APIRouter(prefix=f"/{settings.version}/jigyosyo", tags=["jigyosyo"])
-limiter = Limiter(key_func=get_remote_address)
+
+
+if settings.async_db:
+    # async版（スレッドプールを使わずにイベントループ上で処理する）
+    @router.get(
+        "/",
+        status_code=status.HTTP_200_OK,
+        response_model=Page[schemas.Jigyosyo],
+        dependencies=[Depends(check_reload)],  # セッションは検索時に開く
+    )
+    @limiter.limit("jigyosyo", "5/minute")
+    async def get_jigyosyo(
+        request: Request,  # レート制限用
+        zipcode: Optional[str] = None,
+        address: Optional[str] = None,
+        compnay_name: Optional[str] = None,
+        cursor: Optional[int] = None,
+    ):
+        key = cache.make_key(
+            "jigyosyo",
+            zipcode=zipcode,
+            address=address,
+            company_name=compnay_name,
+            cursor=cursor,
+        )
+        cached = cache.lookup(request, key)
+        if cached is not None:
+            return cached
+        return await cache.fetch_async(
+            key,
+            lambda db: jigyosyo.get_all_async(
+                zipcode, address, compnay_name, cursor, db
+            ),
+        )
+
+else:
+
+    @router.get(
+        "/",
+        status_code=status.HTTP_200_OK,
+        response_model=Page[schemas.Jigyosyo],
+    )
+    @limiter.limit("jigyosyo", "5/minute")
+    def get_jigyosyo(
+        request: Request,  # レート制限用
+        zipcode: Optional[str] = None,
+        address: Optional[str] = None,
+        compnay_name: Optional[str] = None,
+        cursor: Optional[int] = None,
+        db: Session = Depends(get_db),
+    ):
+        key = cache.make_key(
+            "jigyosyo",
+            zipcode=zipcode,
+            address=address,
+            company_name=compnay_name,
+            cursor=cursor,
+        )
+        cached = cache.lookup(request, key)
+        if cached is not None:
+            return cached
+        return cache.fetch(
+            key, lambda: jigyosyo.get_all(zipcode, address, compnay_name, cursor, db)
+        )
 
 
 @router.get(
-    "/",
+    "/export",
     status_code=status.HTTP_200_OK,
-    response_model=Page[schemas.Jigyosyo],
+    response_class=StreamingResponse,
 )
-@limiter.limit("5/minute")
-def get_jigyosyo(
-    request: Request,  # slowapi用
+@limiter.limit("jigyosyo_export", "2/minute")
+def get_jigyosyo_export(
+    request: Request,  # レート制限用
     zipcode: Optional[str] = None,
     address: Optional[str] = None,
-    compnay_name: Optional[str] = None,
+    compnay_name: Optional[str] = None,  # 検索（/）と同じパラメータ名
+    fmt: str = Query("ndjson", alias="format", regex="^(ndjson|csv)$"),
+):
+    # 全件を送りながらDBから読む（Accept-Encodingにgzipがあれば圧縮する）
+    return jigyosyo.export_all(
+        zipcode,
+        address,
+        compnay_name,
+        fmt,
+        request.headers.get("accept-encoding", ""),
+    )
+
+
+@router.post(
+    "/batch",
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.JigyosyoBatch,
+)
+@limiter.limit("jigyosyo_batch", "5/minute")  # 1回のバッチを1回として数える
+def get_jigyosyo_batch(
+    request: Request,  # レート制限用
+    query: schemas.BatchQuery,
     db: Session = Depends(get_db),
 ):
-    return jigyosyo.get_all(zipcode, address, compnay_name, db)
+    return jigyosyo.get_batch(query.zipcodes, query.addresses, db)
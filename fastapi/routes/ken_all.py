@@ -1,31 +1,123 @@
-from typing import Optional
+from typing import List, Optional
 
 import schemas
 from config import Setting
-from database import get_db
-from fastapi import APIRouter, Depends, Request, status
+from database import check_reload, get_db
+from fastapi import APIRouter, Depends, Query, Request, status
+from fastapi.responses import StreamingResponse
 from fastapi_pagination import Page
-from functions import ken_all
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+from functions import cache, ken_all
+from functions.rate_limit import limiter
 from sqlalchemy.orm import Session
 
 settings = Setting()
 
 router = APIRouter(prefix=f"/{settings.version}/ken_all", tags=["ken_all"])
-limiter = Limiter(key_func=get_remote_address)
+
+
+if settings.async_db:
+    # async版（スレッドプールを使わずにイベントループ上で処理する）
+    @router.get(
+        "/",
+        status_code=status.HTTP_200_OK,
+        response_model=Page[schemas.KenAll],
+        dependencies=[Depends(check_reload)],  # セッションは検索時に開く
+    )
+    @limiter.limit("ken_all", "5/minute")
+    async def get_ken_all(
+        request: Request,  # レート制限用
+        zipcode: Optional[str] = None,
+        address: Optional[str] = None,
+        cursor: Optional[int] = None,
+    ):
+        key = cache.make_key("ken_all", zipcode=zipcode, address=address, cursor=cursor)
+        cached = cache.lookup(request, key)
+        if cached is not None:
+            return cached
+        return await cache.fetch_async(
+            key, lambda db: ken_all.get_all_async(zipcode, address, cursor, db)
+        )
+
+else:
+
+    @router.get(
+        "/",
+        status_code=status.HTTP_200_OK,
+        response_model=Page[schemas.KenAll],
+    )
+    @limiter.limit("ken_all", "5/minute")
+    def get_ken_all(
+        request: Request,  # レート制限用
+        zipcode: Optional[str] = None,
+        address: Optional[str] = None,
+        cursor: Optional[int] = None,
+        db: Session = Depends(get_db),
+    ):
+        key = cache.make_key("ken_all", zipcode=zipcode, address=address, cursor=cursor)
+        cached = cache.lookup(request, key)
+        if cached is not None:
+            return cached
+        return cache.fetch(key, lambda: ken_all.get_all(zipcode, address, cursor, db))
 
 
 @router.get(
-    "/",
+    "/suggest",
     status_code=status.HTTP_200_OK,
-    response_model=Page[schemas.KenAll],
+    response_model=List[schemas.KenAll],
 )
-@limiter.limit("5/minute")
-def get_ken_all(
-    request: Request,  # slowapi用
+# 入力のたびに呼ばれるので検索より緩くする
+@limiter.limit("ken_all_suggest", "60/minute")
+async def get_ken_all_suggest(
+    request: Request,  # レート制限用
     zipcode: Optional[str] = None,
     address: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=settings.suggest_max_results),
+):
+    # メモリ上のインデックスだけで返すので、スレッドプールを使わずに処理する
+    return ken_all.get_suggestions(zipcode, address, limit)
+
+
+@router.get(
+    "/resolve",
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.KenAllResolved,
+)
+@limiter.limit("ken_all_resolve", "5/minute")
+async def get_ken_all_resolve(
+    request: Request,  # レート制限用
+    address: str,
+):
+    # メモリ上の辞書だけで返すので、スレッドプールを使わずに処理する
+    return ken_all.resolve(address)._asdict()
+
+
+@router.get(
+    "/export",
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+)
+@limiter.limit("ken_all_export", "2/minute")
+def get_ken_all_export(
+    request: Request,  # レート制限用
+    zipcode: Optional[str] = None,
+    address: Optional[str] = None,
+    fmt: str = Query("ndjson", alias="format", regex="^(ndjson|csv)$"),
+):
+    # 全件を送りながらDBから読む（Accept-Encodingにgzipがあれば圧縮する）
+    return ken_all.export_all(
+        zipcode, address, fmt, request.headers.get("accept-encoding", "")
+    )
+
+
+@router.post(
+    "/batch",
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.KenAllBatch,
+)
+@limiter.limit("ken_all_batch", "5/minute")  # 1回のバッチを1回として数える
+def get_ken_all_batch(
+    request: Request,  # レート制限用
+    query: schemas.BatchQuery,
     db: Session = Depends(get_db),
 ):
-    return ken_all.get_all(zipcode, address, db)
+    return ken_all.get_batch(query.zipcodes, query.addresses, db)
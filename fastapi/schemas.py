@@ -1,4 +1,11 @@
-from pydantic import BaseModel
+from typing import Dict, List
+
+from pydantic import BaseModel, Field, constr, root_validator
+
+from config import Setting
+from functions.fulltext import MIN_QUERY_LENGTH
+
+settings = Setting()
 
 
 class KenAll(BaseModel):
@@ -23,3 +30,33 @@ class Jigyosyo(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class KenAllResolved(BaseModel):
+    address: str  # 一致した住所
+    zipcodes: List[str]
+    rest: str  # 一致した部分より後ろ（番地、建物名など）
+
+
+class BatchQuery(BaseModel):
+    zipcodes: List[str] = Field([], max_items=settings.batch_max_size)
+    # 3文字未満はFTS5（trigram）が使えず全件走査になるので受け付けない
+    addresses: List[constr(min_length=MIN_QUERY_LENGTH)] = Field(
+        [], max_items=settings.batch_max_addresses
+    )
+
+    @root_validator
+    def check_not_empty(cls, values):
+        if not values.get("zipcodes") and not values.get("addresses"):
+            raise ValueError("zipcodes or addresses is required")
+        return values
+
+
+class KenAllBatch(BaseModel):
+    zipcodes: Dict[str, List[KenAll]] = {}
+    addresses: Dict[str, List[KenAll]] = {}
+
+
+class JigyosyoBatch(BaseModel):
+    zipcodes: Dict[str, List[Jigyosyo]] = {}
+    addresses: Dict[str, List[Jigyosyo]] = {}
@@ -1,18 +1,75 @@
 import datetime
+import json
 import os
 import shutil
-import urllib.error
-import urllib.request
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Set, TypeVar, Union
 
 import requests
 from bs4 import BeautifulSoup
-from tenacity import retry, stop_after_attempt, wait_fixed
+from requests.adapters import HTTPAdapter
+from tenacity import retry, stop_after_attempt, wait_random_exponential
+
+T = TypeVar("T")
 
 # retry設定
-wait = wait_fixed(30)  # リトライ間隔
+# リトライ間隔（指数バックオフ + ジッター）
+wait = wait_random_exponential(multiplier=2, max=60)
 stop = stop_after_attempt(5)  # リトライ回数
 
+# 同時ダウンロード数
+MAX_WORKERS = 4
+
+# ダウンロード時に1回で書き込むサイズ
+CHUNK_SIZE = 1024 * 1024
+
+# 接続を使い回すセッション（スレッド間で共有する）
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_maxsize=MAX_WORKERS))
+
+# 最後に適用したデータのバージョン（公開日）。パーサーが適用後に書き込む
+VERSION_FILE = "./version.json"
+
+# ダウンロードしたファイルの内容。パーサーが読み込む
+MANIFEST_FILE = "./zip/manifest.json"
+
+# 差分ファイルで追いつける最大の月数（それより古い場合は全件ダウンロード）
+MAX_DIFF_MONTHS = 12
+
+# 公開日を載せているページ
+PUBLISHED_PAGES = {
+    "ken_all": "https://www.post.japanpost.jp/zipcode/dl/kogaki-zip.html",
+    "jigyosyo": "https://www.post.japanpost.jp/zipcode/dl/jigyosyo/index-zip.html",
+}
+
+# 全件ファイルと月次の差分ファイル（{yymm}は更新月）
+DATASETS = {
+    "ken_all": {
+        "full": "https://www.post.japanpost.jp/zipcode/dl/kogaki/zip/ken_all.zip",
+        "add": "https://www.post.japanpost.jp/zipcode/dl/kogaki/zip/add_{yymm}.zip",
+        "del": "https://www.post.japanpost.jp/zipcode/dl/kogaki/zip/del_{yymm}.zip",
+    },
+    "jigyosyo": {
+        "full": "https://www.post.japanpost.jp/zipcode/dl/jigyosyo/zip/jigyosyo.zip",
+        "add": "https://www.post.japanpost.jp/zipcode/dl/jigyosyo/zip/jadd{yymm}.zip",
+        "del": "https://www.post.japanpost.jp/zipcode/dl/jigyosyo/zip/jdel{yymm}.zip",
+    },
+}
+
+
+def run_concurrently(func: Callable[..., T], args_list: Iterable) -> List[T]:
+    """funcを引数ごとにスレッドで同時に実行（結果は引数の順）
+    Args:
+        func(Callable): 実行する関数
+        args_list(Iterable): 引数（タプルの場合は展開して渡す）
+    Returns:
+        results(list): 戻り値
+    """
+    args_list = [args if isinstance(args, tuple) else (args,) for args in args_list]
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = [executor.submit(func, *args) for args in args_list]
+        return [future.result() for future in futures]
+
 
 @retry(wait=wait, stop=stop)
 def get_soup(url: str) -> BeautifulSoup:
@@ -22,7 +79,8 @@ def get_soup(url: str) -> BeautifulSoup:
     Returns:
         soup(BeautifulSoup): HTML
     """
-    res = requests.get(url)
+    res = session.get(url, timeout=30)
+    res.raise_for_status()
     res.encoding = res.apparent_encoding  # 文字化け修正
     soup = BeautifulSoup(res.text, "html.parser")
 
@@ -30,69 +88,229 @@ def get_soup(url: str) -> BeautifulSoup:
 
 
 @retry(wait=wait, stop=stop)
-def check_update() -> List[str]:
-    """今日>更新日かチェック
+def get_published_dates() -> Dict[str, datetime.date]:
+    """KEN_ALLとJIGYOSYOの公開日を取得
     Args:
         None
     Returns:
-        result(list[str]): update_ken_allとupdate_jigyosoが入る
+        result(dict[str, date]): データ名 -> 公開日
     """
+    # 2ページを同時に取得
+    ken_all_soup, jigyosyo_soup = run_concurrently(
+        get_soup, [PUBLISHED_PAGES["ken_all"], PUBLISHED_PAGES["jigyosyo"]]
+    )
+
     # KEN_ALL
-    ken_all_soup = get_soup("https://www.post.japanpost.jp/zipcode/dl/kogaki-zip.html")
     ken_all_updated_at = (
         ken_all_soup.find("div", class_="arrange-r").get_text().replace("\n", "")
     )
     ken_all_updated_at = datetime.datetime.strptime(ken_all_updated_at, "%Y年%m月%d日更新")
 
     # JIGYOSYO
-    jigyosyo_soup = get_soup(
-        "https://www.post.japanpost.jp/zipcode/dl/jigyosyo/index-zip.html"
-    )
     jigyosyo_updated_at = jigyosyo_soup.select("div.pad p small")[0].get_text()
     jigyosyo_updated_at = datetime.datetime.strptime(
         jigyosyo_updated_at, "%Y年%m月%d日更新版"
     )
 
-    # 更新チェック
-    now = datetime.datetime.now()
-    result = []
-    if now > ken_all_updated_at:
-        result.append("update_ken_all")
-    if now > jigyosyo_updated_at:
-        result.append("update_jigyosyo")
+    return {
+        "ken_all": ken_all_updated_at.date(),
+        "jigyosyo": jigyosyo_updated_at.date(),
+    }
+
+
+def load_versions(file_path: str = VERSION_FILE) -> Dict[str, datetime.date]:
+    """最後に適用したデータのバージョンを読み込む
+    Args:
+        file_path(str): version.jsonのファイルパス
+    Returns:
+        versions(dict[str, date]): データ名 -> 適用済みの公開日（未適用のデータは含まない）
+    """
+    if not os.path.exists(file_path):
+        return {}
+
+    with open(file_path, encoding="utf-8") as f:
+        return {
+            name: datetime.date.fromisoformat(version)
+            for name, version in json.load(f).items()
+        }
+
 
-    return result
+def check_update(applied: Dict[str, datetime.date]) -> Dict[str, datetime.date]:
+    """適用済みのバージョンより新しいデータがあるかチェック
+    Args:
+        applied(dict[str, date]): load_versionsの戻り値
+    Returns:
+        result(dict[str, date]): 更新が必要なデータ名 -> 公開日
+    """
+    return {
+        name: published
+        for name, published in get_published_dates().items()
+        if name not in applied or applied[name] < published
+    }
+
+
+def diff_months(
+    applied: Optional[datetime.date], published: datetime.date
+) -> List[str]:
+    """適用済みの版から公開された版までに必要な差分ファイルの更新月（YYMM）
+    Args:
+        applied(date): 適用済みの公開日（未適用ならNone）
+        published(date): 公開日
+    Returns:
+        months(list[str]): 古い順の更新月。差分で追いつけない場合は空（全件ダウンロード）
+    """
+    if applied is None:
+        return []
 
+    months = []
+    year, month = applied.year, applied.month
+    while (year, month) < (published.year, published.month):
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        months.append(f"{year % 100:02d}{month:02d}")
+    if len(months) > MAX_DIFF_MONTHS:
+        return []
 
-def make_folder(folder_path: str) -> None:
+    return months
+
+
+def plan_urls(plan: Union[str, List[dict]]) -> List[str]:
+    """ダウンロードの計画 -> URL（全件ファイル、または月ごとのdel, add）"""
+    if isinstance(plan, str):
+        return [plan]
+    return [month[kind] for month in plan for kind in ("del", "add")]
+
+
+def make_manifest(
+    plans: Dict[str, Union[str, List[dict]]],
+    check: Dict[str, datetime.date],
+    downloaded: Set[str],
+) -> Dict[str, dict]:
+    """パーサーに渡すファイル（ZIPのまま）
+    前回から変わっていない（304）ファイルだけのデータは、パーサーが同じ内容を
+    読み直さないように入れない。差分は月の順に適用するので、1つでもダウンロードしたら全ての月を入れる。
+    Args:
+        plans(dict): データ名 -> 全件ファイルのURL、または月ごとの{"yymm", "del", "add"}
+        check(dict): データ名 -> 公開日
+        downloaded(set[str]): ダウンロードした（200）URL
+    Returns:
+        manifest(dict): データ名 -> {"mode": "full"|"diff", "version", "files"/"months"}
+    """
+    manifest = {}
+    for name, plan in plans.items():
+        if downloaded.isdisjoint(plan_urls(plan)):
+            print(f"not modified: {name}")
+            continue
+
+        version = str(check[name])
+        if isinstance(plan, str):
+            files = [plan.rsplit("/", 1)[-1]]
+            manifest[name] = {"mode": "full", "version": version, "files": files}
+        else:
+            months = [
+                {
+                    "yymm": month["yymm"],
+                    **{kind: month[kind].rsplit("/", 1)[-1] for kind in ("del", "add")},
+                }
+                for month in plan
+            ]
+            manifest[name] = {"mode": "diff", "version": version, "months": months}
+
+    return manifest
+
+
+def write_manifest(manifest: Dict[str, dict], file_path: str = MANIFEST_FILE) -> None:
+    """ダウンロードしたファイルの内容を書き込む
+    Args:
+        manifest(dict): データ名 -> {"mode": "full"|"diff", "version", "files"/"months"}
+        file_path(str): manifest.jsonのファイルパス
+    Returns:
+        None
+    """
+    with open(file_path, mode="w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+
+def make_folder(folder_path: str, clean: bool = True) -> None:
     """フォルダ作成
     Args:
         folder_path(str): フォルダパス
+        clean(bool): 既にある場合は、先に丸ごと削除する
     Returns:
         None
     """
-    # 既にある場合は、先に丸ごと削除する
     if os.path.exists(folder_path):
+        if not clean:
+            return
         shutil.rmtree(folder_path)
 
     # 保存先ディレクトリ作成
     os.mkdir(folder_path)
 
 
+def load_validators(file_path: str) -> Dict[str, str]:
+    """前回ダウンロードしたファイルのETag / Last-Modified
+    Args:
+        file_path(str): ダウンロードしたファイルのパス
+    Returns:
+        validators(dict[str, str]): 条件付きGETのヘッダー（ファイルが無い場合は空）
+    """
+    if not os.path.exists(file_path) or not os.path.exists(f"{file_path}.json"):
+        return {}
+
+    with open(f"{file_path}.json", encoding="utf-8") as f:
+        validators = json.load(f)
+
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+
+    return headers
+
+
 @retry(wait=wait, stop=stop)
-def download_zip(file_url: str, save_file_name: str) -> None:
+def download_zip(file_url: str, save_file_name: str) -> bool:
     """ZIPダウンロード
+    一時ファイルに少しずつ書き込んでから置き換えるので、メモリ使用量はZIPのサイズによらず、
+    途中で失敗しても前回のファイルは壊れない。前回から変わっていなければ（304）ダウンロードしない。
     Args:
         file_url(str): ダウンロードURL
         save_file_name(str): ダウンロードファイル名
     Returns:
-        None
+        downloaded(bool): ダウンロードした場合はTrue（変更なしの場合はFalse）
     """
-    try:
-        with urllib.request.urlopen(file_url) as download_file:
-            data = download_file.read()
-            with open(f"./zip/{save_file_name}", mode="wb") as save_file:
-                save_file.write(data)
-        print(f"download conmplete: {save_file_name}")
-    except urllib.error.URLError as e:
-        print(e)
+    file_path = f"./zip/{save_file_name}"
+    headers = load_validators(file_path)
+
+    with session.get(file_url, headers=headers, stream=True, timeout=60) as res:
+        if res.status_code == 304:
+            print(f"not modified: {save_file_name}")
+            return False
+        res.raise_for_status()
+
+        tmp_path = f"{file_path}.part"
+        try:
+            with open(tmp_path, mode="wb") as save_file:
+                for chunk in res.iter_content(chunk_size=CHUNK_SIZE):
+                    save_file.write(chunk)
+        except BaseException:
+            # 途中で失敗（中断）した場合は書きかけの一時ファイルを残さない
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, file_path)
+
+        # 次回の条件付きGET用
+        with open(f"{file_path}.json", mode="w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "etag": res.headers.get("ETag"),
+                    "last_modified": res.headers.get("Last-Modified"),
+                },
+                f,
+            )
+
+    print(f"download conmplete: {save_file_name}")
+
+    return True
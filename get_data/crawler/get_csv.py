@@ -1,23 +1,48 @@
-import shutil
+from crawler_utils import (
+    DATASETS,
+    check_update,
+    diff_months,
+    download_zip,
+    load_versions,
+    make_folder,
+    make_manifest,
+    plan_urls,
+    run_concurrently,
+    write_manifest,
+)
 
-from crawler_utils import check_update, download_zip, make_folder
+# フォルダ初期化（ZIPは条件付きGETに使うので残す。パーサーはZIPを直接読み込む）
+make_folder("./zip", clean=False)
 
-# フォルダ初期化
-make_folder("./zip")
-make_folder("./csv")
+# 更新チェック（最後に適用したバージョンと公開日を比較）
+applied = load_versions()
+check = check_update(applied)
 
-# 更新チェック
-check = check_update()
-if "update_ken_all" in check:
-    # KEN_ALL
-    download_zip(
-        "https://www.post.japanpost.jp/zipcode/dl/kogaki/zip/ken_all.zip", "ken_all.zip"
-    )
-    shutil.unpack_archive("./zip/ken_all.zip", "./csv")  # ZIP解凍
-if "update_jigyosyo" in check:
-    # JIGYOSYO
-    download_zip(
-        "https://www.post.japanpost.jp/zipcode/dl/jigyosyo/zip/jigyosyo.zip",
-        "jigyosyo.zip",
-    )
-    shutil.unpack_archive("./zip/jigyosyo.zip", "./csv")  # ZIP解凍
+# ダウンロードするファイル（データ名 -> 全件ファイルまたは月次の差分ファイル）
+plans = {}
+for name, published in check.items():
+    urls = DATASETS[name]
+    months = diff_months(applied.get(name), published)
+    if months:
+        # 月次の差分ファイル（del -> addの順に適用する）
+        plans[name] = [
+            {
+                "yymm": yymm,
+                **{kind: urls[kind].format(yymm=yymm) for kind in ("del", "add")},
+            }
+            for yymm in months
+        ]
+    else:
+        # 全件ファイル
+        plans[name] = urls["full"]
+
+
+# まとめて同時にダウンロード
+downloads = [url for plan in plans.values() for url in plan_urls(plan)]
+results = run_concurrently(
+    download_zip, [(url, url.rsplit("/", 1)[-1]) for url in downloads]
+)
+
+# パーサーに渡すファイル（前回から変わっていないデータは入れない）
+downloaded = {url for url, result in zip(downloads, results) if result}
+write_manifest(make_manifest(plans, check, downloaded))
@@ -1,29 +1,118 @@
-import numpy as np
-from sqlalchemy import create_engine
+import argparse
 
-from parse_utils import make_jigyosyo, set_index, to_narrow
+import pandas as pd
 
-# DB接続
-SQLALCHEMY_DATABASE_URL = "sqlite:///../../fastapi/zipcode.db"
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+from parse_utils import (
+    RunReport,
+    apply_jigyosyo_diff,
+    bulk_load,
+    create_fulltext_index,
+    create_indexes,
+    load_manifest,
+    make_jigyosyo,
+    optimize_database,
+    process_jigyosyo,
+    save_dataset_version,
+    save_version,
+    set_index,
+    staging_database,
 )
 
-# DF作成
-jigyosyo = make_jigyosyo("../crawler/csv/JIGYOSYO.CSV")
+# DB（一時ファイルに作成してから置き換える）
+DATABASE_PATH = "../../fastapi/zipcode.db"
 
-# インデックス追加
-set_index(jigyosyo)
+# 郵便番号検索用のバイナリファイル（APIがmmapで読む）の出力先
+ARTIFACT_DIR = "../../fastapi"
 
-# 全角 -> 半角
-# NaNはいったん文字列にしてから戻す（to_narrowのエラー回避）
-jigyosyo.fillna("NaN", inplace=True)
-for column_name, _ in jigyosyo.items():
-    jigyosyo[column_name] = jigyosyo[column_name].apply(to_narrow)
-jigyosyo.replace("NaN", np.nan, inplace=True)
+# 段階ごとの処理時間とピークメモリの記録（前回の実行と比べる）
+REPORT_DIR = "reports"
 
-# idはintにしてDBに書き込み（上書き）
-jigyosyo["id"] = jigyosyo["id"].astype(int)
-jigyosyo.to_sql("jigyosyo", con=engine, if_exists="replace", index=False)
+# クローラーの出力（ZIPのまま読み込む）
+ZIP_DIR = "../crawler/zip"
+MANIFEST_FILE = f"{ZIP_DIR}/manifest.json"
 
-print("done: parse jigyosyo")
+# 古いクローラーが解凍したCSV（manifest.jsonが無い場合）
+CSV_DIR = "../crawler/csv"
+VERSION_FILE = "../crawler/version.json"
+
+
+def read_jigyosyo(file_path: str, workers: int, report: RunReport) -> pd.DataFrame:
+    """CSV（ZIP）を読み込み、全角 -> 半角まで行う"""
+    with report.stage("read"):
+        # DF作成
+        jigyosyo = make_jigyosyo(file_path)
+
+        # インデックス追加
+        set_index(jigyosyo)
+
+    with report.stage("process"):
+        # 全角 -> 半角（列単位で変換するのでNaNはそのまま）
+        return process_jigyosyo(jigyosyo, workers)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--workers", type=int, default=1, help="前処理のプロセス数（1なら並列化しない）"
+    )
+    args = parser.parse_args()
+
+    # manifest.jsonが無い場合（古いクローラー）はJIGYOSYO.CSVを全件読み込む
+    manifest = load_manifest(MANIFEST_FILE)
+    if manifest is None:
+        entry = {"mode": "full", "files": ["JIGYOSYO.CSV"], "dir": CSV_DIR}
+    elif "jigyosyo" in manifest:
+        entry = manifest["jigyosyo"]
+    else:
+        print("skip: jigyosyo is up to date")
+        return
+
+    report = RunReport("jigyosyo")
+
+    # 稼働中のDBには書き込まず、検証が通ってから置き換える
+    with staging_database(DATABASE_PATH, "jigyosyo", ARTIFACT_DIR, report) as engine:
+        if entry["mode"] == "diff":
+            # 月次の差分を古い順に適用
+            for month in entry["months"]:
+                deleted = read_jigyosyo(
+                    f"{ZIP_DIR}/{month['del']}", args.workers, report
+                )
+                added = read_jigyosyo(f"{ZIP_DIR}/{month['add']}", args.workers, report)
+                with report.stage("diff"):
+                    apply_jigyosyo_diff(engine, added, deleted)
+                print(f"applied: jigyosyo diff {month['yymm']}")
+        else:
+            file_path = f"{entry.get('dir', ZIP_DIR)}/{entry['files'][0]}"
+            jigyosyo = read_jigyosyo(file_path, args.workers, report)
+
+            # idはintにしてDBに書き込み（上書き）
+            jigyosyo["id"] = jigyosyo["id"].astype(int)
+            with report.stage("load"):
+                bulk_load(engine, jigyosyo, "jigyosyo")
+
+            # インデックス作成（テーブルを作り直しているので毎回、データを入れた後に作る）
+            with report.stage("indexes"):
+                create_indexes(engine, "jigyosyo")
+            print(f"loaded: jigyosyo {len(jigyosyo.index)} rows")
+
+            # 部分一致検索用のFTS5テーブル（月次の差分では変わった行だけ更新済み）
+            with report.stage("fulltext"):
+                create_fulltext_index(engine, "jigyosyo")
+
+        # APIのキャッシュを無効にするためのバージョン
+        save_dataset_version(engine, "jigyosyo", entry.get("version"))
+
+        # 統計情報の更新（APIのクエリプランナー用）とVACUUM（全件の場合だけ）
+        with report.stage("optimize"):
+            optimize_database(engine, vacuum=entry["mode"] != "diff")
+
+    # 適用したバージョンを記録
+    if "version" in entry:
+        save_version(VERSION_FILE, "jigyosyo", entry["version"])
+
+    report.save(REPORT_DIR)
+    print("done: parse jigyosyo")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,122 @@
-from sqlalchemy import create_engine
+import argparse
 
-from parse_utils import make_ken_all, merge_lines, preproc_ken_all, set_index, to_narrow
+import pandas as pd
 
-# DB接続
-SQLALCHEMY_DATABASE_URL = "sqlite:///../../fastapi/zipcode.db"
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+from parse_utils import (
+    RunReport,
+    apply_ken_all_diff,
+    bulk_load,
+    create_fulltext_index,
+    create_indexes,
+    load_manifest,
+    make_ken_all,
+    optimize_database,
+    process_ken_all,
+    save_dataset_version,
+    save_version,
+    set_index,
+    staging_database,
 )
 
-# DF作成
-ken_all = make_ken_all("../crawler/csv/KEN_ALL.CSV")
+# DB（一時ファイルに作成してから置き換える）
+DATABASE_PATH = "../../fastapi/zipcode.db"
 
-# インデックス追加
-set_index(ken_all)
+# 郵便番号検索用のバイナリファイル（APIがmmapで読む）の出力先
+ARTIFACT_DIR = "../../fastapi"
 
-# 全角 -> 半角
-for column_name, _ in ken_all.items():
-    ken_all[column_name] = ken_all[column_name].apply(to_narrow)
+# 段階ごとの処理時間とピークメモリの記録（前回の実行と比べる）
+REPORT_DIR = "reports"
 
-# 町域名のマージ
-ken_all = merge_lines(ken_all)
+# クローラーの出力（ZIPのまま読み込む）
+ZIP_DIR = "../crawler/zip"
+MANIFEST_FILE = f"{ZIP_DIR}/manifest.json"
 
-# 前処理
-ken_all = preproc_ken_all(ken_all)
+# 古いクローラーが解凍したCSV（manifest.jsonが無い場合）
+CSV_DIR = "../crawler/csv"
+VERSION_FILE = "../crawler/version.json"
 
-# idはintにしてDBに書き込み（上書き）
-ken_all["id"] = ken_all["id"].astype(int)
-ken_all.to_sql("ken_all", con=engine, if_exists="replace", index=False)
 
-print("done: parse ken_all")
+def read_ken_all(file_path: str, workers: int, report: RunReport) -> pd.DataFrame:
+    """CSV（ZIP）を読み込み、全角 -> 半角、町域名のマージ、前処理まで行う"""
+    with report.stage("read"):
+        # DF作成
+        ken_all = make_ken_all(file_path)
+
+        # インデックス追加
+        set_index(ken_all)
+
+    with report.stage("process"):
+        # 全角 -> 半角、町域名のマージ、前処理
+        return process_ken_all(ken_all, workers)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--workers", type=int, default=1, help="前処理のプロセス数（1なら並列化しない）"
+    )
+    args = parser.parse_args()
+
+    # manifest.jsonが無い場合（古いクローラー）はKEN_ALL.CSVを全件読み込む
+    manifest = load_manifest(MANIFEST_FILE)
+    if manifest is None:
+        entry = {"mode": "full", "files": ["KEN_ALL.CSV"], "dir": CSV_DIR}
+    elif "ken_all" in manifest:
+        entry = manifest["ken_all"]
+    else:
+        print("skip: ken_all is up to date")
+        return
+
+    report = RunReport("ken_all")
+
+    # 稼働中のDBには書き込まず、検証が通ってから置き換える
+    with staging_database(DATABASE_PATH, "ken_all", ARTIFACT_DIR, report) as engine:
+        if entry["mode"] == "diff":
+            # 月次の差分を古い順に適用
+            for month in entry["months"]:
+                deleted = read_ken_all(
+                    f"{ZIP_DIR}/{month['del']}", args.workers, report
+                )
+                added = read_ken_all(f"{ZIP_DIR}/{month['add']}", args.workers, report)
+                with report.stage("diff"):
+                    apply_ken_all_diff(engine, added, deleted)
+                print(f"applied: ken_all diff {month['yymm']}")
+        else:
+            file_path = f"{entry.get('dir', ZIP_DIR)}/{entry['files'][0]}"
+            ken_all = read_ken_all(file_path, args.workers, report)
+
+            # 行分割で重複したidを振り直してDBに書き込み（上書き）
+            # idはページングのキーになるので一意にしておく
+            ken_all["id"] = range(1, len(ken_all.index) + 1)
+            # 行の元になった前処理前の行も記録（月次の差分で削除する行を特定する）
+            with report.stage("load"):
+                bulk_load(engine, ken_all, "ken_all")
+                bulk_load(engine, ken_all, "ken_all_source")
+
+            # インデックス作成（テーブルを作り直しているので毎回、データを入れた後に作る）
+            with report.stage("indexes"):
+                create_indexes(engine, "ken_all")
+                create_indexes(engine, "ken_all_source")
+            print(f"loaded: ken_all {len(ken_all.index)} rows")
+
+            # 部分一致検索用のFTS5テーブル（月次の差分では変わった行だけ更新済み）
+            with report.stage("fulltext"):
+                create_fulltext_index(engine, "ken_all")
+
+        # APIのキャッシュを無効にするためのバージョン
+        save_dataset_version(engine, "ken_all", entry.get("version"))
+
+        # 統計情報の更新（APIのクエリプランナー用）とVACUUM（全件の場合だけ）
+        with report.stage("optimize"):
+            optimize_database(engine, vacuum=entry["mode"] != "diff")
+
+    # 適用したバージョンを記録
+    if "version" in entry:
+        save_version(VERSION_FILE, "ken_all", entry["version"])
+
+    report.save(REPORT_DIR)
+    print("done: parse ken_all")
+
+
+if __name__ == "__main__":
+    main()
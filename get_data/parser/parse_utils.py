@@ -1,13 +1,67 @@
+import datetime
+import fcntl
+import hashlib
+import io
+import json
+import logging
+import os
 import re
-import unicodedata
-from typing import Any, List
-
+import resource
+import sqlite3
+import stat
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    IO,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Pattern,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import numpy as np
 import pandas as pd
+from sqlalchemy import create_engine, text
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.engine import Engine
+
+# テーブル定義はAPI側（fastapi/models.py）と共通にする
+sys.path.append(str(Path(__file__).resolve().parents[2] / "fastapi"))
+import artifact  # noqa: E402
+import models  # noqa: E402
+import normalization  # noqa: E402
+
+logger = logging.getLogger(__name__)
 
 # --------------------------------------------------- #
 # General                                             #
 # --------------------------------------------------- #
 
+# 置き換え前と比べて、この割合より行数が減った場合は置き換えない
+MIN_ROW_RATIO = 0.9
+
+# bulk_loadで1回のexecutemanyに渡す行数
+LOAD_BATCH_SIZE = 50_000
+
+# bulk_load中だけ使うpragma（一時ファイルへの書き込みなので、途中で落ちても作り直せばよい）
+LOAD_PRAGMAS = {
+    "journal_mode": "OFF",
+    "synchronous": "OFF",
+    "cache_size": -256 * 1024,  # KiB単位（256MiB）
+}
+
 
 def to_narrow(row: Any) -> str:
     """全角 -> 半角
@@ -16,7 +70,46 @@ def to_narrow(row: Any) -> str:
     Returns:
         row(str): 半角変換後のテキスト
     """
-    return unicodedata.normalize("NFKC", row)
+    return normalization.to_narrow(row)
+
+
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """全列を全角 -> 半角（列単位で変換し、NaNはNaNのまま）
+    Args:
+        df(DataFrame): 変換したいdf
+    Returns:
+        df(DataFrame): 変換後のdf
+    """
+    for column_name in df.columns:
+        if isinstance(df[column_name].dtype, pd.CategoricalDtype):
+            # カテゴリ型はカテゴリ（重複しない値）だけ変換する
+            df[column_name] = df[column_name].map(to_narrow)
+        else:
+            df[column_name] = df[column_name].str.normalize("NFKC")
+
+    return df
+
+
+@contextmanager
+def open_csv(file_path: str, encoding: str) -> Iterator[IO[str]]:
+    """CSVを開く（ZIPの場合は解凍せずに、中のCSVを読みながらデコードする）
+    Args:
+        file_path(str): CSVまたはZIPのファイルパス
+        encoding(str): CSVの文字コード
+    Returns:
+        f(IO[str]): テキストとして読めるファイル
+    """
+    if not file_path.lower().endswith(".zip"):
+        with open(file_path, encoding=encoding, newline="") as f:
+            yield f
+        return
+
+    with zipfile.ZipFile(file_path) as zf:
+        members = [name for name in zf.namelist() if name.lower().endswith(".csv")]
+        if len(members) != 1:
+            raise ValueError(f"{file_path}: expected one CSV, found {members}")
+        with zf.open(members[0]) as raw:
+            yield io.TextIOWrapper(raw, encoding=encoding, newline="")
 
 
 def set_index(df: pd.DataFrame) -> pd.DataFrame:
@@ -33,15 +126,572 @@ def set_index(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+def create_indexes(engine: Engine, table_name: str) -> None:
+    """models.pyで定義したインデックスを作成
+    to_sql(if_exists="replace")はテーブルごと作り直すので、書き込み後に毎回作成する
+    Args:
+        engine(Engine): 書き込み先DBのengine
+        table_name(str): テーブル名
+    Returns:
+        None
+    """
+    table = models.Base.metadata.tables[table_name]
+    for index in table.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+
+def supports_trigram() -> bool:
+    """SQLiteがFTS5のtrigramトークナイザ（3.34以降）を使えるか
+    Returns:
+        supported(bool): 使えるか
+    """
+    with closing(sqlite3.connect(":memory:")) as conn:
+        try:
+            conn.execute("CREATE VIRTUAL TABLE probe USING fts5(a, tokenize='trigram')")
+        except sqlite3.OperationalError:
+            return False
+    return True
+
+
+def create_fulltext_index(engine: Engine, table_name: str) -> None:
+    """部分一致検索用のFTS5（trigram）テーブル <テーブル名>_fts を作成
+    本体テーブルを参照する外部コンテンツ型なので、文字列は二重に持たない
+    Args:
+        engine(Engine): 書き込み先DBのengine
+        table_name(str): テーブル名
+    Returns:
+        None
+    """
+    fts_name = f"{table_name}_fts"
+    if not supports_trigram():
+        # APIは<テーブル名>_ftsが無ければLIKEで検索する
+        logger.warning(
+            "SQLite %s has no trigram tokenizer (3.34+), skipping %s",
+            sqlite3.sqlite_version,
+            fts_name,
+        )
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"DROP TABLE IF EXISTS {fts_name}")
+        return
+
+    columns = ", ".join(models.FULLTEXT_COLUMNS[table_name])
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {fts_name}")
+        conn.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE {fts_name} USING fts5({columns}, "
+            f"content='{table_name}', content_rowid='id', tokenize='trigram')"
+        )
+        conn.exec_driver_sql(f"INSERT INTO {fts_name}({fts_name}) VALUES('rebuild')")
+
+
+def bulk_load(
+    engine: Engine, df: pd.DataFrame, table_name: str, batch_size: int = LOAD_BATCH_SIZE
+) -> None:
+    """dfでテーブルを作り直す（to_sqlの代わり）
+    テーブルはmodels.pyの定義で作成し、1つのトランザクション内でbatch_size行ずつexecutemanyする。
+    インデックスはデータを入れた後にcreate_indexesで作成する。
+    Args:
+        engine(Engine): 書き込み先DBのengine
+        df(DataFrame): 書き込むdf（列はmodels.pyのテーブルの列）
+        table_name(str): テーブル名
+        batch_size(int): 1回のexecutemanyに渡す行数
+    Returns:
+        None
+    """
+    table = models.Base.metadata.tables[table_name]
+    columns = [column.name for column in table.columns]
+    insert = (
+        f"INSERT INTO {table_name} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' * len(columns))})"
+    )
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for name, value in LOAD_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+        cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
+        cursor.execute(str(CreateTable(table).compile(dialect=engine.dialect)))
+
+        # 列ごとにPythonのリストへ変換（NaNはNone）してから行にまとめる
+        values = [
+            df[name].astype(object).where(df[name].notna(), None).tolist()
+            for name in columns
+        ]
+        for start in range(0, len(df.index), batch_size):
+            stop = start + batch_size
+            cursor.executemany(insert, zip(*(value[start:stop] for value in values)))
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def save_dataset_version(engine: Engine, name: str, version: Optional[str]) -> None:
+    """dataset_versionテーブルにデータのバージョンを書き込む（APIがキャッシュとETagに使う）
+    Args:
+        engine(Engine): 書き込み先DBのengine
+        name(str): データ名
+        version(str): 公開日（manifest.jsonが無い場合はNone）
+    Returns:
+        None
+    """
+    models.DatasetVersion.__table__.create(bind=engine, checkfirst=True)
+    loaded_at = datetime.datetime.now().isoformat(timespec="seconds")
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO dataset_version (name, version, loaded_at) "
+                "VALUES (:name, :version, :loaded_at) "
+                "ON CONFLICT(name) DO UPDATE SET "
+                "version = excluded.version, loaded_at = excluded.loaded_at"
+            ),
+            {"name": name, "version": version, "loaded_at": loaded_at},
+        )
+
+
+def optimize_database(engine: Engine, vacuum: bool = True) -> None:
+    """クエリプランナー用の統計情報を更新し、ファイルを詰める
+    Args:
+        engine(Engine): 書き込み先DBのengine
+        vacuum(bool): VACUUMする（月次の差分では空きページが少ないのでしない）
+    Returns:
+        None
+    """
+    with engine.connect() as conn:
+        conn.exec_driver_sql("ANALYZE")
+        if vacuum:
+            conn.exec_driver_sql("VACUUM")
+
+
+def peak_rss_mib() -> float:
+    """このプロセスと終了した子プロセス（run_parallelのワーカー）のピークメモリ（MiB）"""
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # ru_maxrssはLinuxではKiB、macOSではバイト
+    return peak / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+class RunReport:
+    """パーサーの段階ごとの処理時間とピークメモリを記録し、前回の実行と比べる"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = datetime.datetime.now()
+        self.started = time.perf_counter()
+        self.stages: List[Dict[str, Any]] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """with内の処理時間と、終了時点のピークメモリを記録（同じ名前は合計する）"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            for entry in self.stages:
+                if entry["stage"] == name:
+                    entry["seconds"] += seconds
+                    entry["peak_rss_mib"] = peak_rss_mib()
+                    break
+            else:
+                self.stages.append(
+                    {"stage": name, "seconds": seconds, "peak_rss_mib": peak_rss_mib()}
+                )
+
+    def save(self, report_dir: str) -> str:
+        """<report_dir>/<name>-<日時>.jsonに書き込み、前回の実行との比を出力
+        Args:
+            report_dir(str): 出力先のディレクトリ
+        Returns:
+            path(str): 出力したファイルのパス
+        """
+        os.makedirs(report_dir, exist_ok=True)
+        previous = {}
+        reports = sorted(Path(report_dir).glob(f"{self.name}-*.json"))
+        if reports:
+            with open(reports[-1], encoding="utf-8") as f:
+                previous = {
+                    entry["stage"]: entry["seconds"] for entry in json.load(f)["stages"]
+                }
+
+        report = {
+            "name": self.name,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "seconds": round(time.perf_counter() - self.started, 3),
+            "peak_rss_mib": round(peak_rss_mib(), 1),
+            "stages": [
+                {
+                    "stage": entry["stage"],
+                    "seconds": round(entry["seconds"], 3),
+                    "peak_rss_mib": round(entry["peak_rss_mib"], 1),
+                }
+                for entry in self.stages
+            ],
+        }
+        path = os.path.join(
+            report_dir, f"{self.name}-{self.started_at:%Y%m%d%H%M%S}.json"
+        )
+        with open(path, mode="w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+        for entry in report["stages"]:
+            line = (
+                f"  {entry['stage']:<12} {entry['seconds']:8.2f}s"
+                f" {entry['peak_rss_mib']:8.1f} MiB"
+            )
+            if previous.get(entry["stage"]):
+                line += f"  前回比 x{entry['seconds'] / previous[entry['stage']]:.2f}"
+            print(line)
+        print(
+            f"report: {path} ({report['seconds']:.1f}s, "
+            f"peak {report['peak_rss_mib']:.1f} MiB)"
+        )
+
+        return path
+
+
+@contextmanager
+def exclusive_lock(lock_path: str) -> Iterator[None]:
+    """ロックファイルで排他する（他のプロセスが持っている間は待つ）
+    Args:
+        lock_path(str): ロックファイルのパス
+    Returns:
+        None
+    """
+    with open(lock_path, mode="w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@contextmanager
+def staging_database(
+    db_path: str,
+    table_name: str,
+    artifact_dir: Optional[str] = None,
+    report: Optional[RunReport] = None,
+) -> Iterator[Engine]:
+    """稼働中のDBをコピーした一時ファイルに書き込み、検証してから置き換える
+    APIが読んでいるファイルには書き込まず、最後にos.replaceでまとめて入れ替えるので、
+    作成中の空のテーブルや書き込みロックがAPIから見えることはない。
+    コピーから置き換えまでは<DB>.lockで排他するので、パーサーを同時に実行しても
+    後の実行は先の実行の結果をコピーしてから書き込む（更新は失われない）。
+    Args:
+        db_path(str): 稼働中のDBのファイルパス
+        table_name(str): 書き込むテーブル名（検証対象）
+        artifact_dir(str): 郵便番号検索用のバイナリファイルの出力先（Noneなら出力しない）
+        report(RunReport): 検証・バイナリファイルの出力時間の記録先（Noneなら記録しない）
+    Returns:
+        engine(Engine): 一時ファイルのengine
+    """
+    report = report or RunReport(table_name)
+    with exclusive_lock(f"{db_path}.lock"):
+        # 実行ごとに別の一時ファイル（同じディレクトリに作り、os.replaceで置き換える）
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=f"{os.path.basename(db_path)}.",
+            suffix=".building",
+            dir=os.path.dirname(os.path.abspath(db_path)),
+        )
+        os.close(fd)
+
+        engine = None
+        try:
+            # mkstempは0600で作るので、APIから読めるように元のDBと同じ権限にする
+            mode = os.stat(db_path).st_mode if os.path.exists(db_path) else 0o644
+            os.chmod(tmp_path, stat.S_IMODE(mode))
+
+            # 他のテーブルはそのまま引き継ぐ
+            previous_rows = 0
+            if os.path.exists(db_path):
+                with closing(sqlite3.connect(db_path)) as src, closing(
+                    sqlite3.connect(tmp_path)
+                ) as dst:
+                    src.backup(dst)
+                    previous_rows = count_rows(src, table_name)
+
+            engine = create_engine(f"sqlite:///{tmp_path}")
+            yield engine
+            engine.dispose()
+            with report.stage("validate"):
+                validate_database(tmp_path, table_name, previous_rows)
+            # APIはDBの置き換えを検知して読み直すので、バイナリファイルを先に置き換えておく
+            if artifact_dir is not None:
+                with report.stage("artifact"):
+                    write_artifact(tmp_path, table_name, artifact_dir)
+        except BaseException:
+            if engine is not None:
+                engine.dispose()
+            os.remove(tmp_path)
+            raise
+
+        os.replace(tmp_path, db_path)
+
+
+def write_artifact(db_path: str, table_name: str, artifact_dir: str) -> str:
+    """テーブルを郵便番号検索用のバイナリファイル（fastapi/artifact.py）に書き出す
+    Args:
+        db_path(str): 読み込むDBのファイルパス
+        table_name(str): テーブル名
+        artifact_dir(str): 出力先のディレクトリ
+    Returns:
+        path(str): 出力したファイルのパス
+    """
+    columns = [
+        column.name
+        for column in models.Base.metadata.tables[table_name].columns
+        if column.name != "id"
+    ]
+    path = artifact.artifact_path(table_name, artifact_dir)
+    with closing(sqlite3.connect(db_path)) as conn:
+        version = conn.execute(
+            "SELECT name || '=' || IFNULL(version, 'None') || '@' || loaded_at "
+            "FROM dataset_version WHERE name = ?",
+            (table_name,),
+        ).fetchone()
+        rows = conn.execute(
+            f"SELECT {', '.join(columns)} FROM {table_name} ORDER BY zipcode, id"
+        )
+        artifact.write(path, columns, rows, version[0] if version else "")
+
+    return path
+
+
+def count_rows(conn: sqlite3.Connection, table_name: str) -> int:
+    """テーブルの行数（テーブルが無い場合は0）"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+    ).fetchone()
+    if not exists:
+        return 0
+
+    return conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+
+
+def validate_database(db_path: str, table_name: str, previous_rows: int = 0) -> None:
+    """置き換える前のDBを検証（行数、インデックス、FTS5（使える場合）、サンプル検索）
+    Args:
+        db_path(str): 検証するDBのファイルパス
+        table_name(str): テーブル名
+        previous_rows(int): 置き換え前の行数
+    Returns:
+        None（問題がある場合はValueError）
+    """
+    with closing(sqlite3.connect(db_path)) as conn:
+        # 行数
+        rows = count_rows(conn, table_name)
+        if rows == 0 or rows < previous_rows * MIN_ROW_RATIO:
+            raise ValueError(f"{table_name}: {rows} rows (previously {previous_rows})")
+
+        # インデックスとFTS5テーブル（trigramが使えない場合、FTS5テーブルは作らない）
+        names = {name for (name,) in conn.execute("SELECT name FROM sqlite_master")}
+        table = models.Base.metadata.tables[table_name]
+        expected = {index.name for index in table.indexes}
+        fulltext = supports_trigram()
+        if fulltext:
+            expected.add(f"{table_name}_fts")
+        if expected - names:
+            raise ValueError(f"{table_name}: missing {sorted(expected - names)}")
+
+        # サンプル検索（郵便番号はインデックスで引けること、住所はFTS5で引けること）
+        row_id, zipcode, address = conn.execute(
+            f"SELECT id, zipcode, address FROM {table_name} "
+            "WHERE address IS NOT NULL LIMIT 1 OFFSET ?",
+            (rows // 2,),
+        ).fetchone()
+        plan = conn.execute(
+            f"EXPLAIN QUERY PLAN SELECT * FROM {table_name} WHERE zipcode = ?",
+            (zipcode,),
+        ).fetchall()
+        if not any("INDEX" in detail for *_, detail in plan):
+            raise ValueError(f"{table_name}: zipcode lookup does not use an index")
+        if not fulltext:
+            return
+        phrase = '"{}"'.format(address.replace('"', '""'))
+        found = conn.execute(
+            f"SELECT rowid FROM {table_name}_fts WHERE {table_name}_fts MATCH ?",
+            (f"address : {phrase}",),
+        ).fetchall()
+        if (row_id,) not in found:
+            raise ValueError(
+                f"{table_name}: {address} is not found in {table_name}_fts"
+            )
+
+
+def split_rows(
+    df: pd.DataFrame, n_chunks: int, can_start: Optional[pd.Series] = None
+) -> List[pd.DataFrame]:
+    """dfを行でおおよそ均等にn_chunks個に分割
+    Args:
+        df(DataFrame): 分割したいdf
+        n_chunks(int): 分割数
+        can_start(Series): 各行からチャンクを始めてよいか（Noneならどこでも可）
+    Returns:
+        chunks(list[DataFrame]): 分割したdf
+    """
+    if can_start is None:
+        positions = np.arange(len(df.index))
+    else:
+        positions = np.flatnonzero(can_start.to_numpy())
+
+    targets = [len(df.index) * i // n_chunks for i in range(1, n_chunks)]
+    found = np.searchsorted(positions, targets)
+    starts = sorted({0, *(positions[i] for i in found if i < len(positions))})
+    stops = starts[1:] + [len(df.index)]
+
+    return [df.iloc[start:stop] for start, stop in zip(starts, stops)]
+
+
+def run_parallel(
+    func: Callable[[pd.DataFrame], pd.DataFrame],
+    chunks: List[pd.DataFrame],
+    workers: int,
+) -> pd.DataFrame:
+    """チャンクごとにfuncをプロセス並列で実行し、順番どおりに結合
+    Args:
+        func(Callable): チャンクに適用する関数（pickleできるトップレベル関数）
+        chunks(list[DataFrame]): split_rowsで分割したdf
+        workers(int): プロセス数
+    Returns:
+        df(DataFrame): 結合したdf
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return pd.concat(executor.map(func, chunks))
+
+
+def load_manifest(file_path: str) -> Optional[Dict[str, dict]]:
+    """クローラーが書き込んだmanifest.json（ダウンロードしたファイルの内容）を読み込む
+    Args:
+        file_path(str): manifest.jsonのファイルパス
+    Returns:
+        manifest(dict): データ名 -> {"mode": "full"|"diff", ...}（無い場合はNone）
+    """
+    if not os.path.exists(file_path):
+        return None
+
+    with open(file_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_version(file_path: str, name: str, version: str) -> None:
+    """適用したデータのバージョンを書き込む（クローラーが次回の更新チェックに使う）
+    Args:
+        file_path(str): version.jsonのファイルパス
+        name(str): データ名
+        version(str): 適用した公開日
+    Returns:
+        None
+    """
+    versions = {}
+    if os.path.exists(file_path):
+        with open(file_path, encoding="utf-8") as f:
+            versions = json.load(f)
+    versions[name] = version
+
+    with open(file_path, mode="w", encoding="utf-8") as f:
+        json.dump(versions, f, indent=2)
+
+
+def to_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """executemany用のレコード（NaNはNone）
+    Args:
+        df(DataFrame): 変換したいdf
+    Returns:
+        records(list[dict]): 行ごとのdict
+    """
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def table_exists(conn: Any, table_name: str) -> bool:
+    """テーブルがあるか"""
+    return (
+        conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE name = ?", (table_name,)
+        ).first()
+        is not None
+    )
+
+
+def delete_rows(conn: Any, table_name: str, ids: List[int]) -> None:
+    """idの行を削除（FTS5テーブルがあれば、先に索引から外す）
+    Args:
+        conn(Connection): 書き込み先DBの接続（トランザクション内）
+        table_name(str): テーブル名
+        ids(list[int]): 削除する行のid
+    Returns:
+        None
+    """
+    if not ids:
+        return
+
+    records = [{"id": row_id} for row_id in ids]
+    fts_name = f"{table_name}_fts"
+    if table_name in models.FULLTEXT_COLUMNS and table_exists(conn, fts_name):
+        # 外部コンテンツ型なので、索引に入れた値を渡して外す（行を消す前に読む）
+        columns = ", ".join(models.FULLTEXT_COLUMNS[table_name])
+        conn.execute(
+            text(
+                f"INSERT INTO {fts_name} ({fts_name}, rowid, {columns}) "
+                f"SELECT 'delete', id, {columns} FROM {table_name} WHERE id = :id"
+            ),
+            records,
+        )
+    conn.execute(text(f"DELETE FROM {table_name} WHERE id = :id"), records)
+
+
+def insert_rows(conn: Any, table_name: str, df: pd.DataFrame) -> None:
+    """行を追加（FTS5テーブルがあれば、索引にも追加する）
+    Args:
+        conn(Connection): 書き込み先DBの接続（トランザクション内）
+        table_name(str): テーブル名
+        df(DataFrame): 追加する行（列はid列を含むテーブルの列）
+    Returns:
+        None
+    """
+    if not len(df.index):
+        return
+
+    columns = list(df.columns)
+    conn.execute(
+        text(
+            f"INSERT INTO {table_name} ({', '.join(columns)}) "
+            f"VALUES ({', '.join(':' + c for c in columns)})"
+        ),
+        to_records(df),
+    )
+
+    fts_name = f"{table_name}_fts"
+    if table_name in models.FULLTEXT_COLUMNS and table_exists(conn, fts_name):
+        fulltext = ", ".join(models.FULLTEXT_COLUMNS[table_name])
+        conn.execute(
+            text(
+                f"INSERT INTO {fts_name} (rowid, {fulltext}) "
+                f"SELECT id, {fulltext} FROM {table_name} WHERE id = :id"
+            ),
+            [{"id": int(row_id)} for row_id in df["id"]],
+        )
+
+
+def next_id(conn: Any, table_name: str) -> int:
+    """追加する行に振るidの開始値"""
+    return conn.execute(
+        text(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table_name}")
+    ).scalar()
+
+
 # --------------------------------------------------- #
 # KEN_ALL                                             #
 # --------------------------------------------------- #
 
 
 def make_ken_all(file_path: str) -> pd.DataFrame:
-    """KEN_ALLのDF作成
+    """KEN_ALLのDF作成（必要な列だけ読み込む）
     Args:
-        file_path(str): KEN_ALL.CSVのファイルパス
+        file_path(str): KEN_ALL.CSVまたはken_all.zipのファイルパス
     Returns:
         ken_all(DataFrame): KEN_ALL.CSVのDataFrame
     """
@@ -83,48 +733,48 @@ def make_ken_all(file_path: str) -> pd.DataFrame:
         "変更理由": str,
     }
 
-    ken_all = pd.read_csv(
-        file_path, encoding="shift_jis", header=None, names=names, dtype=dtype
-    )
+    # 必要な列だけ読み込む
+    usecols = ["郵便番号", "都道府県名", "市区町村名", "町域名"]
+
+    # 都道府県名、市区町村名は値の種類が少ないのでカテゴリ型にする
+    dtype.update({"都道府県名": "category", "市区町村名": "category"})
 
-    # 必要な列だけ残す
-    ken_all = ken_all[["郵便番号", "都道府県名", "市区町村名", "町域名"]]
+    with open_csv(file_path, encoding="shift_jis") as f:
+        ken_all = pd.read_csv(f, header=None, names=names, usecols=usecols, dtype=dtype)
 
     return ken_all
 
 
 def create_merged_list(ken_all: pd.DataFrame, column_name: str) -> List[str]:
     """町域名が複数行にまたがっている場合、1行にマージしたリストを返す。
+    かっこの数が合わない行（is_even_paren=False）の累積和が奇数の間は次の行へ続き、
+    偶数に戻った行で結合が終わる。途中の行数に制限はない。
     Args:
         ken_all(DataFrame): KEN_ALL.CSVのDataFrame
         column(str): 町域名の列名
     Returns:
-        lst(list): 町域名を統合したリスト
+        lst(list): 町域名を統合したリスト（結合前の行は"NEXT"）
     """
-    lst = []
-    cnt = 0
-    town = ""
-    for _, row in ken_all.iterrows():
-        if row["is_even_paren"] is False:
-            cnt += 1
-
-        if cnt == 0:
-            # 単一行で完結
-            lst.append(row[column_name])
-        elif cnt == 1:
-            # 次の行へ続く
-            town += row[column_name]
-            lst.append("NEXT")
-        elif cnt == 2:
-            # 結合後の町域名
-            town += row[column_name]
-            lst.append(town)
+    is_odd = ~ken_all["is_even_paren"]
+    count = is_odd.cumsum()
+
+    # 次の行へ続く行と、結合の最終行
+    is_next = count % 2 == 1
+    is_last = is_odd & ~is_next
+
+    # 続く行と最終行に同じグループ番号を振って結合
+    group = (count + 1) // 2
+    in_group = is_next | is_last
+    merged = (
+        ken_all.loc[in_group, column_name]
+        .groupby(group[in_group], sort=False)
+        .agg("".join)
+    )
 
-            # 初期化
-            cnt = 0
-            town = ""
+    towns = ken_all[column_name].mask(is_next, "NEXT")
+    towns.loc[is_last] = merged.loc[group[is_last]].to_numpy()
 
-    return lst
+    return towns.tolist()
 
 
 def merge_lines(ken_all: pd.DataFrame) -> pd.DataFrame:
@@ -141,15 +791,120 @@ def merge_lines(ken_all: pd.DataFrame) -> pd.DataFrame:
 
     ken_all["町域名"] = create_merged_list(ken_all, "町域名")
 
-    # 町域名が「NEXT」の行は削除
-    ken_all = ken_all[ken_all["町域名"] != "NEXT"]
-
-    # is_even_paren列を削除
-    ken_all.drop("is_even_paren", axis=1, inplace=True)
+    # 町域名が「NEXT」の行は削除し、is_even_paren列を削除
+    # （dropで新しいDataFrameにするので、呼び出し元で列を追加しても元のDFの一部にはならない）
+    ken_all = ken_all[ken_all["町域名"] != "NEXT"].drop(columns="is_even_paren")
 
     return ken_all
 
 
+def town_group_starts(ken_all: pd.DataFrame) -> pd.Series:
+    """複数行にまたがる町域名の途中でない行（チャンクを始めてよい行）
+    Args:
+        ken_all(DataFrame): KEN_ALL.CSVのDataFrame（全角 -> 半角の変換前でも可）
+    Returns:
+        can_start(Series): 行ごとのbool
+    """
+    towns = ken_all["町域名"].str.normalize("NFKC")
+    is_odd = towns.str.count(r"\(") != towns.str.count(r"\)")
+    is_next = is_odd.cumsum() % 2 == 1
+
+    return ~is_next.shift(1, fill_value=False)
+
+
+def make_sources(ken_all: pd.DataFrame) -> List[str]:
+    """前処理前の行（郵便番号・都道府県名・市区町村名・マージ後の町域名）のハッシュ
+    前処理で行分割・書き換えをしても、add/delの同じ行からは同じ値になる
+    Args:
+        ken_all(DataFrame): 町域名マージ後のDataFrame（全角 -> 半角済み）
+    Returns:
+        sources(list[str]): 行ごとのハッシュ
+    """
+    columns = [
+        ken_all[name].astype(object).tolist()
+        for name in ("郵便番号", "都道府県名", "市区町村名", "町域名")
+    ]
+    return [
+        hashlib.sha1("\t".join(map(str, values)).encode("utf-8")).hexdigest()[:16]
+        for values in zip(*columns)
+    ]
+
+
+def process_ken_all_chunk(ken_all: pd.DataFrame) -> pd.DataFrame:
+    """全角 -> 半角、町域名のマージ、前処理
+    Args:
+        ken_all(DataFrame): KEN_ALL.CSVのDataFrame
+    Returns:
+        ken_all(DataFrame): 前処理後のDataFrame
+    """
+    ken_all = normalize_columns(ken_all.copy())
+    ken_all = merge_lines(ken_all)
+
+    # 月次の差分で削除する行を特定するため、前処理前の行を記録する
+    ken_all["source"] = make_sources(ken_all)
+
+    return preproc_ken_all(ken_all)
+
+
+def process_ken_all(ken_all: pd.DataFrame, workers: int = 1) -> pd.DataFrame:
+    """process_ken_all_chunkを実行（workers > 1の場合は行で分割してプロセス並列）
+    複数行にまたがる町域名は同じチャンクに入るように分割する
+    Args:
+        ken_all(DataFrame): KEN_ALL.CSVのDataFrame
+        workers(int): プロセス数
+    Returns:
+        ken_all(DataFrame): 前処理後のDataFrame
+    """
+    if workers <= 1:
+        return process_ken_all_chunk(ken_all)
+
+    chunks = split_rows(ken_all, workers, town_group_starts(ken_all))
+
+    return run_parallel(process_ken_all_chunk, chunks, workers)
+
+
+def apply_ken_all_diff(
+    engine: Engine, added: pd.DataFrame, deleted: pd.DataFrame
+) -> None:
+    """月次の差分（前処理済み）をken_allに適用
+    削除する行は前処理前の行（ken_all_source）で特定するので、前処理後に同じ郵便番号・
+    町域名になる別の行は消さない。追加はまだ無い行だけ（同じ差分を2回適用しても結果は同じ）
+    Args:
+        engine(Engine): 書き込み先DBのengine
+        added(DataFrame): 追加する行（add_YYMM.CSVを前処理したもの）
+        deleted(DataFrame): 削除する行（del_YYMM.CSVを前処理したもの）
+    Returns:
+        None
+    """
+    columns = ["zipcode", "prefecture", "city", "town", "address"]
+    find = text("SELECT id FROM ken_all_source WHERE source = :source")
+
+    with engine.begin() as conn:
+        if not table_exists(conn, "ken_all_source"):
+            # 古いパーサーで作成したDB（version.jsonを消して全件を読み込み直す）
+            raise ValueError("ken_all_source is missing, run a full load first")
+
+        if len(deleted.index):
+            ids = [
+                row_id
+                for source in deleted["source"].unique()
+                for (row_id,) in conn.execute(find, {"source": source})
+            ]
+            delete_rows(conn, "ken_all", ids)
+            delete_rows(conn, "ken_all_source", ids)
+
+        exists = [
+            conn.execute(find, {"source": source}).first() is not None
+            for source in added["source"]
+        ]
+        added = added[~pd.Series(exists, index=added.index, dtype=bool)]
+        if len(added.index):
+            start = next_id(conn, "ken_all")
+            added = added.assign(id=range(start, start + len(added.index)))
+            insert_rows(conn, "ken_all", added[["id", *columns]])
+            insert_rows(conn, "ken_all_source", added[["id", "source"]])
+
+
 def add_prefix_and_suffix(row: Any) -> str:
     """'()'内の記載で必要なものを展開
     # 例) 〒0580343 東洋(油駒、南東洋、132〜156、158〜354、366、367番地)
@@ -184,203 +939,182 @@ def add_prefix_and_suffix(row: Any) -> str:
     return result
 
 
-def preproc_ken_all(ken_all: pd.DataFrame) -> pd.DataFrame:
-    """KEN_ALLの全体的な前処理
-    Args:
-        ken_all(DataFrame): KEN_ALL.CSVのDataFrame（前処理前）
-    Returns:
-        ken_all(DataFrame): KEN_ALL.CSVのDataFrame（前処理後）
+class TownRule(NamedTuple):
+    """町域名の置換ルール
+    guards: いずれの文字列も含まない町域名には適用しない（正規表現を実行する前の事前チェック）
+    pattern: 置換するパターン（Noneの場合はreplを関数として町域名全体に適用）
+    repl: 置換後の文字列、または町域名を受け取って置換後の町域名を返す関数
+    when: guards以外の適用条件
     """
-    # '以下に掲載がない場合'を削除
-    ken_all["町域名"].replace("以下に掲載がない場合", "", inplace=True)
 
-    # 'の次に番地がくる場合'を削除
-    ken_all["町域名"].replace(r".*の次に番地がくる場合", "", regex=True, inplace=True)
+    guards: Optional[Tuple[str, ...]]
+    pattern: Optional[Pattern[str]]
+    repl: Union[str, Callable[[str], str]]
+    when: Optional[Callable[[str], Any]] = None
+
+
+def remove(literal: str) -> TownRule:
+    """文字列をそのまま削除するルール"""
+    return replace_literal(literal, "")
+
 
+def replace_literal(literal: str, new: str) -> TownRule:
+    """文字列をそのまま置換するルール"""
+    return TownRule((literal,), re.compile(re.escape(literal)), new)
+
+
+def remove_paren_if(guard: str) -> TownRule:
+    """guardを含む場合に'(～)'を削除するルール"""
+    return TownRule((guard,), re.compile(r"\(.*\)"), "")
+
+
+# ・が入ってる町域名のうち、修正が必要なものは個別対応（置換前 -> 置換後）
+TOWN_FIXES = {
+    "野牛稲崎平302番地・315番地": "野牛稲崎平302番地、野牛稲崎平315番地",  # 〒0350003
+    "戸山3丁目18・21番": "戸山3丁目18番、戸山3丁目21番",  # 〒1690052
+    "御料牧場・成田国際空港内": "御料牧場",  # 〒2820011
+    "大豆4の2・4・6番地": "大豆4の2番地、大豆4の4番地、大豆4の6番地",  # 〒9420083
+    "新所・岡崎・梅田入会地": "新所、岡崎、梅田入会地",  # 〒4310423
+    "岡之原町832の2・4": "岡之原町832の2、岡之原町832の4",  # 〒8920876
+    "結東逆巻・前倉・結東": "結東逆巻、結東前倉、結東",  # 〒9498316
+    "北山渋御殿湯・渋の湯": "北山渋御殿湯、北山渋の湯",  # 〒3910212
+    "中山町出渕豊岡・東町": "中山町出渕豊岡、中山町出渕東町",  # 〒7913203
+    "浦ノ内東分鳴無・坂内": "浦ノ内東分鳴無、浦ノ内東分坂内",  # 〒7850163
+    "釜ケ島土手畑・藤場": "釜ケ島土手畑、釜ケ島藤場",  # 〒9401172
+    "牧白滝B・C": "牧白滝B、牧白滝C",  # 〒8700924
+    "土居甲・乙": "土居甲、土居乙",  # 〒7811606
+}
+
+# 町域名の前処理（上から順に適用）
+TOWN_RULES: List[TownRule] = [
+    # '以下に掲載がない場合'を削除（完全一致）
+    TownRule(("以下に掲載がない場合",), re.compile(r"\A以下に掲載がない場合\Z"), ""),
+    # 'の次に番地がくる場合'を削除
+    TownRule(("の次に番地がくる場合",), re.compile(r".*の次に番地がくる場合"), ""),
     # 'の次に(n〜n)番地(以降)がくる場合'を含む'()'とかっこ内を削除
     # 例) 〒7660001 琴平町の次に1〜426番地がくる場合(川東) -> ''
-    ken_all["町域名"].replace(r".*の次に[\d〜−]+番地(以降)?がくる場合.*", "", regex=True, inplace=True)
-
+    TownRule(
+        ("がくる場合",), re.compile(r".*の次に[\d〜−]+番地(以降)?がくる場合.*"), ""
+    ),
     # '～一円'となっている場合のみ'一円'を削除
     # 例1) 〒3994511 南箕輪村一円 -> 南箕輪村
     # 例2) 〒5220317 一円 -> 一円
-    ken_all["町域名"] = ken_all["町域名"].apply(
-        lambda x: re.sub(r"一円", "", x) if "一円" in x and len(x) > 2 else x
-    )
-
+    TownRule(("一円",), re.compile(r"一円"), "", lambda x: len(x) > 2),
     # '(第)n地割〜(第)n地割'を削除
     # 例1) 〒0295523 越中畑64地割〜越中畑66地割 -> 越中畑
     # 例2) 〒0295523 桂子沢75地割、桂子沢76地割 -> 桂子沢
     # 例3) 〒0287917 種市第50地割〜第70地割(大沢、城内、滝沢) -> 種市(大沢、城内、滝沢)
-    ken_all["町域名"].replace(r"第?\d+地割(〜|、).*地割", "", regex=True, inplace=True)
-
+    TownRule(("地割",), re.compile(r"第?\d+地割(〜|、).*地割"), ""),
     # n地割を削除
-    ken_all["町域名"].replace(r"第?\d+地割", "", regex=True, inplace=True)
-
-    # '(全域)'を削除
-    ken_all["町域名"].replace(r"\(全域\)", "", regex=True, inplace=True)
-
-    # '(丁目)'を削除
-    ken_all["町域名"].replace(r"\(丁目\)", "", regex=True, inplace=True)
-
-    # '(各町)'を削除
-    ken_all["町域名"].replace(r"\(各町\)", "", regex=True, inplace=True)
-
-    # '（大字、番地）'を削除
-    ken_all["町域名"].replace(r"\(大字、番地\)", "", regex=True, inplace=True)
-
-    # '(番地)'を削除
-    ken_all["町域名"].replace(r"\(番地\)", "", regex=True, inplace=True)
-
-    # '無番地'を削除
-    ken_all["町域名"].replace(r"無番地", "", regex=True, inplace=True)
-
-    # '無番のみ'を削除
-    ken_all["町域名"].replace(r"番地のみ", "", regex=True, inplace=True)
-
-    # '(無番地)'を削除
-    ken_all["町域名"].replace(r"\(無番地\)", "", regex=True, inplace=True)
-
-    # '(○○屋敷)'を削除
-    ken_all["町域名"].replace(r"\(○○屋敷\)", "", regex=True, inplace=True)
-
-    # '(地階・階層不明)'を削除
-    ken_all["町域名"].replace(r"\(地階・階層不明\)", "", regex=True, inplace=True)
-
-    # '(高層棟)'を削除
-    ken_all["町域名"].replace(r"\(高層棟\)", "", regex=True, inplace=True)
-
+    TownRule(("地割",), re.compile(r"第?\d+地割"), ""),
+    remove("(全域)"),
+    remove("(丁目)"),
+    remove("(各町)"),
+    remove("(大字、番地)"),
+    remove("(番地)"),
+    remove("無番地"),
+    remove("番地のみ"),
+    remove("(無番地)"),
+    remove("(○○屋敷)"),
+    remove("(地階・階層不明)"),
+    remove("(高層棟)"),
     # '(n階)'から'()'を削除
     # 例) 〒1076001 赤坂赤坂アークヒルズ・アーク森ビル(1階) -> 赤坂赤坂アークヒルズ・アーク森ビル1階
-    ken_all["町域名"] = ken_all["町域名"].apply(
-        lambda x: re.sub(r"\(|\)", " ", x).strip() if re.match(r".*\(\d+階\)", x) else x
-    )
-
-    # '（雇用促進住宅）'を削除
-    ken_all["町域名"].replace(r"\(雇用促進住宅\)", "", regex=True, inplace=True)
-
-    # '（成田国際空港）'を削除
-    ken_all["町域名"].replace(r"\(成田国際空港内\)", "", regex=True, inplace=True)
-
-    # '仙台空港関係施設'を削除
-    ken_all["町域名"].replace(r"仙台空港関係施設", "", regex=True, inplace=True)
-
-    # '(～を除く)'を削除
-    ken_all["町域名"].replace(r"\(.*を除く\)$", "", regex=True, inplace=True)
-
-    # '「～を除く」'を削除
-    ken_all["町域名"].replace(r"「.*を除く」", "", regex=True, inplace=True)
-
-    # 'を含む'を含む'(～)'を削除
-    ken_all["町域名"] = ken_all["町域名"].apply(
-        lambda x: re.sub(r"\(.*\)", "", x) if "を含む" in x else x
-    )
-
-    # '以上'を含む'(～)'を削除
-    ken_all["町域名"] = ken_all["町域名"].apply(
-        lambda x: re.sub(r"\(.*\)", "", x) if "以上" in x else x
-    )
-
-    # '以下'を含む'(～)'を削除
-    ken_all["町域名"] = ken_all["町域名"].apply(
-        lambda x: re.sub(r"\(.*\)", "", x) if "以下" in x else x
-    )
-
-    # '以内'を含む'(～)'を削除
-    ken_all["町域名"] = ken_all["町域名"].apply(
-        lambda x: re.sub(r"\(.*\)", "", x) if "以内" in x else x
-    )
-
-    # '以降'を含む'(～)'を削除
-    ken_all["町域名"] = ken_all["町域名"].apply(
-        lambda x: re.sub(r"\(.*\)", "", x) if "以降" in x else x
-    )
-
+    TownRule(
+        ("階)",),
+        None,
+        lambda x: re.sub(r"\(|\)", " ", x).strip(),
+        re.compile(r".*\(\d+階\)").match,
+    ),
+    remove("(雇用促進住宅)"),
+    remove("(成田国際空港内)"),
+    remove("仙台空港関係施設"),
+    # '(～を除く)'、'「～を除く」'を削除
+    TownRule(("を除く)",), re.compile(r"\(.*を除く\)$"), ""),
+    TownRule(("を除く」",), re.compile(r"「.*を除く」"), ""),
+    # 'を含む'、'以上'、'以下'、'以内'、'以降'を含む'(～)'を削除
+    remove_paren_if("を含む"),
+    remove_paren_if("以上"),
+    remove_paren_if("以下"),
+    remove_paren_if("以内"),
+    remove_paren_if("以降"),
     # '～以外)'で終わる'(～)'を削除
-    ken_all["町域名"] = ken_all["町域名"].apply(
-        lambda x: re.sub(r"\(.*\)", "", x) if re.match(r".*以外\)$", x) else x
-    )
-
+    TownRule(("以外)",), re.compile(r"\(.*\)"), "", re.compile(r".*以外\)$").match),
     # '中一里山「9番地の4、12番地」'を分解
     # 例) 〒6520071 山田町下谷上（菊水山、高座川向、中一里山「9番地の4、12番地」、...
     # -> 山田町下谷上（菊水山、高座川向、中一里山9番地の4、中一里山12番地、...
-    ken_all["町域名"].replace(
-        r"中一里山「9番地の4、12番地」", "中一里山9番地の4番地、中一里山12番地", regex=True, inplace=True
-    )
-
+    replace_literal("中一里山「9番地の4、12番地」", "中一里山9番地の4番地、中一里山12番地"),
     # '「～」'or'「～」以外'を削除
     # 例) 〒9996652 添川渡戸沢「筍沢温泉」 -> 添川渡戸沢
     # 例) 〒0482402 大江(1丁目、2丁目「651、662、668番地」以外、... -> 大江(1丁目、2丁目、...
-    ken_all["町域名"].replace(r"「.*」(以外)?", "", regex=True, inplace=True)
-
+    TownRule(("「",), re.compile(r"「.*」(以外)?"), ""),
     # 'その他'を含む'(～)'を削除
-    ken_all["町域名"] = ken_all["町域名"].apply(
-        lambda x: re.sub(r"\(.*\)", "", x) if "その他" in x else x
-    )
-
+    remove_paren_if("その他"),
     # '()'内の記載で必要なものを展開
-    # 例) 〒0580343 東洋(油駒、南東洋、132〜156、158〜354、366、367番地) -> 東洋、東洋油駒、東洋南東洋、東洋366番地、東洋367番地
-    ken_all["町域名"] = ken_all["町域名"].apply(add_prefix_and_suffix)
-
-    # '()'を削除(かっこ内が空)
-    ken_all["町域名"].replace(r"\(\)", "", inplace=True)
-
-    """
-    ・が入ってる町域名のうち、修正が必要なものは個別対応
-    """
-    # 〒0350003 野牛稲崎平302番地・315番地 -> 野牛稲崎平302番地、野牛稲崎平315番地
-    ken_all["町域名"].replace(
-        r"野牛稲崎平302番地・315番地", "野牛稲崎平302番地、野牛稲崎平315番地", regex=True, inplace=True
-    )
-
-    # 〒1690052 戸山3丁目18・21番 -> 戸山3丁目18、戸山3丁目21番
-    ken_all["町域名"].replace(
-        r"戸山3丁目18・21番", "戸山3丁目18番、戸山3丁目21番", regex=True, inplace=True
-    )
-
-    # 〒2820011 御料牧場・成田国際空港内 -> 御料牧場
-    ken_all["町域名"].replace(r"御料牧場・成田国際空港内", "御料牧場", regex=True, inplace=True)
-
-    # 〒9420083 大豆4の2・4・6番地 -> 大豆4の2番地、大豆4の4番地、大豆4の6番地
-    ken_all["町域名"].replace(
-        r"大豆4の2・4・6番地", "大豆4の2番地、大豆4の4番地、大豆4の6番地", regex=True, inplace=True
-    )
-
-    # 〒4310423 新所・岡崎・梅田入会地 -> 新所、岡崎、梅田入会地
-    ken_all["町域名"].replace(r"新所・岡崎・梅田入会地", "新所、岡崎、梅田入会地", regex=True, inplace=True)
-
-    # 〒8920876 岡之原町832の2・4 -> 岡之原町832の2、岡之原町832の4
-    ken_all["町域名"].replace(
-        r"岡之原町832の2・4", "岡之原町832の2、岡之原町832の4", regex=True, inplace=True
-    )
-
-    # 〒9498316 結東逆巻・前倉・結東 -> 結東逆巻、結東前倉、結東
-    ken_all["町域名"].replace(r"結東逆巻・前倉・結東", "結東逆巻、結東前倉、結東", regex=True, inplace=True)
+    # 例) 〒0580343 東洋(油駒、南東洋、132〜156、158〜354、366、367番地)
+    # -> 東洋、東洋油駒、東洋南東洋、東洋366番地、東洋367番地
+    TownRule(("(", ")", "、", "〜"), None, add_prefix_and_suffix),
+    # ・が入ってる町域名の個別対応
+    *(replace_literal(old, new) for old, new in TOWN_FIXES.items()),
+    # ハイフンなど、NFKCで半角にならない文字を変換（APIの入力と共通）
+    *(replace_literal(old, new) for old, new in normalization.REPLACEMENTS.items()),
+]
 
-    # 〒3910212 北山渋御殿湯・渋の湯 -> 北山渋御殿湯、北山渋の湯
-    ken_all["町域名"].replace(r"北山渋御殿湯・渋の湯", "北山渋御殿湯、北山渋の湯", regex=True, inplace=True)
 
-    # 〒7913203 中山町出渕豊岡・東町 -> 中山町出渕豊岡、中山町出渕東町
-    ken_all["町域名"].replace(r"中山町出渕豊岡・東町", "中山町出渕豊岡、中山町出渕東町", regex=True, inplace=True)
+# いずれかのルールのguardsを含むか（含まない町域名はどのルールにも掛からない）
+# guardsの無いルールがある場合は使えないのでNone
+TOWN_RULES_GUARD = (
+    re.compile("|".join(re.escape(g) for rule in TOWN_RULES for g in rule.guards))
+    if all(rule.guards for rule in TOWN_RULES)
+    else None
+)
 
-    # 〒7850163 浦ノ内東分鳴無・坂内 -> 浦ノ内東分鳴無、浦ノ内東分坂内
-    ken_all["町域名"].replace(r"浦ノ内東分鳴無・坂内", "浦ノ内東分鳴無、浦ノ内東分坂内", regex=True, inplace=True)
 
-    # 〒9401172 釜ケ島土手畑・藤場 -> 釜ケ島土手畑、釜ケ島藤場
-    ken_all["町域名"].replace(r"釜ケ島土手畑・藤場", "釜ケ島土手畑、釜ケ島藤場", regex=True, inplace=True)
+def apply_town_rules(town: str, rules: Sequence[TownRule] = TOWN_RULES) -> str:
+    """町域名にルールを順番に1回ずつ適用
+    Args:
+        town(str): 町域名
+        rules(list[TownRule]): 適用するルール
+    Returns:
+        town(str): 前処理後の町域名
+    """
+    if (
+        rules is TOWN_RULES
+        and TOWN_RULES_GUARD is not None
+        and not TOWN_RULES_GUARD.search(town)
+    ):
+        return town
+
+    for guards, pattern, repl, when in rules:
+        if guards is not None:
+            for guard in guards:
+                if guard in town:
+                    break
+            else:
+                continue
+        if when is not None and not when(town):
+            continue
+        if pattern is None:
+            town = repl(town)  # type: ignore
+        else:
+            town = pattern.sub(repl, town)
+
+    return town
 
-    # 〒8700924 牧白滝B・C -> 牧白滝B、牧白滝C
-    ken_all["町域名"].replace(r"牧白滝B・C", "牧白滝B、牧白滝C", regex=True, inplace=True)
 
-    # 〒7811606 土居甲・乙 -> 土居甲、土居乙
-    ken_all["町域名"].replace(r"土居甲・乙", "土居甲、土居乙", regex=True, inplace=True)
+def preproc_ken_all(ken_all: pd.DataFrame) -> pd.DataFrame:
+    """KEN_ALLの全体的な前処理
+    Args:
+        ken_all(DataFrame): KEN_ALL.CSVのDataFrame（前処理前）
+    Returns:
+        ken_all(DataFrame): KEN_ALL.CSVのDataFrame（前処理後）
+    """
+    # 町域名の前処理（TOWN_RULESを1行ずつ1回で適用）
+    ken_all = ken_all.assign(町域名=ken_all["町域名"].map(apply_town_rules))
 
     """
     仕上げ
     """
-    # ハイフンを半角に変換
-    ken_all["町域名"].replace(r"−", "-", regex=True, inplace=True)
-
     # '、'区切りの町域名を行分割
     # 例) 〒7614104 甲、乙(吉ケ浦)
     ken_all = ken_all.assign(町域名=ken_all["町域名"].str.split("、")).explode("町域名")
@@ -398,8 +1132,12 @@ def preproc_ken_all(ken_all: pd.DataFrame) -> pd.DataFrame:
         }
     )
 
-    # 住所を結合した列を追加
-    ken_all["address"] = ken_all["prefecture"] + ken_all["city"] + ken_all["town"]
+    # 住所を結合した列を追加（カテゴリ型は文字列に戻してから結合）
+    ken_all["address"] = (
+        ken_all["prefecture"].astype(object)
+        + ken_all["city"].astype(object)
+        + ken_all["town"]
+    )
 
     return ken_all
 
@@ -410,9 +1148,9 @@ def preproc_ken_all(ken_all: pd.DataFrame) -> pd.DataFrame:
 
 
 def make_jigyosyo(file_path: str) -> pd.DataFrame:
-    """JIGYOSYOのDF作成
+    """JIGYOSYOのDF作成（必要な列だけ読み込む）
     Args:
-        file_path(str): JIGYOSYO.CSVのファイルパス
+        file_path(str): JIGYOSYO.CSVまたはjigyosyo.zipのファイルパス
     Returns:
         jigyosyo(DataFrame): JIGYOSYO.CSVのDataFrame
     """
@@ -448,12 +1186,26 @@ def make_jigyosyo(file_path: str) -> pd.DataFrame:
         "修正コード": str,
     }
 
-    jigyosyo = pd.read_csv(
-        file_path, encoding="cp932", header=None, names=names, dtype=dtype
-    )
+    # 必要な列だけ読み込む
+    usecols = [
+        "大口事業所名",
+        "大口事業所個別番号",
+        "都道府県名",
+        "市区町村名",
+        "町域名",
+        "小字名、丁目、番地等",
+    ]
+
+    # 都道府県名、市区町村名は値の種類が少ないのでカテゴリ型にする
+    dtype.update({"都道府県名": "category", "市区町村名": "category"})
 
-    # 必要な列だけ残す
-    jigyosyo = jigyosyo[["大口事業所名", "大口事業所個別番号", "都道府県名", "市区町村名", "町域名", "小字名、丁目、番地等"]]
+    with open_csv(file_path, encoding="cp932") as f:
+        jigyosyo = pd.read_csv(
+            f, header=None, names=names, usecols=usecols, dtype=dtype
+        )
+
+    # 列をusecolsの順に並べ替え（read_csvはCSVの列順で読み込む）
+    jigyosyo = jigyosyo[usecols]
 
     # 列名リネーム
     jigyosyo = jigyosyo.rename(
@@ -467,9 +1219,55 @@ def make_jigyosyo(file_path: str) -> pd.DataFrame:
         }
     )
 
-    # 住所を結合した列を追加
+    # 住所を結合した列を追加（カテゴリ型は文字列に戻してから結合）
     jigyosyo["address"] = (
-        jigyosyo["prefecture"] + jigyosyo["city"] + jigyosyo["town"] + jigyosyo["chome"]
+        jigyosyo["prefecture"].astype(object)
+        + jigyosyo["city"].astype(object)
+        + jigyosyo["town"]
+        + jigyosyo["chome"]
     )
 
     return jigyosyo
+
+
+def process_jigyosyo(jigyosyo: pd.DataFrame, workers: int = 1) -> pd.DataFrame:
+    """全角 -> 半角（workers > 1の場合は行で分割してプロセス並列）
+    Args:
+        jigyosyo(DataFrame): JIGYOSYO.CSVのDataFrame
+        workers(int): プロセス数
+    Returns:
+        jigyosyo(DataFrame): 変換後のDataFrame
+    """
+    if workers <= 1:
+        return normalize_columns(jigyosyo)
+
+    return run_parallel(normalize_columns, split_rows(jigyosyo, workers), workers)
+
+
+def apply_jigyosyo_diff(
+    engine: Engine, added: pd.DataFrame, deleted: pd.DataFrame
+) -> None:
+    """月次の差分（全角 -> 半角済み）をjigyosyoに適用
+    大口事業所個別番号（zipcode）をキーに削除してから追加する（upsert）
+    Args:
+        engine(Engine): 書き込み先DBのengine
+        added(DataFrame): 追加・更新する行（jaddYYMM.CSVから作成したもの）
+        deleted(DataFrame): 削除する行（jdelYYMM.CSVから作成したもの）
+    Returns:
+        None
+    """
+    columns = ["company", "zipcode", "prefecture", "city", "town", "chome", "address"]
+    find = text("SELECT id FROM jigyosyo WHERE zipcode = :zipcode")
+
+    with engine.begin() as conn:
+        zipcodes = pd.concat([deleted["zipcode"], added["zipcode"]]).unique()
+        ids = [
+            row_id
+            for zipcode in zipcodes
+            for (row_id,) in conn.execute(find, {"zipcode": zipcode})
+        ]
+        delete_rows(conn, "jigyosyo", ids)
+        if len(added.index):
+            start = next_id(conn, "jigyosyo")
+            added = added[columns].assign(id=range(start, start + len(added.index)))
+            insert_rows(conn, "jigyosyo", added[["id", *columns]])
@@ -0,0 +1,62 @@
+import argparse
+import csv
+import sys
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine
+
+# 照合はAPI（/v1/ken_all/resolve）と同じ実装を使う
+sys.path.append(str(Path(__file__).resolve().parents[2] / "fastapi"))
+from functions.resolver import AddressResolver  # noqa: E402
+
+# parse_ken_all.pyが作成したDB
+DATABASE_PATH = "../../fastapi/zipcode.db"
+
+
+def main() -> None:
+    """CSVの住所列（番地、建物名を含んでよい）から郵便番号を引き、列を追加したCSVを出力
+    追加する列: zipcode（複数ある場合は"|"区切り）, matched_address, rest
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input", help="入力CSV（ヘッダーあり）")
+    parser.add_argument("output", help="出力CSV")
+    parser.add_argument("--column", default="address", help="住所の列名")
+    parser.add_argument("--encoding", default="utf-8", help="入力CSVの文字コード")
+    args = parser.parse_args()
+
+    engine = create_engine(f"sqlite:///{DATABASE_PATH}")
+    resolver = AddressResolver.load(engine)
+    engine.dispose()
+    print(f"loaded: {len(resolver)} addresses in {resolver.load_seconds:.1f}s")
+
+    started = time.perf_counter()
+    rows = resolved = 0
+    with open(args.input, encoding=args.encoding, newline="") as src, open(
+        args.output, "w", encoding="utf-8", newline=""
+    ) as dst:
+        reader = csv.DictReader(src)
+        fieldnames = list(reader.fieldnames or [])
+        writer = csv.DictWriter(
+            dst, fieldnames=fieldnames + ["zipcode", "matched_address", "rest"]
+        )
+        writer.writeheader()
+        for row in reader:
+            resolution = resolver.resolve(row[args.column] or "")
+            if resolution is not None:
+                row["zipcode"] = "|".join(resolution.zipcodes)
+                row["matched_address"] = resolution.address
+                row["rest"] = resolution.rest
+                resolved += 1
+            writer.writerow(row)
+            rows += 1
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"resolved: {resolved}/{rows} rows in {elapsed:.1f}s "
+        f"({rows / max(elapsed, 1e-9):.0f} rows/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
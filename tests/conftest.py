@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# クローラーとパーサーはスクリプトのディレクトリから読み込む前提（パッケージにしていない）
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "get_data" / "crawler"))
+sys.path.insert(0, str(ROOT / "get_data" / "parser"))
@@ -0,0 +1,236 @@
+import datetime
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Tuple
+
+import pytest
+import requests
+
+import crawler_utils
+
+KEN_ALL_PAGE = '<div class="arrange-r">\n2024年10月31日更新</div>'
+JIGYOSYO_PAGE = '<div class="pad"><p><small>2024年11月29日更新版</small></p></div>'
+
+
+class JapanPost:
+    """日本郵便のサイトの代わりに、登録したパスの内容を返すローカルのHTTPサーバー
+    ETagを付けて返し、If-None-Matchが一致すれば304を返す
+    """
+
+    def __init__(self) -> None:
+        self.files: Dict[str, Tuple[bytes, str]] = {}
+        self.requests: list = []
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                site.requests.append(self.path)
+                if self.path not in site.files:
+                    self.send_error(404)
+                    return
+                body, etag = site.files[self.path]
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}{path}"
+
+    def put(self, path: str, body: bytes) -> str:
+        self.files[path] = (body, f'"{len(self.files)}-{len(body)}"')
+        return self.url(path)
+
+
+@pytest.fixture
+def japanpost(monkeypatch: pytest.MonkeyPatch) -> Iterator[JapanPost]:
+    site = JapanPost()
+    site.thread.start()
+    monkeypatch.setattr(
+        crawler_utils,
+        "PUBLISHED_PAGES",
+        {
+            "ken_all": site.put("/kogaki-zip.html", KEN_ALL_PAGE.encode("utf-8")),
+            "jigyosyo": site.put("/index-zip.html", JIGYOSYO_PAGE.encode("utf-8")),
+        },
+    )
+    yield site
+    site.server.shutdown()
+    site.server.server_close()
+
+
+def test_get_published_dates(japanpost: JapanPost) -> None:
+    assert crawler_utils.get_published_dates() == {
+        "ken_all": datetime.date(2024, 10, 31),
+        "jigyosyo": datetime.date(2024, 11, 29),
+    }
+
+
+@pytest.mark.parametrize(
+    "applied, expected",
+    [
+        # 未適用
+        ({}, {"ken_all": "2024-10-31", "jigyosyo": "2024-11-29"}),
+        # 適用済みより新しいものだけ
+        (
+            {"ken_all": "2024-10-31", "jigyosyo": "2024-10-31"},
+            {"jigyosyo": "2024-11-29"},
+        ),
+        # 両方とも最新
+        ({"ken_all": "2024-10-31", "jigyosyo": "2024-11-29"}, {}),
+    ],
+)
+def test_check_update(
+    japanpost: JapanPost, applied: Dict[str, str], expected: Dict[str, str]
+) -> None:
+    applied = {name: datetime.date.fromisoformat(v) for name, v in applied.items()}
+    expected = {name: datetime.date.fromisoformat(v) for name, v in expected.items()}
+
+    assert crawler_utils.check_update(applied) == expected
+
+
+@pytest.mark.parametrize(
+    "applied, published, expected",
+    [
+        (None, datetime.date(2024, 10, 31), []),
+        (datetime.date(2024, 10, 31), datetime.date(2024, 10, 31), []),
+        (datetime.date(2024, 9, 30), datetime.date(2024, 10, 31), ["2410"]),
+        # 年をまたぐ
+        (
+            datetime.date(2024, 11, 29),
+            datetime.date(2025, 2, 28),
+            ["2412", "2501", "2502"],
+        ),
+        # MAX_DIFF_MONTHSちょうどは差分、超えたら全件
+        (datetime.date(2023, 10, 31), datetime.date(2024, 10, 31), 12),
+        (datetime.date(2023, 9, 29), datetime.date(2024, 10, 31), []),
+    ],
+)
+def test_diff_months(applied, published, expected) -> None:
+    months = crawler_utils.diff_months(applied, published)
+    if isinstance(expected, int):
+        assert len(months) == expected
+        assert months[0] == "2311" and months[-1] == "2410"
+    else:
+        assert months == expected
+
+
+def test_write_manifest_and_load_versions(tmp_path) -> None:
+    import parse_utils
+
+    manifest = {
+        "ken_all": {
+            "mode": "diff",
+            "version": "2024-10-31",
+            "months": [{"yymm": "2410", "del": "del_2410.zip", "add": "add_2410.zip"}],
+        },
+        "jigyosyo": {
+            "mode": "full",
+            "version": "2024-11-29",
+            "files": ["jigyosyo.zip"],
+        },
+    }
+    crawler_utils.write_manifest(manifest, str(tmp_path / "manifest.json"))
+    assert parse_utils.load_manifest(str(tmp_path / "manifest.json")) == manifest
+    assert parse_utils.load_manifest(str(tmp_path / "missing.json")) is None
+
+    # パーサーが書き込んだバージョンを、クローラーが次回の更新チェックに使う
+    version_file = str(tmp_path / "version.json")
+    assert crawler_utils.load_versions(version_file) == {}
+    parse_utils.save_version(version_file, "ken_all", "2024-10-31")
+    parse_utils.save_version(version_file, "jigyosyo", "2024-11-29")
+    parse_utils.save_version(version_file, "ken_all", "2024-11-29")
+    assert crawler_utils.load_versions(version_file) == {
+        "ken_all": datetime.date(2024, 11, 29),
+        "jigyosyo": datetime.date(2024, 11, 29),
+    }
+
+
+def test_download_zip_conditional_get(japanpost: JapanPost, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "zip").mkdir()
+    url = japanpost.put("/add_2410.zip", b"PK\x03\x04 add")
+
+    assert crawler_utils.download_zip(url, "add_2410.zip") is True
+    assert (tmp_path / "zip" / "add_2410.zip").read_bytes() == b"PK\x03\x04 add"
+    validators = json.loads((tmp_path / "zip" / "add_2410.zip.json").read_text())
+    assert validators["etag"] == japanpost.files["/add_2410.zip"][1]
+
+    # 変わっていなければ（304）ダウンロードしない
+    assert crawler_utils.download_zip(url, "add_2410.zip") is False
+    assert not (tmp_path / "zip" / "add_2410.zip.part").exists()
+
+
+def test_download_zip_removes_partial_file(japanpost: JapanPost, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "zip").mkdir()
+    url = japanpost.put("/add_2410.zip", b"PK\x03\x04 add")
+
+    def broken_iter_content(self, chunk_size=1):
+        yield b"PK"
+        raise requests.exceptions.ChunkedEncodingError("connection reset")
+
+    monkeypatch.setattr(requests.Response, "iter_content", broken_iter_content)
+
+    # リトライせずに1回だけ実行する
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        crawler_utils.download_zip.__wrapped__(url, "add_2410.zip")
+    assert list((tmp_path / "zip").iterdir()) == []
+
+
+def test_manifest_skips_not_modified(japanpost: JapanPost, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "zip").mkdir()
+    plans = {
+        "ken_all": [
+            {
+                "yymm": "2410",
+                "del": japanpost.put("/del_2410.zip", b"PK\x03\x04 del"),
+                "add": japanpost.put("/add_2410.zip", b"PK\x03\x04 add"),
+            }
+        ],
+        "jigyosyo": japanpost.put("/jigyosyo.zip", b"PK\x03\x04 jigyosyo"),
+    }
+    check = {
+        "ken_all": datetime.date(2024, 10, 31),
+        "jigyosyo": datetime.date(2024, 11, 29),
+    }
+
+    def download() -> set:
+        urls = [url for plan in plans.values() for url in crawler_utils.plan_urls(plan)]
+        results = [
+            crawler_utils.download_zip(url, url.rsplit("/", 1)[-1]) for url in urls
+        ]
+        return {url for url, result in zip(urls, results) if result}
+
+    assert crawler_utils.make_manifest(plans, check, download()) == {
+        "ken_all": {
+            "mode": "diff",
+            "version": "2024-10-31",
+            "months": [{"yymm": "2410", "del": "del_2410.zip", "add": "add_2410.zip"}],
+        },
+        "jigyosyo": {
+            "mode": "full",
+            "version": "2024-11-29",
+            "files": ["jigyosyo.zip"],
+        },
+    }
+
+    # 全て304ならパーサーに渡さない
+    assert crawler_utils.make_manifest(plans, check, download()) == {}
+
+    # 1つでも変わっていれば、そのデータだけ渡す
+    japanpost.put("/jigyosyo.zip", b"PK\x03\x04 jigyosyo updated")
+    assert list(crawler_utils.make_manifest(plans, check, download())) == ["jigyosyo"]
@@ -0,0 +1,341 @@
+import json
+import sqlite3
+import sys
+import threading
+import time
+import zipfile
+from contextlib import closing
+from pathlib import Path
+from typing import List
+
+import pytest
+from sqlalchemy import text
+
+import parse_jigyosyo
+import parse_ken_all
+import parse_utils
+
+# KEN_ALL.CSV（全角、Shift_JIS）。越中畑の2行は前処理後にどちらも「越中畑」になり、
+# 大通西は2行にまたがる町域名（マージしてから前処理する）
+KEN_ALL = [
+    ("0600000", "札幌市中央区", "以下に掲載がない場合"),
+    ("0600042", "札幌市中央区", "大通西（１〜"),
+    ("0600042", "札幌市中央区", "１９丁目）"),
+    ("0640820", "札幌市中央区", "大通西（２０〜２８丁目）"),
+    ("0295523", "岩手郡雫石町", "越中畑６４地割〜越中畑６６地割"),
+    ("0295523", "岩手郡雫石町", "越中畑６７地割"),
+    ("0200001", "盛岡市", "中央通"),
+    ("0200002", "盛岡市", "駅前通"),
+    ("0200003", "盛岡市", "肴町"),
+    ("0200004", "盛岡市", "大沢川原"),
+    ("0200005", "盛岡市", "内丸"),
+    ("0200006", "盛岡市", "菜園"),
+    ("0200007", "盛岡市", "中ノ橋通"),
+    ("0200008", "盛岡市", "本町通"),
+    ("0200009", "盛岡市", "上田"),
+    ("0200010", "盛岡市", "みたけ"),
+]
+KEN_ALL_DEL = [
+    ("0295523", "岩手郡雫石町", "越中畑６７地割"),
+    ("0600042", "札幌市中央区", "大通西（１〜"),
+    ("0600042", "札幌市中央区", "１９丁目）"),
+    ("0200003", "盛岡市", "肴町"),
+]
+KEN_ALL_ADD = [
+    ("0200003", "盛岡市", "肴町一丁目"),
+    ("0200011", "盛岡市", "北山"),
+]
+
+# JIGYOSYO.CSV（大口事業所個別番号がキー）
+JIGYOSYO = [
+    (f"株式会社テスト{i}", f"10000{i:02d}", "千代田区", "丸の内", f"{i}－1")
+    for i in range(12)
+]
+JIGYOSYO_DEL = [JIGYOSYO[3], JIGYOSYO[4]]
+JIGYOSYO_ADD = [
+    ("有限会社テスト5", "1000005", "千代田区", "丸の内", "5－1"),  # 更新
+    ("株式会社テスト99", "1000099", "千代田区", "大手町", "9－9"),  # 追加
+]
+
+
+def ken_all_csv(rows: List[tuple]) -> str:
+    return "".join(
+        f'"03000","000  ","{zipcode}","ｲﾜﾃｹﾝ","ｼ","ﾁｮｳ","北海道",'
+        f'"{city}","{town}","0","0","0","0","0","0"\r\n'
+        for zipcode, city, town in rows
+    )
+
+
+def jigyosyo_csv(rows: List[tuple]) -> str:
+    return "".join(
+        f'"13101","ｶﾌﾞｼｷｶﾞｲｼｬ","{company}","東京都","{city}","{town}","{chome}",'
+        f'"{zipcode}","100  ","銀座","0","0","0"\r\n'
+        for company, zipcode, city, town, chome in rows
+    )
+
+
+def write_zip(path: Path, csv_name: str, text: str, encoding: str) -> str:
+    with zipfile.ZipFile(path, mode="w") as zf:
+        zf.writestr(csv_name, text.encode(encoding))
+    return path.name
+
+
+@pytest.fixture
+def crawler(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """クローラーの出力（zip/とversion.json）とDBの置き場所を一時ディレクトリに向ける"""
+    zip_dir = tmp_path / "zip"
+    zip_dir.mkdir()
+    for module in (parse_ken_all, parse_jigyosyo):
+        monkeypatch.setattr(module, "DATABASE_PATH", str(tmp_path / "zipcode.db"))
+        monkeypatch.setattr(module, "ARTIFACT_DIR", str(tmp_path))
+        monkeypatch.setattr(module, "REPORT_DIR", str(tmp_path / "reports"))
+        monkeypatch.setattr(module, "ZIP_DIR", str(zip_dir))
+        monkeypatch.setattr(module, "MANIFEST_FILE", str(zip_dir / "manifest.json"))
+        monkeypatch.setattr(module, "VERSION_FILE", str(tmp_path / "version.json"))
+    (tmp_path / "reports").mkdir()
+    monkeypatch.setattr(sys, "argv", ["parse"])
+    return tmp_path
+
+
+def write_manifest(crawler: Path, manifest: dict) -> None:
+    with open(crawler / "zip" / "manifest.json", mode="w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+
+def load_ken_all(crawler: Path, rows: List[tuple], version: str) -> None:
+    name = write_zip(
+        crawler / "zip" / "ken_all.zip",
+        "KEN_ALL.CSV",
+        ken_all_csv(rows),
+        "shift_jis",
+    )
+    write_manifest(
+        crawler, {"ken_all": {"mode": "full", "version": version, "files": [name]}}
+    )
+    parse_ken_all.main()
+
+
+def load_jigyosyo(crawler: Path, rows: List[tuple], version: str) -> None:
+    name = write_zip(
+        crawler / "zip" / "jigyosyo.zip",
+        "JIGYOSYO.CSV",
+        jigyosyo_csv(rows),
+        "cp932",
+    )
+    write_manifest(
+        crawler, {"jigyosyo": {"mode": "full", "version": version, "files": [name]}}
+    )
+    parse_jigyosyo.main()
+
+
+def ken_all_diff_manifest(crawler: Path) -> dict:
+    zip_dir = crawler / "zip"
+    deleted = write_zip(
+        zip_dir / "del_2410.zip", "DEL_2410.CSV", ken_all_csv(KEN_ALL_DEL), "shift_jis"
+    )
+    added = write_zip(
+        zip_dir / "add_2410.zip", "ADD_2410.CSV", ken_all_csv(KEN_ALL_ADD), "shift_jis"
+    )
+    return {
+        "mode": "diff",
+        "version": "2024-10-31",
+        "months": [{"yymm": "2410", "del": deleted, "add": added}],
+    }
+
+
+def jigyosyo_diff_manifest(crawler: Path) -> dict:
+    zip_dir = crawler / "zip"
+    deleted = write_zip(
+        zip_dir / "jdel2410.zip", "JDEL2410.CSV", jigyosyo_csv(JIGYOSYO_DEL), "cp932"
+    )
+    added = write_zip(
+        zip_dir / "jadd2410.zip", "JADD2410.CSV", jigyosyo_csv(JIGYOSYO_ADD), "cp932"
+    )
+    return {
+        "mode": "diff",
+        "version": "2024-10-31",
+        "months": [{"yymm": "2410", "del": deleted, "add": added}],
+    }
+
+
+def dump(db_path: Path, table_name: str) -> List[tuple]:
+    """idを除いた行（順不同で比べる）"""
+    columns = [
+        column.name
+        for column in parse_utils.models.Base.metadata.tables[table_name].columns
+        if column.name != "id"
+    ]
+    with sqlite3.connect(db_path) as conn:
+        return sorted(
+            conn.execute(f"SELECT {', '.join(columns)} FROM {table_name}").fetchall()
+        )
+
+
+def search(db_path: Path, table_name: str, phrase: str) -> List[str]:
+    """FTS5で部分一致検索した住所"""
+    with sqlite3.connect(db_path) as conn:
+        return sorted(
+            address
+            for (address,) in conn.execute(
+                f"SELECT address FROM {table_name} WHERE id IN "
+                f"(SELECT rowid FROM {table_name}_fts WHERE {table_name}_fts MATCH ?)",
+                (f'address : "{phrase}"',),
+            )
+        )
+
+
+def check_fulltext(db_path: Path, table_name: str) -> None:
+    """FTS5の索引が本体テーブルと一致しているか（一致しなければOperationalError）"""
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            f"INSERT INTO {table_name}_fts({table_name}_fts, rank) "
+            "VALUES('integrity-check', 1)"
+        )
+
+
+def expected_ken_all(tmp_path: Path) -> List[tuple]:
+    """差分を反映したKEN_ALL.CSVを全件で読み込んだ場合の行"""
+    rows = [row for row in KEN_ALL if row not in KEN_ALL_DEL] + KEN_ALL_ADD
+    path = tmp_path / "KEN_ALL.CSV"
+    path.write_text(ken_all_csv(rows), encoding="shift_jis")
+    ken_all = parse_utils.make_ken_all(str(path))
+    parse_utils.set_index(ken_all)
+    ken_all = parse_utils.process_ken_all(ken_all)
+    return sorted(
+        ken_all[["zipcode", "prefecture", "city", "town", "address"]]
+        .astype(object)
+        .itertuples(index=False, name=None)
+    )
+
+
+def test_ken_all_diff_matches_full_load(crawler: Path) -> None:
+    load_ken_all(crawler, KEN_ALL, "2024-09-30")
+    write_manifest(crawler, {"ken_all": ken_all_diff_manifest(crawler)})
+    parse_ken_all.main()
+
+    db_path = crawler / "zipcode.db"
+    rows = [row[:5] for row in dump(db_path, "ken_all")]
+    assert rows == expected_ken_all(crawler)
+
+    # 越中畑67地割を削除しても、同じ「越中畑」になる64〜66地割の行は残る
+    assert (
+        "0295523",
+        "北海道",
+        "岩手郡雫石町",
+        "越中畑",
+        "北海道岩手郡雫石町越中畑",
+    ) in rows
+    assert not any(row[0] == "0600042" for row in rows)
+
+    # FTS5は変わった行だけ更新されている
+    check_fulltext(db_path, "ken_all")
+    assert search(db_path, "ken_all", "肴町一丁目") == ["北海道盛岡市肴町一丁目"]
+    assert search(db_path, "ken_all", "盛岡市肴町") == ["北海道盛岡市肴町一丁目"]
+    with sqlite3.connect(db_path) as conn:
+        sources = conn.execute("SELECT COUNT(*) FROM ken_all_source").fetchone()[0]
+        version = conn.execute(
+            "SELECT version FROM dataset_version WHERE name = 'ken_all'"
+        ).fetchone()[0]
+    assert sources == len(rows)
+    assert version == "2024-10-31"
+
+    # 適用したバージョンはversion.jsonに記録する
+    versions = json.loads((crawler / "version.json").read_text())
+    assert versions == {"ken_all": "2024-10-31"}
+
+
+def test_ken_all_diff_is_idempotent(crawler: Path) -> None:
+    load_ken_all(crawler, KEN_ALL, "2024-09-30")
+    write_manifest(crawler, {"ken_all": ken_all_diff_manifest(crawler)})
+    parse_ken_all.main()
+    db_path = crawler / "zipcode.db"
+    once = dump(db_path, "ken_all")
+
+    parse_ken_all.main()
+    assert dump(db_path, "ken_all") == once
+    check_fulltext(db_path, "ken_all")
+
+
+def test_ken_all_diff_requires_sources(crawler: Path) -> None:
+    load_ken_all(crawler, KEN_ALL, "2024-09-30")
+    db_path = crawler / "zipcode.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("DROP TABLE ken_all_source")
+    before = dump(db_path, "ken_all")
+
+    write_manifest(crawler, {"ken_all": ken_all_diff_manifest(crawler)})
+    with pytest.raises(ValueError, match="ken_all_source"):
+        parse_ken_all.main()
+
+    # 一時ファイルに書き込むので、稼働中のDBとversion.jsonはそのまま
+    assert dump(db_path, "ken_all") == before
+    assert json.loads((crawler / "version.json").read_text()) == {
+        "ken_all": "2024-09-30"
+    }
+
+
+def test_jigyosyo_diff_matches_full_load(
+    crawler: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    load_jigyosyo(crawler, JIGYOSYO, "2024-09-30")
+    write_manifest(crawler, {"jigyosyo": jigyosyo_diff_manifest(crawler)})
+    parse_jigyosyo.main()
+    db_path = crawler / "zipcode.db"
+    diffed = dump(db_path, "jigyosyo")
+    check_fulltext(db_path, "jigyosyo")
+    assert search(db_path, "jigyosyo", "大手町9") == ["東京都千代田区大手町9-9"]
+
+    # 差分を反映したJIGYOSYO.CSVを全件で読み込んだ場合と同じ
+    zipcodes = {row[1] for row in JIGYOSYO_DEL + JIGYOSYO_ADD}
+    rows = [row for row in JIGYOSYO if row[1] not in zipcodes] + JIGYOSYO_ADD
+    other = crawler / "full"
+    other.mkdir()
+    monkeypatch.setattr(parse_jigyosyo, "DATABASE_PATH", str(other / "zipcode.db"))
+    monkeypatch.setattr(parse_jigyosyo, "ARTIFACT_DIR", str(other))
+    load_jigyosyo(crawler, rows, "2024-10-31")
+    assert dump(other / "zipcode.db", "jigyosyo") == diffed
+
+
+def test_up_to_date_dataset_is_skipped(crawler: Path, capsys) -> None:
+    load_ken_all(crawler, KEN_ALL, "2024-09-30")
+    db_path = crawler / "zipcode.db"
+    before = dump(db_path, "ken_all")
+
+    # クローラーが更新なしと判断したデータはmanifest.jsonに入らない
+    write_manifest(crawler, {"jigyosyo": jigyosyo_diff_manifest(crawler)})
+    parse_ken_all.main()
+    assert "skip: ken_all is up to date" in capsys.readouterr().out
+    assert dump(db_path, "ken_all") == before
+
+
+def test_staging_database_runs_one_at_a_time(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # 検証はmodelsのテーブルが前提なので省略する
+    monkeypatch.setattr(parse_utils, "validate_database", lambda *args: None)
+    db_path = str(tmp_path / "zipcode.db")
+    with closing(sqlite3.connect(db_path)) as con, con:
+        con.execute("CREATE TABLE counter (value INTEGER)")
+        con.execute("INSERT INTO counter VALUES (0)")
+
+    def increment() -> None:
+        # 同時に実行しても、後の実行は先の実行の結果をコピーしてから書き込む
+        with parse_utils.staging_database(db_path, "counter") as engine:
+            with engine.begin() as conn:
+                value = conn.execute(text("SELECT value FROM counter")).scalar()
+                time.sleep(0.2)
+                conn.execute(text("UPDATE counter SET value = :v"), {"v": value + 1})
+
+    threads = [threading.Thread(target=increment) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with closing(sqlite3.connect(db_path)) as con:
+        assert con.execute("SELECT value FROM counter").fetchone() == (2,)
+    # 一時ファイルは残らない
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "zipcode.db",
+        "zipcode.db.lock",
+    ]